@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the driver rating aggregates (rating count and sum, average score,
+per-tag counts) from the ratings stored on rides.
+
+Run once after migrate_columns.py adds the rating columns, so historical
+ratings are included, and again whenever the aggregates need repairing.
+Profiles are processed in batches, one transaction per batch.
+
+Usage: python backfill_driver_ratings.py [--batch-size 500]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.main import app
+from src.services.driver_ratings import backfill_driver_ratings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild driver rating aggregates from rides')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        rebuilt = backfill_driver_ratings(batch_size=args.batch_size)
+    print(f"✓ Rebuilt rating aggregates for {rebuilt} driver(s).")
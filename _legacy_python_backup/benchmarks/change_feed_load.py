@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Change feed load test
+
+Starts the SSE change feed on a free port and opens many subscribers from
+one asyncio client thread. By default there are 500: a fifth use the
+office account, the rest are drivers. Office subscribers receive every
+event; each driver receives only events for their own rides.
+
+The test then assigns pending rides through POST
+/api/office/rides/<id>/assign. Each commit publishes a ride.assigned event
+to the office and to the assigned driver. It prints:
+- the events published
+- deliveries received against expected
+- delivery latency (p50/p99, from the commit to the subscriber reading it)
+- the process thread count with every subscriber connected
+
+Usage: python benchmarks/change_feed_load.py [--subscribers 500] [--drivers 100] [--events 300]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, Ride
+from src.benchmarks.harness import create_app, seed, add_rides, auth_headers
+from src.services.change_feed import change_feed, FEED_PATH
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+async def subscribe(port, headers, received, latencies, connected):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {FEED_PATH} HTTP/1.1\r\nHost: localhost\r\nAuthorization: {headers["Authorization"]}\r\n'
+                 f'Accept: text/event-stream\r\n\r\n'.encode('ascii'))
+    await writer.drain()
+    status = await reader.readline()
+    if b' 200 ' not in status:
+        raise SystemExit(f'Subscribe failed: {status!r}')
+    await reader.readuntil(b'\r\n\r\n')
+    connected.release()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'data: '):
+                data = json.loads(line[6:])
+                latencies.append((datetime.utcnow() - datetime.fromisoformat(data['at'])).total_seconds() * 1000)
+                received[0] += 1
+    finally:
+        writer.close()
+
+
+def run_clients(loop, port, header_list, received, latencies, ready):
+    asyncio.set_event_loop(loop)
+    connected = asyncio.Semaphore(0)
+
+    async def main():
+        tasks = [loop.create_task(subscribe(port, headers, received, latencies, connected)) for headers in header_list]
+        for _ in header_list:
+            await connected.acquire()
+        ready.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    loop.run_until_complete(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the SSE change feed')
+    parser.add_argument('--subscribers', type=int, default=500)
+    parser.add_argument('--drivers', type=int, default=100)
+    parser.add_argument('--events', type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=50, rides=0, drivers=args.drivers)
+        start = datetime.utcnow() + timedelta(days=1)
+        for i in range(args.events):
+            # Two hours apart, so no assignment hits the schedule conflict rule
+            add_rides(1, users['patients'][i % len(users['patients']):], users['community'], users['drivers'],
+                      status='PENDING', appointment_time=start + timedelta(hours=2 * i))
+        db.session.commit()
+        rides = [ride.id for ride in Ride.query.order_by(Ride.appointment_time)]
+        drivers = [driver.id for driver in users['drivers']]
+        office_headers = auth_headers(users['office'])
+        office_count = max(1, args.subscribers // 5)
+        subscribers = [office_headers] * office_count + [
+            auth_headers(users['drivers'][i % args.drivers]) for i in range(args.subscribers - office_count)
+        ]
+    per_driver = {}
+    for i in range(args.subscribers - office_count):
+        per_driver[drivers[i % args.drivers]] = per_driver.get(drivers[i % args.drivers], 0) + 1
+
+    port = change_feed.start(port=0, app=app)
+    received, latencies = [0], []
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    clients = threading.Thread(target=run_clients, args=(loop, port, subscribers, received, latencies, ready),
+                               daemon=True)
+    began = time.perf_counter()
+    clients.start()
+    ready.wait()
+    connect_s = time.perf_counter() - began
+    threads = threading.active_count()
+
+    client = app.test_client()
+    expected = 0
+    began = time.perf_counter()
+    for i, ride_id in enumerate(rides):
+        driver_id = drivers[i % len(drivers)]
+        with app.app_context():
+            response = client.post(f'/api/office/rides/{ride_id}/assign', json={'driverId': driver_id},
+                                   headers=office_headers)
+        if response.status_code != 200:
+            raise SystemExit(f'Assign failed: {response.get_json()}')
+        expected += office_count + per_driver.get(driver_id, 0)
+    write_s = time.perf_counter() - began
+
+    deadline = time.monotonic() + 10
+    while received[0] < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    delivered_s = time.perf_counter() - began
+    stats = change_feed.stats()
+    change_feed.stop()
+
+    print(f"Subscribers:  {args.subscribers} ({office_count} office, {args.subscribers - office_count} driver) "
+          f"connected in {connect_s * 1000:.0f} ms; {threads} threads in the process")
+    print(f"Events:       {stats['published']} published in {write_s:.2f} s ({stats['published'] / write_s:,.0f}/s)")
+    print(f"Deliveries:   {received[0]:,} of {expected:,} expected in {delivered_s:.2f} s "
+          f"({received[0] / delivered_s:,.0f}/s), {stats['disconnectedSlow']} slow subscribers dropped")
+    print(f"Latency:      p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
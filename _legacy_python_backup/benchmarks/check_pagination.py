@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cursor pagination check
+
+Walks every paginated list endpoint twice with a small limit: once by
+?page= and once by following nextCursor. The sort columns (created_at,
+registered_date) are set to a handful of shared values first, so most
+page boundaries fall inside a tie and the cursor's id comparison decides
+what comes next. The check fails if the cursor walk skips or repeats a
+row that the page walk returned.
+
+It runs once per ID storage mode (string and binary), each in its own
+process, since ID_STORAGE has to be chosen before the first query.
+
+Usage: python benchmarks/check_pagination.py [--storage string|binary]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+STORAGE_MODES = ('string', 'binary')
+LIMIT = 7
+
+ENDPOINTS = [
+    ('office', '/api/office/rides'),
+    ('office', '/api/office/patients'),
+    ('office', '/api/office/drivers'),
+    ('driver', '/api/driver/history'),
+    ('community', '/api/community/rides'),
+    ('community', '/api/community/patients'),
+]
+
+
+def listed_ids(body):
+    """Ids in the response's list, whichever key it is under"""
+    items = next(value for value in body.values() if isinstance(value, list))
+    return [item['id'] for item in items]
+
+
+def walk(client, path, headers, cursor_mode):
+    ids = []
+    page, cursor = 1, None
+    while True:
+        if cursor_mode:
+            query = f'limit={LIMIT}' + (f'&cursor={cursor}' if cursor else '')
+        else:
+            query = f'limit={LIMIT}&page={page}'
+        response = client.get(f'{path}?{query}', headers=headers)
+        if response.status_code != 200:
+            raise SystemExit(f'{path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}')
+        body = response.get_json()
+        ids.extend(listed_ids(body))
+        if not body['hasMore']:
+            return ids
+        cursor = body['nextCursor']
+        page += 1
+
+
+def check(storage):
+    from src.models.ids import configure_ids
+    configure_ids(storage=storage)
+    from src.models.ems_models import db, User, Patient, Ride
+    from src.benchmarks.harness import create_app, seed, auth_headers
+
+    app = create_app()
+    failures = []
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=30, rides=65, drivers=12)
+        # Three distinct sort values per table, so pages end inside ties
+        tied = datetime(2030, 1, 1)
+        for model, column in ((Ride, 'created_at'), (Patient, 'registered_date'), (User, 'created_at')):
+            for i, row in enumerate(model.query.all()):
+                setattr(row, column, tied + timedelta(days=i % 3))
+        db.session.commit()
+        headers = {role: auth_headers(users[role]) for role in ('office', 'driver', 'community')}
+
+    client = app.test_client()
+    for role, path in ENDPOINTS:
+        with app.app_context():
+            by_page = walk(client, path, headers[role], cursor_mode=False)
+        with app.app_context():
+            by_cursor = walk(client, path, headers[role], cursor_mode=True)
+        line = f'[{storage}] {path}: {len(by_cursor)} rows by cursor, {len(by_page)} by page'
+        if sorted(by_cursor) != sorted(by_page) or len(set(by_cursor)) != len(by_cursor):
+            failures.append(line)
+            print(f'✗ {line}')
+        else:
+            print(f'✓ {line}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that cursor pagination returns every row')
+    parser.add_argument('--storage', choices=STORAGE_MODES)
+    args = parser.parse_args()
+
+    if args.storage:
+        sys.exit(1 if check(args.storage) else 0)
+
+    failed = [
+        storage for storage in STORAGE_MODES
+        if subprocess.run([sys.executable, os.path.abspath(__file__), '--storage', storage]).returncode != 0
+    ]
+    if failed:
+        print(f'\nCursor walks skip or repeat rows with {", ".join(failed)} ID storage.')
+        sys.exit(1)
+    print('\n✓ Cursor walks return every row in both ID storage modes.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+SQL statement count check
+
+Calls every list endpoint twice: once on a small dataset with limit=5 and
+once after adding many more rides, patients and drivers with limit=50.
+Each response carries its statement count in the X-SQL-Statements header.
+The check fails if any endpoint's count grows with the number of rows it
+returns, which is the signature of an N+1 lazy load.
+
+Usage: python benchmarks/check_query_counts.py
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, User, DriverProfile
+from src.benchmarks.harness import create_app, seed, add_patients, add_rides, auth_headers
+from src.services.query_counter import HEADER_NAME
+
+ENDPOINTS = [
+    ('office', '/api/office/rides/urgent'),
+    ('office', '/api/office/rides/today-schedule'),
+    ('office', '/api/office/rides/schedule?days=7'),
+    ('office', '/api/office/rides/nearby?lat=19.35&lng=99.15&radius=5'),
+    ('office', '/api/office/drivers/live-status'),
+    ('office', '/api/office/rides'),
+    ('office', '/api/office/patients'),
+    ('office', '/api/office/drivers'),
+    ('driver', '/api/driver/jobs'),
+    ('driver', '/api/driver/jobs/nearby?lat=19.35&lng=99.15&k=20'),
+    ('driver', '/api/driver/history'),
+    ('community', '/api/community/rides/recent'),
+    ('community', '/api/community/patients'),
+    ('community', '/api/community/rides'),
+    ('office', '/api/news/manage'),
+    (None, '/api/news/'),
+]
+
+# Endpoints whose per-row queries are known and tracked, with the reason
+KNOWN_GROWTH = {}
+
+
+def add_drivers(count, offset):
+    drivers = [
+        User(name=f'Extra Driver {offset + i}', email=f'extra{offset + i}@bench.local', role='driver', password_hash='!')
+        for i in range(count)
+    ]
+    db.session.add_all(drivers)
+    db.session.flush()
+    for driver in drivers:
+        db.session.add(DriverProfile(user_id=driver.id, license_plate=f'EXTRA-{driver.email}'))
+    return drivers
+
+
+def measure(app, headers, limit):
+    client = app.test_client()
+    counts = {}
+    for role, path in ENDPOINTS:
+        # A fresh app context gives each request its own session, so lazy
+        # loads cannot be served from objects loaded by earlier requests
+        with app.app_context():
+            separator = '&' if '?' in path else '?'
+            response = client.get(f'{path}{separator}limit={limit}', headers=headers.get(role, {}))
+            # Streamed bodies hold the request context until closed, as a WSGI server would
+            response.close()
+        if response.status_code != 200:
+            raise SystemExit(f'{path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}')
+        counts[path] = int(response.headers[HEADER_NAME])
+    return counts
+
+
+def main():
+    app = create_app()
+    failures = []
+
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=20, rides=20, drivers=3)
+        headers = {role: auth_headers(users[role]) for role in ('office', 'driver', 'community')}
+        now = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+
+        add_rides(2, users['patients'], users['community'], [users['driver']], status='ASSIGNED', appointment_time=now)
+        add_rides(2, users['patients'], users['community'], users['drivers'], status='PENDING')
+        db.session.commit()
+        small = measure(app, headers, limit=5)
+
+        drivers = users['drivers'] + add_drivers(60, 0)
+        add_patients(100, users['community'])
+        add_rides(200, users['patients'], users['community'], drivers)
+        add_rides(60, users['patients'], users['community'], [users['driver']], status='ASSIGNED', appointment_time=now)
+        add_rides(60, users['patients'], users['community'], drivers, status='PENDING')
+        db.session.commit()
+        large = measure(app, headers, limit=50)
+
+    for _, path in ENDPOINTS:
+        line = f'{path}: {small[path]} -> {large[path]} statements'
+        if large[path] > small[path]:
+            if path in KNOWN_GROWTH:
+                print(f'  {line} (known: {KNOWN_GROWTH[path]})')
+                continue
+            failures.append(line)
+            print(f'✗ {line}')
+        else:
+            print(f'✓ {line}')
+
+    if failures:
+        print('\nStatement count grows with page size:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\n✓ Statement counts are independent of page size.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Query plan check
+
+Calls each list/dashboard endpoint, captures the SELECTs it issues, runs
+EXPLAIN on them and fails if any filtered query falls back to a full table
+scan. Unfiltered reads (e.g. a plain COUNT(*) of a table) are allowed.
+
+Runs against in-memory SQLite by default; pass a SQLAlchemy URI to check a
+MySQL database instead (it must be empty: the script seeds it).
+
+Usage: python benchmarks/check_query_plans.py [database_uri]
+"""
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db
+from src.benchmarks.harness import create_app, seed, auth_headers, capture_statements
+
+ENDPOINTS = [
+    ('office', '/api/office/stats'),
+    ('office', '/api/office/rides/urgent'),
+    ('office', '/api/office/rides/today-schedule'),
+    ('office', '/api/office/rides/schedule?from=2030-01-01&days=7'),
+    ('office', '/api/office/rides/nearby?lat=19.35&lng=99.15&radius=3'),
+    ('office', '/api/office/rides/nearby?lat=19.35&lng=99.15&k=5'),
+    ('office', '/api/office/drivers/live-status'),
+    ('office', '/api/office/drivers/available?time=2030-01-01T09:00:00'),
+    ('office', '/api/office/rides'),
+    ('office', '/api/office/rides?status=PENDING'),
+    ('office', '/api/office/rides?search=ผู้ป่วย'),
+    ('office', '/api/office/patients'),
+    ('office', '/api/office/patients?search=ผู้ป่วย'),
+    ('office', '/api/office/drivers'),
+    ('driver', '/api/driver/jobs'),
+    ('driver', '/api/driver/jobs/nearby?lat=19.35&lng=99.15&k=5'),
+    ('driver', '/api/driver/history'),
+    ('driver', '/api/driver/history?period=this_month'),
+    ('driver', '/api/driver/profile'),
+    ('community', '/api/community/stats'),
+    ('community', '/api/community/rides/recent'),
+    ('community', '/api/community/patients'),
+    ('community', '/api/community/patients?search=ผู้ป่วย'),
+    ('community', '/api/community/rides'),
+    ('community', '/api/community/rides?search=ผู้ป่วย'),
+    (None, '/api/news/'),
+    ('office', '/api/news/manage'),
+]
+
+# (path, table) pairs with a known, tracked full scan and the reason for it
+KNOWN_SCANS = {
+    # Combined into one SELECT with the filtered counts, so the WHERE check does not skip it
+    ('/api/office/stats', 'patients'): 'unfiltered COUNT(*) of all patients',
+}
+
+
+def compact(statement):
+    statement = ' '.join(statement.split())
+    return re.sub(r'SELECT (.*?) FROM', 'SELECT ... FROM', statement)
+
+
+def sqlite_scans(connection, statement, parameters, tables):
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    for row in rows:
+        detail = row[-1]
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if match and match.group(1) in tables:
+            yield match.group(1), detail
+
+
+def mysql_scans(connection, statement, parameters, tables):
+    result = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+    for row in result.mappings():
+        if row['type'] == 'ALL' and row['table'] in tables:
+            yield row['table'], f"type=ALL rows={row['rows']}"
+
+
+def main():
+    database_uri = sys.argv[1] if len(sys.argv) > 1 else 'sqlite://'
+    app = create_app(database_uri)
+    failures = []
+
+    with app.app_context():
+        db.create_all()
+        users = seed()
+        headers = {role: auth_headers(users[role]) for role in ('office', 'driver', 'community')}
+        tables = set(db.metadata.tables)
+        explain = sqlite_scans if db.engine.dialect.name == 'sqlite' else mysql_scans
+        client = app.test_client()
+
+        pending = list(ENDPOINTS)
+        while pending:
+            role, path = pending.pop(0)
+            with capture_statements() as statements:
+                response = client.get(path, headers=headers.get(role, {}))
+            if response.status_code != 200:
+                failures.append(f'{path}: HTTP {response.status_code}')
+                continue
+
+            seen = set()
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith('SELECT') or statement in seen:
+                    continue
+                seen.add(statement)
+                if not re.search(r'\bWHERE\b', statement, re.IGNORECASE):
+                    continue
+                with db.engine.connect() as connection:
+                    for table, detail in explain(connection, statement, parameters, tables):
+                        if (path, table) in KNOWN_SCANS:
+                            print(f"  known scan on {table} in {path}: {KNOWN_SCANS[(path, table)]}")
+                            continue
+                        failures.append(f'{path}: full scan of {table} ({detail})\n    {compact(statement)}')
+            print(f"✓ {path}" if not any(f.startswith(f'{path}:') for f in failures) else f"✗ {path}")
+
+            # Check the keyset (cursor) query of paginated lists as well
+            body = response.get_json(silent=True)
+            if isinstance(body, dict) and body.get('nextCursor') and 'cursor=' not in path:
+                separator = '&' if '?' in path else '?'
+                pending.insert(0, (role, f"{path}{separator}limit=2&cursor={body['nextCursor']}"))
+
+    if failures:
+        print('\nTable scans found:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\n✓ No unexpected table scans.')
+
+
+if __name__ == '__main__':
+    main()
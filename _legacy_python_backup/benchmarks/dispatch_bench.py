@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Batch dispatch benchmark
+
+Plans a day of pending rides (default 500, 07:00-17:00) for a fleet of
+drivers (default 100, 80% with a live GPS position) around the northern
+towns, in greedy and in optimal mode. For each mode it prints:
+- the planning time
+- how many rides were assigned
+- the total pickup distance
+
+It then runs the full path through the API on an in-memory database:
+POST /api/office/dispatch/plan followed by /dispatch/commit, with their
+latency and statement counts.
+
+Usage: python benchmarks/dispatch_bench.py [--rides 500] [--drivers 100] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, Ride
+from src.benchmarks.harness import create_app, seed, add_rides, auth_headers, capture_statements
+from src.services.dispatch import DispatchRide, plan, MODES, UNLOCATED_COST_KM
+from src.services.driver_positions import position_store, Position
+from src.services.driver_schedule import driver_schedule
+
+TOWNS = [(19.9105, 99.8406), (19.1665, 99.9019), (19.4, 99.2)]
+
+
+def random_point(rng):
+    lat, lng = rng.choice(TOWNS)
+    return round(lat + rng.gauss(0, 0.1), 6), round(lng + rng.gauss(0, 0.1), 6)
+
+
+def synthetic(ride_count, driver_count, rng):
+    day = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    rides = [DispatchRide(f'ride-{i}', day + timedelta(minutes=rng.randrange(0, 600, 5)), *random_point(rng))
+             for i in range(ride_count)]
+    drivers = [f'driver-{i}' for i in range(driver_count)]
+    origins = {driver: random_point(rng) for driver in drivers if rng.random() < 0.8}
+    return rides, drivers, origins
+
+
+def located_distance(assignments):
+    return sum(a.distance_km for a in assignments if a.distance_km < UNLOCATED_COST_KM)
+
+
+def bench_plan(args):
+    rides, drivers, origins = synthetic(args.rides, args.drivers, random.Random(42))
+    print(f"Planning {args.rides} rides for {args.drivers} drivers ({len(origins)} located)")
+    for mode in MODES:
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            assignments, unassigned = plan(rides, drivers, origins, timedelta(hours=1), mode)
+            best = min(best, time.perf_counter() - started)
+        print(f"  {mode:<8} {best * 1000:8.1f} ms   assigned {len(assignments)}/{len(rides)}   "
+              f"pickup distance {located_distance(assignments):,.1f} km")
+
+
+def bench_api(args):
+    app = create_app()
+    driver_schedule.invalidate()
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=200, rides=0, drivers=args.drivers)
+        for patient in users['patients']:
+            lat, lng = random_point(rng)
+            patient.latitude, patient.longitude = Decimal(str(lat)), Decimal(str(lng))
+        start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for i in range(args.rides):
+            add_rides(1, users['patients'][i % len(users['patients']):], users['community'], users['drivers'],
+                      status='PENDING', appointment_time=start + timedelta(hours=7, minutes=rng.randrange(0, 600, 5)))
+        db.session.commit()
+        received_at = datetime.utcnow()
+        for driver in users['drivers']:
+            if rng.random() < 0.8:
+                lat, lng = random_point(rng)
+                position_store.update(driver.id, Position(lat, lng, received_at, received_at, None, None, None))
+        headers = auth_headers(users['office'])
+
+        client = app.test_client()
+        body = {'from': start.isoformat(), 'to': (start + timedelta(days=1)).isoformat()}
+        with capture_statements() as plan_statements:
+            started = time.perf_counter()
+            proposal = client.post('/api/office/dispatch/plan', json=body, headers=headers).get_json()
+            plan_ms = (time.perf_counter() - started) * 1000
+        with capture_statements() as commit_statements:
+            started = time.perf_counter()
+            response = client.post('/api/office/dispatch/commit', json={'assignments': proposal['assignments']},
+                                   headers=headers)
+            commit_ms = (time.perf_counter() - started) * 1000
+        assigned = Ride.query.filter_by(status='ASSIGNED').count()
+    position_store.clear()
+
+    print(f"API plan:    {plan_ms:8.1f} ms, {len(plan_statements)} statement(s), "
+          f"{len(proposal['assignments'])} assignments, {proposal['totalPickupDistanceKm']:,.1f} km")
+    print(f"API commit:  {commit_ms:8.1f} ms, {len(commit_statements)} statement(s), "
+          f"HTTP {response.status_code}, {assigned} rides now ASSIGNED")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure batch dispatch planning')
+    parser.add_argument('--rides', type=int, default=500)
+    parser.add_argument('--drivers', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    bench_plan(args)
+    bench_api(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Export benchmark
+
+Loads a growing number of rides into a temporary SQLite file, all within
+one month. At each size it streams GET /api/exports/rides for that month
+as CSV and as XLSX. For each it prints the time, the response size and
+the peak Python memory (tracemalloc). Peak memory should stay flat as the
+ride count grows, since rows are written a chunk at a time.
+
+It then runs the same export as a background job and prints how long the
+job took to finish.
+
+Usage: python benchmarks/export_bench.py [--sizes 1000,10000,50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db
+from src.benchmarks.harness import create_app, seed, add_rides, auth_headers
+from src.services.exports import export_jobs
+
+MONTH_START = datetime(2030, 1, 1)
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, size
+
+
+def exported(app, headers, fmt):
+    def read():
+        response = app.test_client().get(f'/api/exports/rides?from=2030-01-01&to=2030-02-01&format={fmt}',
+                                          headers=headers, buffered=False)
+        if response.status_code != 200:
+            raise SystemExit(f'Export failed: {response.get_data(as_text=True)}')
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return size
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure time and peak memory of streamed exports')
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='export-')
+    app = create_app(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    app.config['EXPORT_DIR'] = os.path.join(directory, 'exports')
+    export_jobs.init_app(app)
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=500, rides=0, drivers=10)
+        headers = auth_headers(users['office'])
+        loaded = 0
+        print(f"{'rides':>8}  {'CSV':>30}  {'XLSX':>30}")
+        for size in (int(value) for value in args.sizes.split(',')):
+            for offset in range(loaded, size, 1000):
+                add_rides(min(1000, size - offset), users['patients'], users['community'], users['drivers'],
+                          status='COMPLETED', appointment_time=MONTH_START + timedelta(hours=offset // 1000 % 700))
+            db.session.commit()
+            loaded = size
+            cells = []
+            for fmt in ('csv', 'xlsx'):
+                ms, mb, length = measure(exported(app, headers, fmt))
+                cells.append(f'{ms:7.0f} ms {length / 1024 / 1024:6.1f} MB out {mb:5.1f} MB peak')
+            print(f'{size:>8,}  ' + '  '.join(f'{cell:>30}' for cell in cells))
+
+    response = app.test_client().post('/api/exports/rides/jobs?from=2030-01-01&to=2030-02-01&format=xlsx',
+                                      headers=headers)
+    job_id = response.get_json()['job']['id']
+    started = time.perf_counter()
+    while True:
+        job = app.test_client().get(f'/api/exports/jobs/{job_id}', headers=headers).get_json()['job']
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    if job['status'] == 'failed':
+        raise SystemExit(f"Export job failed: {job['error']}")
+    download = app.test_client().get(f'/api/exports/jobs/{job_id}/download', headers=headers)
+    sheets = zipfile.ZipFile(BytesIO(download.get_data())).namelist()
+    print(f"Job:      {job['rows']:,} rows in {elapsed * 1000:.0f} ms, {len(download.get_data()) / 1024 / 1024:.1f} MB "
+          f"download ({len(sheets)} parts)")
+    download.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Geospatial index benchmark
+
+Loads 1M patients spread over northern Thailand (denser around a few town
+centres) into a temporary SQLite file, then answers radius and k-nearest
+queries from a set of driver positions in three ways:
+
+- load everything: read every patient's coordinates and filter in Python
+  (the only option without an index)
+- bounding box: latitude/longitude BETWEEN on the unindexed Numeric columns
+- geohash: prefix-range scans on the indexed geohash column
+
+It prints the average time per query and checks that all three return the
+same patients.
+
+Usage: python benchmarks/geo_index_bench.py [--patients 1000000] [--queries 20]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import select
+from src.models.ems_models import db, User, Patient
+from src.models.ids import new_id
+from src.benchmarks.harness import create_app
+from src.services.geo_index import encode_geohash, haversine_km, within_radius, nearest, EARTH_RADIUS_KM
+
+# Chiang Rai, Chiang Mai, Phayao, Nan, Lampang
+TOWNS = [(19.9105, 99.8406), (18.7883, 98.9853), (19.1665, 99.9019), (18.7756, 100.7730), (18.2888, 99.4909)]
+REGION = ((17.5, 20.5), (97.5, 101.5))
+RADII_KM = (1, 5, 20)
+K = 10
+
+
+def random_point(rng):
+    if rng.random() < 0.7:
+        lat, lng = rng.choice(TOWNS)
+        return lat + rng.gauss(0, 0.15), lng + rng.gauss(0, 0.15)
+    return rng.uniform(*REGION[0]), rng.uniform(*REGION[1])
+
+
+def load(count, batch=20000, seed_value=42):
+    rng = random.Random(seed_value)
+    community = User(name='Community User', email='community@bench.local', role='community', password_hash='!')
+    db.session.add(community)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    patients = Patient.__table__
+    for offset in range(0, count, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, count)):
+            lat, lng = random_point(rng)
+            lat, lng = round(lat, 6), round(lng, 6)
+            rows.append({
+                'id': new_id(), 'full_name': f'ผู้ป่วย {i}', 'contact_phone': '081-000-0000',
+                'current_address': {}, 'registered_date': now, 'registered_by_id': community.id,
+                'latitude': Decimal(str(lat)), 'longitude': Decimal(str(lng)),
+                'geohash': encode_geohash(lat, lng),
+            })
+        with db.engine.begin() as connection:
+            connection.execute(patients.insert(), rows)
+
+
+def scan_all(lat, lng, radius_km):
+    rows = db.session.execute(select(Patient.id, Patient.latitude, Patient.longitude)).all()
+    return {row.id for row in rows if haversine_km(lat, lng, float(row.latitude), float(row.longitude)) <= radius_km}
+
+
+def bounding_box(lat, lng, radius_km):
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lng_delta = lat_delta / math.cos(math.radians(lat))
+    rows = db.session.execute(select(Patient.id, Patient.latitude, Patient.longitude).where(
+        Patient.latitude.between(lat - lat_delta, lat + lat_delta),
+        Patient.longitude.between(lng - lng_delta, lng + lng_delta),
+    )).all()
+    return {row.id for row in rows if haversine_km(lat, lng, float(row.latitude), float(row.longitude)) <= radius_km}
+
+
+def coordinates():
+    # The same three columns the other strategies read, so only the lookup differs
+    return db.session.query(Patient.id, Patient.latitude, Patient.longitude)
+
+
+def geohash(lat, lng, radius_km):
+    return {row.id for row, _ in within_radius(coordinates(), lat, lng, radius_km)}
+
+
+def timed(function, points, *args):
+    results = []
+    began = time.perf_counter()
+    for lat, lng in points:
+        results.append(function(lat, lng, *args))
+        db.session.expunge_all()
+    return (time.perf_counter() - began) / len(points), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare radius and nearest-neighbour query strategies')
+    parser.add_argument('--patients', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='geo-index-'), 'bench.db')
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        began = time.perf_counter()
+        load(args.patients)
+        print(f"Loaded {args.patients:,} patients in {time.perf_counter() - began:.1f}s\n")
+
+        rng = random.Random(7)
+        points = [random_point(rng) for _ in range(args.queries)]
+        # Loading everything is slow enough that a few positions are plenty
+        scan_points = points[:3]
+
+        print(f"{'query':<14} {'load all ms':>12} {'bbox ms':>10} {'geohash ms':>11} {'avg hits':>9}")
+        for radius_km in RADII_KM:
+            scan_seconds, scanned = timed(scan_all, scan_points, radius_km)
+            box_seconds, boxed = timed(bounding_box, points, radius_km)
+            hash_seconds, hashed = timed(geohash, points, radius_km)
+            if boxed != hashed or scanned != hashed[:len(scan_points)]:
+                raise SystemExit(f'{radius_km} km: strategies returned different patients')
+            hits = sum(len(found) for found in hashed) / len(hashed)
+            print(f"{f'{radius_km} km radius':<14} {scan_seconds * 1000:>12.1f} {box_seconds * 1000:>10.1f} "
+                  f"{hash_seconds * 1000:>11.1f} {hits:>9.0f}")
+
+        knn_seconds, found = timed(lambda lat, lng: nearest(coordinates(), lat, lng, K), points)
+        print(f"{f'{K} nearest':<14} {'':>12} {'':>10} {knn_seconds * 1000:>11.1f} "
+              f"{sum(len(f) for f in found) / len(found):>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Shared setup for the benchmark and check scripts.
+
+Builds a throwaway Flask app with the real blueprints on its own database
+(in-memory SQLite by default) so scripts never touch database/app.db.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+import jwt
+from flask import Flask
+from sqlalchemy import event
+from src.models.ems_models import db, User, DriverProfile, Patient, Ride, NewsArticle
+from src.routes.auth import auth_bp
+from src.routes.community import community_bp
+from src.routes.driver import driver_bp
+from src.routes.office import office_bp
+from src.routes.news import news_bp
+from src.routes.user import user_bp
+from src.routes.exports import exports_bp
+from src.routes.diagnostics import diagnostics_bp
+from src.services.query_counter import query_counter
+
+SECRET_KEY = 'benchmark-secret-key-not-for-production-use'
+RIDE_STATUSES = ['PENDING', 'ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED']
+
+
+def create_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = SECRET_KEY
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQL_STATEMENT_COUNT'] = True
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(community_bp, url_prefix='/api/community')
+    app.register_blueprint(driver_bp, url_prefix='/api/driver')
+    app.register_blueprint(office_bp, url_prefix='/api/office')
+    app.register_blueprint(news_bp, url_prefix='/api/news')
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    app.register_blueprint(diagnostics_bp, url_prefix='/api/diagnostics')
+    db.init_app(app)
+    query_counter.init_app(app)
+    return app
+
+
+def seed(patients=200, rides=1000, drivers=10, seed_value=42):
+    """Populate the current app's database and return the users by role"""
+    rng = random.Random(seed_value)
+    office = User(name='Office Operator', email='office@bench.local', role='office', password_hash='!')
+    community = User(name='Community User', email='community@bench.local', role='community', password_hash='!')
+    driver_users = [
+        User(name=f'Driver {i}', email=f'driver{i}@bench.local', role='driver', password_hash='!')
+        for i in range(drivers)
+    ]
+    db.session.add_all([office, community] + driver_users)
+    db.session.flush()
+    for i, driver in enumerate(driver_users):
+        db.session.add(DriverProfile(user_id=driver.id, license_plate=f'BENCH-{i:04d}'))
+
+    now = datetime.utcnow()
+    patient_rows = add_patients(patients, community, rng=rng, now=now)
+    add_rides(rides, patient_rows, community, driver_users, rng=rng, now=now)
+
+    db.session.add(NewsArticle(title='ข่าว', content='เนื้อหา', author='Office Operator',
+                               status='published', published_date=now))
+    db.session.commit()
+    return {'office': office, 'community': community, 'driver': driver_users[0], 'drivers': driver_users,
+            'patients': patient_rows}
+
+
+def add_patients(count, registered_by, rng=None, now=None):
+    rng = rng or random.Random(count)
+    now = now or datetime.utcnow()
+    patients = []
+    for i in range(count):
+        patients.append(Patient(
+            full_name=f'นาย ผู้ป่วย ทดสอบ{i}',
+            title='นาย',
+            first_name='ผู้ป่วย',
+            last_name=f'ทดสอบ{i}',
+            contact_phone='081-000-0000',
+            patient_types=['ผู้สูงอายุ'],
+            current_address={'village': f'หมู่ {i % 12 + 1}'},
+            latitude=Decimal('19.3') + Decimal(rng.randint(0, 100000)) / Decimal(1000000),
+            longitude=Decimal('99.1') + Decimal(rng.randint(0, 100000)) / Decimal(1000000),
+            registered_by_id=registered_by.id,
+            registered_date=now - timedelta(days=rng.randint(0, 365))
+        ))
+    db.session.add_all(patients)
+    db.session.flush()
+    return patients
+
+
+def add_rides(count, patients, requester, drivers, status=None, appointment_time=None, rng=None, now=None):
+    """Add rides spread over the last year, or pinned to a status/appointment time"""
+    rng = rng or random.Random(count)
+    now = now or datetime.utcnow()
+    for i in range(count):
+        ride_status = status or rng.choice(RIDE_STATUSES)
+        created_at = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+        db.session.add(Ride(
+            patient_id=patients[i % len(patients)].id,
+            requester_id=requester.id,
+            driver_id=None if ride_status == 'PENDING' else drivers[i % len(drivers)].id,
+            pickup_location='ตามที่อยู่ผู้ป่วย',
+            destination='โรงพยาบาล',
+            appointment_time=appointment_time or created_at + timedelta(days=rng.randint(0, 14), hours=rng.randint(6, 16)),
+            status=ride_status,
+            created_at=created_at,
+            updated_at=created_at
+        ))
+
+
+def auth_headers(user):
+    token = jwt.encode({
+        'user_id': user.id,
+        'email': user.email,
+        'role': user.role,
+        'iat': datetime.utcnow(),
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, SECRET_KEY, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+@contextmanager
+def capture_statements():
+    """Collect (statement, parameters) for every SQL statement executed inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
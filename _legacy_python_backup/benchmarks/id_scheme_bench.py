@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Primary key scheme benchmark
+
+Loads the same ride-shaped table three times, once per key scheme:
+random UUIDv4 in CHAR(36) (the current default), UUIDv7 in CHAR(36), and
+UUIDv7 in BINARY(16). For each scheme it reports:
+
+- insert throughput overall and for the last 10% of rows, where random keys
+  slow down once the index no longer fits in cache
+- the newest 1000 rides and a 1% window of history, read through the
+  primary key for UUIDv7 and through the created_at index for UUIDv4
+- 10k random point lookups by id
+- the size on disk
+
+By default each scheme gets its own SQLite file in a temporary directory.
+Pass a MySQL URI to run against MySQL instead; the bench_* tables are
+dropped and recreated there.
+
+Usage: python benchmarks/id_scheme_bench.py [--rows 2000000] [--batch 10000] [database_uri]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import (BINARY, Column, DateTime, Index, MetaData, String, Table, bindparam,
+                        create_engine, select, text)
+from src.models.ids import uuid7
+
+SCHEMES = {
+    'uuid4 char(36)': (lambda: str(uuid.uuid4()), lambda: String(36), True),
+    'uuid7 char(36)': (uuid7, lambda: String(36), False),
+    'uuid7 binary(16)': (lambda: uuid.UUID(uuid7()).bytes, lambda: BINARY(16), False),
+}
+DRIVERS = 200
+STATUSES = ('PENDING', 'ASSIGNED', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED')
+
+
+def build_table(name, key_type):
+    metadata = MetaData()
+    table = Table(
+        name, metadata,
+        Column('id', key_type(), primary_key=True),
+        Column('patient_id', key_type(), nullable=False),
+        Column('driver_id', key_type()),
+        Column('status', String(20), nullable=False),
+        Column('appointment_time', DateTime, nullable=False),
+        Column('created_at', DateTime, nullable=False),
+        Index(f'ix_{name}_driver_created', 'driver_id', 'created_at'),
+        Index(f'ix_{name}_created', 'created_at'),
+    )
+    return metadata, table
+
+
+def load(engine, table, make_id, rows, batch):
+    drivers = [make_id() for _ in range(DRIVERS)]
+    patients = [make_id() for _ in range(rows // 20 + 1)]
+    start = datetime(2024, 1, 1)
+    rng = random.Random(7)
+    samples = []
+    window = (int(rows * 0.90), int(rows * 0.91))
+    bounds = {}
+    tail_start = int(rows * 0.9)
+    tail_seconds = 0.0
+
+    began = time.perf_counter()
+    for offset in range(0, rows, batch):
+        chunk = []
+        for i in range(offset, min(offset + batch, rows)):
+            created = start + timedelta(seconds=15 * i)
+            row = {
+                'id': make_id(),
+                'patient_id': rng.choice(patients),
+                'driver_id': rng.choice(drivers),
+                'status': rng.choice(STATUSES),
+                'appointment_time': created + timedelta(days=rng.randint(0, 14)),
+                'created_at': created,
+            }
+            if i in window:
+                bounds[i] = (row['id'], created)
+            if rng.random() < 0.01:
+                samples.append(row['id'])
+            chunk.append(row)
+        batch_began = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(table.insert(), chunk)
+        if offset >= tail_start:
+            tail_seconds += time.perf_counter() - batch_began
+    total_seconds = time.perf_counter() - began
+
+    return {
+        'insert_rate': rows / total_seconds,
+        'tail_rate': (rows - tail_start) / tail_seconds if tail_seconds else 0.0,
+        'window': (bounds[window[0]], bounds[window[1]]),
+        'samples': rng.sample(samples, min(10000, len(samples))),
+    }
+
+
+def timed(engine, statement, params=None, repeat=3):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        with engine.connect() as connection:
+            rows = connection.execute(statement, params or {}).fetchall()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(rows)
+
+
+def run_reads(engine, table, loaded, by_created_at):
+    (low_id, low_created), (high_id, high_created) = loaded['window']
+    if by_created_at:
+        recent = select(table).order_by(table.c.created_at.desc()).limit(1000)
+        window = select(table).where(table.c.created_at.between(low_created, high_created))
+    else:
+        recent = select(table).order_by(table.c.id.desc()).limit(1000)
+        window = select(table).where(table.c.id.between(low_id, high_id))
+
+    results = {'recent': timed(engine, recent), 'window': timed(engine, window)}
+
+    lookup = select(table.c.id, table.c.status).where(table.c.id == bindparam('id'))
+    began = time.perf_counter()
+    with engine.connect() as connection:
+        for key in loaded['samples']:
+            connection.execute(lookup, {'id': key}).first()
+    results['lookups'] = (time.perf_counter() - began, len(loaded['samples']))
+    return results
+
+
+def storage_bytes(engine, table, path):
+    if engine.dialect.name == 'sqlite':
+        return os.path.getsize(path)
+    with engine.connect() as connection:
+        connection.execute(text(f'ANALYZE TABLE `{table.name}`')).fetchall()
+        return connection.execute(text(
+            'SELECT data_length + index_length FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = :name'
+        ), {'name': table.name}).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare primary key schemes on a ride-shaped table')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('database_uri', nargs='?')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='id-bench-')
+    print(f"{args.rows:,} rows per scheme\n")
+    for number, (label, (make_id, key_type, by_created_at)) in enumerate(SCHEMES.items()):
+        path = os.path.join(workdir, f'scheme{number}.db')
+        engine = create_engine(args.database_uri or f'sqlite:///{path}')
+        metadata, table = build_table(f'bench_rides_{number}', key_type)
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+
+        loaded = load(engine, table, make_id, args.rows, args.batch)
+        reads = run_reads(engine, table, loaded, by_created_at)
+        size = storage_bytes(engine, table, path)
+        engine.dispose()
+
+        lookup_seconds, lookups = reads['lookups']
+        print(label)
+        print(f"  insert:         {loaded['insert_rate']:>10,.0f} rows/s overall, "
+              f"{loaded['tail_rate']:,.0f} rows/s for the last 10%")
+        print(f"  newest 1000:    {reads['recent'][0] * 1000:>10.1f} ms")
+        print(f"  1% window:      {reads['window'][0] * 1000:>10.1f} ms ({reads['window'][1]:,} rows)")
+        print(f"  point lookups:  {lookup_seconds / max(lookups, 1) * 1e6:>10.1f} µs each ({lookups:,})")
+        print(f"  size on disk:   {size / 1024 / 1024:>10.1f} MiB\n")
+
+
+if __name__ == '__main__':
+    main()
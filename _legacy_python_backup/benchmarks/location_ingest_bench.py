@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Driver location ingestion benchmark
+
+Simulates a fleet of drivers sending GPS pings to /api/driver/location
+from several threads. Meanwhile one thread polls the office live-status
+endpoint. The history writer persists to a temporary SQLite file.
+
+It prints:
+- pings accepted per second
+- live-status latency (p50/p99)
+- the statements per live-status call
+- how many pings the history writer stored or dropped
+
+Usage: python benchmarks/location_ingest_bench.py [--drivers 500] [--threads 8] [--duration 10] [--per-request 1]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, DriverLocation
+from src.benchmarks.harness import create_app, seed, auth_headers, capture_statements
+from src.services.driver_positions import location_history, position_store
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def send_pings(app, headers, per_request, stop, counts, index):
+    client = app.test_client()
+    rng = random.Random(index)
+    sent = 0
+    while not stop.is_set():
+        driver_headers = rng.choice(headers)
+        pings = [{'lat': 19.9 + rng.uniform(-0.1, 0.1), 'lng': 99.8 + rng.uniform(-0.1, 0.1),
+                  'speed': rng.uniform(0, 80)} for _ in range(per_request)]
+        response = client.post('/api/driver/location', json={'pings': pings}, headers=driver_headers)
+        if response.status_code == 202:
+            sent += per_request
+    counts[index] = sent
+
+
+def poll_live_status(app, headers, stop, latencies):
+    client = app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get('/api/office/drivers/live-status', headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure GPS ping ingestion throughput')
+    parser.add_argument('--drivers', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--per-request', type=int, default=1, help='pings batched into each request')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='location-ingest-'), 'bench.db')
+    app = create_app(f'sqlite:///{path}')
+    app.config['AUTH_STATELESS'] = True
+    location_history.init_app(app)
+    position_store.init_app(app)
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=50, rides=200, drivers=args.drivers)
+        driver_headers = [auth_headers(driver) for driver in users['drivers']]
+        office_headers = auth_headers(users['office'])
+
+    stop = threading.Event()
+    counts = [0] * args.threads
+    latencies = []
+    threads = [threading.Thread(target=send_pings, args=(app, driver_headers, args.per_request, stop, counts, i))
+               for i in range(args.threads)]
+    threads.append(threading.Thread(target=poll_live_status, args=(app, office_headers, stop, latencies)))
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    location_history.shutdown()
+
+    with app.app_context():
+        with capture_statements() as statements:
+            app.test_client().get('/api/office/drivers/live-status', headers=office_headers)
+        stored = DriverLocation.query.count()
+    writer = location_history.stats()
+    print(f"Pings accepted:      {sum(counts):,} ({sum(counts) / elapsed:,.0f}/s with {args.threads} threads)")
+    print(f"Live status:         p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms, "
+          f"{len(statements)} statement(s) for {args.drivers} drivers")
+    print(f"History rows:        {stored:,} stored in {writer['batches']} batches, {writer['dropped']:,} dropped")
+
+
+if __name__ == '__main__':
+    main()
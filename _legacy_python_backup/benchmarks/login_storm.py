@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark
+
+Measures p50/p99 latency of a regular ride endpoint on its own and while
+a number of threads hammer /api/auth/login, to show how much the password
+hashing pool isolates the rest of the API during shift change.
+
+Requires the seeded development users (run seed_test_users.py or seed_data.py).
+Usage: python benchmarks/login_storm.py [--storm-threads 32] [--duration 10]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.main import app
+
+DRIVER_CREDENTIALS = {'email': 'driver1@wecare.dev', 'password': 'password'}
+OFFICE_CREDENTIALS = {'email': 'office1@wecare.dev', 'password': 'password'}
+PROBE_PATH = '/api/office/rides/urgent'
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def get_token(client, credentials):
+    response = client.post('/api/auth/login', json=credentials)
+    if response.status_code != 200:
+        raise SystemExit(f"Login for {credentials['email']} failed ({response.status_code}). Seed the users first.")
+    return response.get_json()['token']
+
+
+def probe(token, stop, latencies):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get(PROBE_PATH, headers=headers).get_data()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def storm(stop, statuses, lock):
+    client = app.test_client()
+    while not stop.is_set():
+        response = client.post('/api/auth/login', json=DRIVER_CREDENTIALS)
+        with lock:
+            statuses[response.status_code] += 1
+
+
+def run_phase(token, duration, probe_threads, storm_threads):
+    stop = threading.Event()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    threads = [threading.Thread(target=probe, args=(token, stop, latencies)) for _ in range(probe_threads)]
+    threads += [threading.Thread(target=storm, args=(stop, statuses, lock)) for _ in range(storm_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return latencies, statuses
+
+
+def report(label, latencies, statuses, duration):
+    print(f"{label}:")
+    print(f"  {PROBE_PATH}: {len(latencies)} requests, "
+          f"p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms")
+    if statuses:
+        total = sum(statuses.values())
+        breakdown = ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items()))
+        print(f"  /api/auth/login: {total} requests ({total / duration:.1f}/s) [{breakdown}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per phase')
+    parser.add_argument('--probe-threads', type=int, default=4)
+    parser.add_argument('--storm-threads', type=int, default=32)
+    args = parser.parse_args()
+
+    token = get_token(app.test_client(), OFFICE_CREDENTIALS)
+    print(f"hash workers={app.config['PASSWORD_HASH_WORKERS']} queue={app.config['PASSWORD_HASH_QUEUE_SIZE']}")
+
+    latencies, statuses = run_phase(token, args.duration, args.probe_threads, 0)
+    report('Baseline (no logins)', latencies, statuses, args.duration)
+
+    latencies, statuses = run_phase(token, args.duration, args.probe_threads, args.storm_threads)
+    report(f'Login storm ({args.storm_threads} threads)', latencies, statuses, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Patient name search benchmark
+
+Loads 500k patients with generated Thai names (with and without a title
+prefix) into a temporary SQLite file. Each search term is then run the
+way the list endpoints run it, as a COUNT plus the first page of 10, twice:
+once with the old full_name ILIKE '%...%' filter and once with the
+trigram index. It prints the time per search and the number of matches.
+The match counts differ where the index finds names the old filter missed
+(typed without the title, or with a different tone mark).
+
+Usage: python benchmarks/name_search_bench.py [--patients 500000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, User, Patient, PatientNameGram
+from src.models.ids import new_id
+from src.benchmarks.harness import create_app
+from src.services.name_search import normalize_name, gram_rows, patient_name_filter
+
+TITLES = ['นาย', 'นาง', 'นางสาว', 'นาย ', 'นาง ', '']
+# Names are built from syllables so the index sees a realistic spread of
+# distinct names; a few fixed names are mixed in so every search has hits
+SYLLABLES = ['สม', 'ชาย', 'หญิง', 'ศักดิ์', 'มา', 'นี', 'วิ', 'ชัย', 'กาน', 'ดา', 'อรุณ', 'ประ', 'เสริฐ', 'สุน',
+             'ทร', 'บุญ', 'มี', 'ทอง', 'ใบ', 'จันทร์', 'เพ็ญ', 'พร', 'ทิพย์', 'ศรี', 'สุ', 'ณัฐ', 'พล', 'ธนา',
+             'กร', 'กิต', 'ติ', 'วรา', 'ภรณ์', 'อัม', 'ใจ', 'ดี', 'สุข', 'รัก', 'สงบ', 'รุ่ง', 'เรือง', 'สวัสดิ์',
+             'คำ', 'แสง', 'วงศ์', 'ใหญ่', 'พึ่ง', 'งาม', 'ปัญ', 'ญา', 'เพชร', 'รัตน์', 'อินทร์', 'แก้ว', 'ใส',
+             'นพ', 'ดล', 'ภูมิ', 'ปิ', 'ยะ', 'อุ', 'ไร', 'วรรณ', 'เกียรติ', 'ลักษณ์', 'ธิ', 'ชุ', 'เดช']
+FIXED_NAMES = ['สมศักดิ์ แก้วใส', 'สมชาย ใจดี', 'มานี มีสุข', 'อรุณ รุ่งเรือง', 'บุญมี ทองคำ']
+SEARCHES = [
+    'สมศักดิ์ แก้วใส',   # full name, stored with a title
+    'นายสมชาย',          # title joined to the name
+    'แกวใส',             # tone mark left out
+    'เรือง',              # surname fragment
+    'ทองคำ',
+    'ไม่มีชื่อนี้',          # no match
+]
+
+
+def load(count, batch=10000, seed_value=42):
+    rng = random.Random(seed_value)
+    community = User(name='Community User', email='community@bench.local', role='community', password_hash='!')
+    db.session.add(community)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    patients = Patient.__table__
+    grams = PatientNameGram.__table__
+    for offset in range(0, count, batch):
+        patient_batch = []
+        gram_batch = []
+        for i in range(offset, min(offset + batch, count)):
+            if rng.random() < 0.01:
+                name = rng.choice(FIXED_NAMES)
+            else:
+                first = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+                last = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                name = f'{first} {last}'
+            full_name = f'{rng.choice(TITLES)}{name}'
+            patient_id = new_id()
+            search_name = normalize_name(full_name)
+            patient_batch.append({
+                'id': patient_id, 'full_name': full_name, 'search_name': search_name,
+                'contact_phone': '081-000-0000', 'current_address': {}, 'registered_date': now,
+                'registered_by_id': community.id,
+            })
+            gram_batch.extend(gram_rows(patient_id, search_name))
+        with db.engine.begin() as connection:
+            connection.execute(patients.insert(), patient_batch)
+            connection.execute(grams.insert(), gram_batch)
+
+
+def run(criterion, repeat):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        query = Patient.query.filter(criterion)
+        total = query.count()
+        query.order_by(Patient.registered_date.desc()).limit(10).all()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+        db.session.expunge_all()
+    return best, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ILIKE and trigram patient name search')
+    parser.add_argument('--patients', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='name-search-'), 'bench.db')
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        began = time.perf_counter()
+        load(args.patients)
+        print(f"Loaded {args.patients:,} patients in {time.perf_counter() - began:.1f}s\n")
+
+        print(f"{'search':<20} {'ilike ms':>10} {'matches':>9} {'index ms':>10} {'matches':>9}")
+        for search in SEARCHES:
+            ilike_seconds, ilike_total = run(Patient.full_name.ilike(f'%{search}%'), args.repeat)
+            index_seconds, index_total = run(patient_name_filter(search), args.repeat)
+            print(f"{search:<20} {ilike_seconds * 1000:>10.1f} {ilike_total:>9,} "
+                  f"{index_seconds * 1000:>10.1f} {index_total:>9,}")
+
+
+if __name__ == '__main__':
+    main()
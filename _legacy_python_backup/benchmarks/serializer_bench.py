@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Serializer micro-benchmark
+
+Compares building a list response with the hand-written to_dict() + jsonify
+path against the compiled serializers + json_response path on 10k rides and
+10k patients loaded from a throwaway in-memory SQLite database.
+
+Usage: python benchmarks/serializer_bench.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from flask import Flask, jsonify
+from sqlalchemy.orm import selectinload
+from src.models.ems_models import db, User, DriverProfile, Patient, Ride
+from src.services import serializers
+from src.services.serializers import serialize_many, json_response
+
+
+def build_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(rows):
+    community = User(name='Community User', email='community@bench.local', role='community', password_hash='x')
+    drivers = [User(name=f'Driver {i}', email=f'driver{i}@bench.local', role='driver', password_hash='x') for i in range(20)]
+    db.session.add(community)
+    db.session.add_all(drivers)
+    db.session.flush()
+    for i, driver in enumerate(drivers):
+        db.session.add(DriverProfile(user_id=driver.id, license_plate=f'กข {1000 + i}'))
+
+    now = datetime.utcnow()
+    for i in range(rows):
+        patient = Patient(
+            full_name=f'นาย ผู้ป่วย ทดสอบ {i}',
+            contact_phone='081-000-0000',
+            patient_types=['ผู้สูงอายุ'],
+            chronic_diseases=['เบาหวาน', 'ความดันสูง'],
+            allergies=['ไม่มี'],
+            id_card_address={'houseNumber': str(i), 'village': 'หมู่ 1', 'subdistrict': 'เวียง'},
+            current_address={'houseNumber': str(i), 'village': 'หมู่ 1', 'subdistrict': 'เวียง'},
+            latitude=Decimal('19.912345'),
+            longitude=Decimal('99.812345'),
+            registered_by_id=community.id
+        )
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Ride(
+            patient_id=patient.id,
+            requester_id=community.id,
+            driver_id=drivers[i % len(drivers)].id,
+            pickup_location='ตามที่อยู่ผู้ป่วย',
+            destination='โรงพยาบาลเวียงป่าเป้า',
+            appointment_time=now + timedelta(minutes=i),
+            status='ASSIGNED',
+            special_needs=['ต้องใช้วีลแชร์'],
+            review_tags=[]
+        ))
+    db.session.commit()
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def compare(label, rows, repeat, model):
+    legacy = best_of(repeat, lambda: jsonify([row.to_dict() for row in rows]).get_data())
+    compiled = best_of(repeat, lambda: json_response(serialize_many(model, rows)).get_data())
+    print(f"{label} ({len(rows)} rows):")
+    print(f"  to_dict + jsonify:          {legacy * 1000:8.1f} ms")
+    print(f"  compiled + json_response:   {compiled * 1000:8.1f} ms  ({legacy / compiled:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = build_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        print(f"encoder: {'orjson' if serializers.orjson is not None else 'json (stdlib)'}")
+
+        # Load everything up front so both paths measure serialization only
+        rides = Ride.query.options(
+            selectinload(Ride.patient),
+            selectinload(Ride.requester),
+            selectinload(Ride.driver).selectinload(User.driver_profile)
+        ).all()
+        patients = Patient.query.options(selectinload(Patient.registered_by_user)).all()
+
+        compare('Rides', rides, args.repeat, Ride)
+        compare('Patients', patients, args.repeat, Patient)
+
+
+if __name__ == '__main__':
+    main()
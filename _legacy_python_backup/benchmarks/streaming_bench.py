@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Streaming response benchmark
+
+Loads a growing backlog of PENDING rides into a temporary SQLite file.
+At each size it reads /api/office/rides/urgent in three ways:
+- buffered: .all() plus one json_response, the previous behaviour
+- streamed JSON array
+- NDJSON
+
+For each it prints the time and the peak Python memory (tracemalloc). The
+streamed columns should stay flat as the backlog grows.
+
+Usage: python benchmarks/streaming_bench.py [--sizes 1000,10000,50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.ems_models import db, Ride
+from src.benchmarks.harness import create_app, seed, add_rides, auth_headers
+from src.services.loading_plans import with_loading_plan
+from src.services.serializers import json_response, serialize_many
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, size
+
+
+def buffered(app):
+    with app.test_request_context():
+        rides = with_loading_plan(Ride.query.filter_by(status='PENDING'), 'office.get_urgent_rides')\
+            .order_by(Ride.appointment_time.asc()).all()
+        return len(json_response(serialize_many(Ride, rides)).get_data())
+
+
+def streamed(app, headers, query=''):
+    def read():
+        response = app.test_client().get(f'/api/office/rides/urgent{query}', headers=headers, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return size
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure peak memory of streamed list responses')
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='streaming-'), 'bench.db')
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        users = seed(patients=500, rides=0, drivers=10)
+        headers = auth_headers(users['office'])
+        loaded = 0
+        print(f"{'rides':>8}  {'buffered':>20}  {'JSON array':>20}  {'NDJSON':>20}")
+        for size in (int(value) for value in args.sizes.split(',')):
+            add_rides(size - loaded, users['patients'], users['community'], users['drivers'], status='PENDING')
+            db.session.commit()
+            loaded = size
+            cells = []
+            for fn in (lambda: buffered(app), streamed(app, headers), streamed(app, headers, '?format=ndjson')):
+                ms, mb, _ = measure(fn)
+                cells.append(f'{ms:8.0f} ms {mb:7.1f} MB')
+            print(f'{size:>8,}  ' + '  '.join(f'{cell:>20}' for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,29 @@ from flask import Flask, send_from_directory, Response
 from flask_cors import CORS
 import mimetypes
 from src.models.ems_models import db
+from src.models.ids import configure_ids
 from src.routes.auth import auth_bp
 from src.routes.community import community_bp
 from src.routes.driver import driver_bp
 from src.routes.office import office_bp
 from src.routes.news import news_bp
 from src.routes.user import user_bp
+from src.routes.audit import audit_bp
+from src.routes.exports import exports_bp
+from src.routes.diagnostics import diagnostics_bp
+from src.services.user_cache import user_cache
+from src.services.password_hashing import password_hasher
+from src.services.stateless_auth import revocation_list
+from src.services.query_counter import query_counter
+from src.services.audit_log import audit_log
+from src.services.audit_storage import audit_storage
+from src.services.count_cache import count_cache
+from src.services.office_stats import office_stats
+from src.services.driver_positions import position_store, location_history
+from src.services.driver_schedule import driver_schedule
+from src.services.day_schedule import day_schedule
+from src.services.change_feed import change_feed
+from src.services.exports import export_jobs
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -44,6 +61,9 @@ app.register_blueprint(driver_bp, url_prefix='/api/driver')
 app.register_blueprint(office_bp, url_prefix='/api/office')
 app.register_blueprint(news_bp, url_prefix='/api/news')
 app.register_blueprint(user_bp, url_prefix='/api')
+app.register_blueprint(audit_bp, url_prefix='/api/audit-logs')
+app.register_blueprint(exports_bp, url_prefix='/api/exports')
+app.register_blueprint(diagnostics_bp, url_prefix='/api/diagnostics')
 
 # Database configuration
 db_type = os.getenv('DATABASE_TYPE', 'sqlite')
@@ -58,6 +78,103 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
+
+# Primary keys: ID_SCHEME=uuid7 for time-ordered ids, ID_STORAGE=binary for
+# BINARY(16) key columns (convert existing data with migrate_ids_to_binary.py)
+app.config['ID_SCHEME'] = os.getenv('ID_SCHEME', 'uuid4')
+app.config['ID_STORAGE'] = os.getenv('ID_STORAGE', 'string')
+configure_ids(app.config['ID_SCHEME'], app.config['ID_STORAGE'])
+
+# Authenticated-user snapshot cache (set size or TTL to 0 to disable)
+app.config['AUTH_USER_CACHE_SIZE'] = int(os.getenv('AUTH_USER_CACHE_SIZE', '1024'))
+app.config['AUTH_USER_CACHE_TTL'] = int(os.getenv('AUTH_USER_CACHE_TTL', '30'))
+user_cache.init_app(app)
+
+# Password hashing pool used by /login and /register
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '16'))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+password_hasher.init_app(app)
+
+# Stateless auth: trust JWT role claims and reject revoked users from memory
+app.config['AUTH_STATELESS'] = os.getenv('AUTH_STATELESS', 'false').lower() in ('1', 'true', 'yes')
+app.config['AUTH_REVOCATION_CAPACITY'] = int(os.getenv('AUTH_REVOCATION_CAPACITY', '10000'))
+app.config['AUTH_REVOCATION_REFRESH'] = float(os.getenv('AUTH_REVOCATION_REFRESH', '5'))
+revocation_list.init_app(app)
+
+# Per-request SQL statement counting (X-SQL-Statements header, budget warnings)
+app.config['SQL_STATEMENT_COUNT'] = os.getenv('SQL_STATEMENT_COUNT', 'false').lower() in ('1', 'true', 'yes')
+app.config['SQL_STATEMENT_BUDGET'] = int(os.getenv('SQL_STATEMENT_BUDGET', '0'))
+query_counter.init_app(app)
+
+# Largest ?limit= a list endpoint serves (cursor and page pagination alike)
+app.config['PAGE_LIMIT_MAX'] = int(os.getenv('PAGE_LIMIT_MAX', '100'))
+
+# List totals: cached exact counts (set size or TTL to 0 to disable) and the
+# row cap for ?count=estimated
+app.config['COUNT_CACHE_SIZE'] = int(os.getenv('COUNT_CACHE_SIZE', '1024'))
+app.config['COUNT_CACHE_TTL'] = int(os.getenv('COUNT_CACHE_TTL', '10'))
+app.config['COUNT_ESTIMATE_CAP'] = int(os.getenv('COUNT_ESTIMATE_CAP', '1000'))
+count_cache.init_app(app)
+
+# Seconds an office dashboard stats snapshot is shared between pollers
+app.config['OFFICE_STATS_TTL'] = float(os.getenv('OFFICE_STATS_TTL', '5'))
+office_stats.init_app(app)
+
+# Driver GPS pings: latest positions in memory, history written in batches
+app.config['LOCATION_STALE_SECONDS'] = int(os.getenv('LOCATION_STALE_SECONDS', '120'))
+app.config['LOCATION_HISTORY_ENABLED'] = os.getenv('LOCATION_HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+app.config['LOCATION_QUEUE_SIZE'] = int(os.getenv('LOCATION_QUEUE_SIZE', '50000'))
+app.config['LOCATION_BATCH_SIZE'] = int(os.getenv('LOCATION_BATCH_SIZE', '1000'))
+app.config['LOCATION_FLUSH_INTERVAL'] = float(os.getenv('LOCATION_FLUSH_INTERVAL', '1.0'))
+position_store.init_app(app)
+location_history.init_app(app)
+
+# Driver schedule index: minutes either side of an appointment a driver is
+# busy, and seconds before the index is rebuilt from the database
+app.config['SCHEDULE_BUFFER_MINUTES'] = int(os.getenv('SCHEDULE_BUFFER_MINUTES', '60'))
+app.config['SCHEDULE_INDEX_TTL'] = int(os.getenv('SCHEDULE_INDEX_TTL', '60'))
+driver_schedule.init_app(app)
+
+# Local timezone that defines a calendar day for schedules and today's
+# stats, and seconds before the cached today/tomorrow schedules are rebuilt
+app.config['SCHEDULE_TIMEZONE'] = os.getenv('SCHEDULE_TIMEZONE', 'Asia/Bangkok')
+app.config['DAY_SCHEDULE_TTL'] = int(os.getenv('DAY_SCHEDULE_TTL', '60'))
+day_schedule.init_app(app)
+
+# Server-sent events change feed (GET /api/events) on its own port, served
+# by one event loop thread; leave CHANGE_FEED_PORT empty to turn it off
+app.config['CHANGE_FEED_PORT'] = int(os.getenv('CHANGE_FEED_PORT', '5001')) if os.getenv('CHANGE_FEED_PORT', '5001') else None
+app.config['CHANGE_FEED_HOST'] = os.getenv('CHANGE_FEED_HOST', '0.0.0.0')
+app.config['CHANGE_FEED_BACKLOG'] = int(os.getenv('CHANGE_FEED_BACKLOG', '1000'))
+app.config['CHANGE_FEED_HEARTBEAT'] = float(os.getenv('CHANGE_FEED_HEARTBEAT', '15'))
+app.config['CHANGE_FEED_MAX_BUFFER'] = int(os.getenv('CHANGE_FEED_MAX_BUFFER', str(256 * 1024)))
+change_feed.init_app(app)
+
+# Audit log of mutating requests, written in batches by a background thread
+app.config['AUDIT_LOG_ENABLED'] = os.getenv('AUDIT_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+app.config['AUDIT_QUEUE_SIZE'] = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+app.config['AUDIT_BATCH_SIZE'] = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+app.config['AUDIT_FLUSH_INTERVAL'] = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+app.config['AUDIT_OVERFLOW'] = os.getenv('AUDIT_OVERFLOW', 'drop')  # 'drop' or 'block'
+app.config['AUDIT_BLOCK_TIMEOUT'] = float(os.getenv('AUDIT_BLOCK_TIMEOUT', '0.05'))
+audit_log.init_app(app)
+
+# Monthly audit partitions; manage_audit_partitions.py archives months older
+# than the retention window (0 keeps everything) as gzipped JSONL
+app.config['AUDIT_RETENTION_MONTHS'] = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+app.config['AUDIT_ARCHIVE_DIR'] = os.getenv('AUDIT_ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'database', 'audit_archive'))
+audit_storage.init_app(app)
+
+# CSV/XLSX exports stream ranges up to EXPORT_SYNC_MAX_DAYS days; longer ones
+# run on EXPORT_WORKERS background threads and are kept in EXPORT_DIR for
+# EXPORT_RETENTION_HOURS
+app.config['EXPORT_SYNC_MAX_DAYS'] = int(os.getenv('EXPORT_SYNC_MAX_DAYS', '62'))
+app.config['EXPORT_WORKERS'] = int(os.getenv('EXPORT_WORKERS', '1'))
+app.config['EXPORT_RETENTION_HOURS'] = float(os.getenv('EXPORT_RETENTION_HOURS', '24'))
+app.config['EXPORT_DIR'] = os.getenv('EXPORT_DIR', os.path.join(os.path.dirname(__file__), 'database', 'exports'))
+export_jobs.init_app(app)
+
 with app.app_context():
     db.create_all()
 
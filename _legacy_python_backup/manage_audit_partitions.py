@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Maintain the monthly audit log partitions (see services/audit_storage.py).
+
+- Creates this month's and the next months' partitions on MySQL. The first
+  run converts audit_logs into a partitioned table, which rewrites it.
+- On SQLite, moves rows from the old unpartitioned audit_logs table into
+  the month tables.
+- Archives months older than AUDIT_RETENTION_MONTHS to
+  AUDIT_ARCHIVE_DIR/audit_logs_YYYYMM.jsonl.gz and drops them.
+
+Run it monthly (e.g. from cron on the 1st), before the next month starts.
+
+Usage: python manage_audit_partitions.py [--ahead 2] [--dry-run]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.models.ems_models import db
+from src.services.audit_storage import audit_storage
+from src.main import app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create and archive monthly audit log partitions')
+    parser.add_argument('--ahead', type=int, default=2, help='months to create beyond the current one')
+    parser.add_argument('--dry-run', action='store_true', help='only list the months that would be archived')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if not args.dry_run:
+            created = audit_storage.ensure_partitions(ahead=args.ahead)
+            if created:
+                print(f"✓ Partitioned months: {', '.join(created)}")
+        with db.engine.connect() as connection:
+            print(f"✓ Live months: {', '.join(audit_storage.partitions(connection)) or 'none'}")
+        for key, rows, path in audit_storage.archive_expired(dry_run=args.dry_run):
+            if args.dry_run:
+                print(f"- Would archive {key} to {path}")
+            else:
+                print(f"✓ Archived {rows} event(s) from {key} to {path}")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Add columns declared in the models that are missing from an existing database.
+
+db.create_all() never alters existing tables, so databases created before a
+column was added to a model need this script. New NOT NULL columns carry a
+server_default so existing rows get a value. Works on SQLite and MySQL and
+is safe to run more than once.
+
+Usage: python migrate_columns.py [--dry-run]
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from src.models.ems_models import db
+from src.main import app
+
+
+def missing_columns(inspector):
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                yield column
+
+
+def migrate(dry_run=False):
+    with app.app_context():
+        inspector = inspect(db.engine)
+        preparer = db.engine.dialect.identifier_preparer
+        added = 0
+        for column in missing_columns(inspector):
+            definition = str(CreateColumn(column).compile(dialect=db.engine.dialect))
+            if dry_run:
+                print(f"- Would add: {column.table.name}.{definition}")
+                continue
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(column.table)} ADD COLUMN {definition}"
+                ))
+            added += 1
+            print(f"✓ Added: {column.table.name}.{definition}")
+
+        if not dry_run:
+            print(f"\n✓ Column migration complete ({added} added).")
+
+
+if __name__ == '__main__':
+    migrate(dry_run='--dry-run' in sys.argv)
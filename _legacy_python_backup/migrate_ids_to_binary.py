@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Convert UUID key columns from CHAR(36) text to 16-byte binary.
+
+Run once before starting the app with ID_STORAGE=binary. Every primary and
+foreign key column declared as UUIDKey in the models is converted; the ids
+seen by the API do not change. Aborts without changing anything if a key
+column holds a value that is not a UUID. Safe to run more than once.
+
+On MySQL the columns are rewritten in place with UNHEX() and changed to
+BINARY(16). SQLite has no column types to change, so the stored values are
+rewritten as 16-byte blobs.
+
+Usage: python migrate_ids_to_binary.py [--dry-run]
+"""
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect, text
+from src.models.ems_models import db
+from src.models.ids import UUIDKey
+from src.main import app
+
+UUID_PATTERN = '^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+
+
+def key_columns(inspector):
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = [column for column in table.columns if isinstance(column.type, UUIDKey)]
+        if columns:
+            yield table, columns
+
+
+def mysql_pending(inspector, table, columns):
+    types = {column['name']: str(column['type']).upper() for column in inspector.get_columns(table.name)}
+    return [column for column in columns if not types[column.name].startswith('BINARY')]
+
+
+def sqlite_pending(connection, table, columns):
+    pending = []
+    for column in columns:
+        has_text = connection.execute(text(
+            f'SELECT 1 FROM "{table.name}" WHERE typeof("{column.name}") = \'text\' LIMIT 1'
+        )).first()
+        if has_text:
+            pending.append(column)
+    return pending
+
+
+def invalid_values(connection, dialect, table, column):
+    if dialect == 'mysql':
+        return connection.execute(text(
+            f'SELECT COUNT(*) FROM `{table.name}` WHERE `{column.name}` IS NOT NULL '
+            f'AND `{column.name}` NOT REGEXP :pattern'
+        ), {'pattern': UUID_PATTERN}).scalar()
+    count = 0
+    for (value,) in connection.execute(text(
+        f'SELECT "{column.name}" FROM "{table.name}" WHERE typeof("{column.name}") = \'text\''
+    )):
+        try:
+            uuid.UUID(value)
+        except ValueError:
+            count += 1
+    return count
+
+
+def convert_mysql(connection, pending):
+    connection.execute(text('SET FOREIGN_KEY_CHECKS = 0'))
+    try:
+        # Text -> VARBINARY keeps the bytes, so UNHEX can then shrink them to 16
+        for table, columns in pending:
+            modify = ', '.join(
+                f"MODIFY `{c.name}` VARBINARY(36){'' if c.nullable else ' NOT NULL'}" for c in columns
+            )
+            connection.execute(text(f'ALTER TABLE `{table.name}` {modify}'))
+        for table, columns in pending:
+            assignments = ', '.join(f"`{c.name}` = UNHEX(REPLACE(`{c.name}`, '-', ''))" for c in columns)
+            connection.execute(text(f'UPDATE `{table.name}` SET {assignments}'))
+        for table, columns in pending:
+            modify = ', '.join(
+                f"MODIFY `{c.name}` BINARY(16){'' if c.nullable else ' NOT NULL'}" for c in columns
+            )
+            connection.execute(text(f'ALTER TABLE `{table.name}` {modify}'))
+    finally:
+        connection.execute(text('SET FOREIGN_KEY_CHECKS = 1'))
+
+
+def convert_sqlite(connection, pending):
+    for table, columns in pending:
+        for column in columns:
+            values = connection.execute(text(
+                f'SELECT DISTINCT "{column.name}" FROM "{table.name}" WHERE typeof("{column.name}") = \'text\''
+            )).scalars().all()
+            connection.execute(
+                text(f'UPDATE "{table.name}" SET "{column.name}" = :new WHERE "{column.name}" = :old'),
+                [{'new': uuid.UUID(value).bytes, 'old': value} for value in values],
+            )
+
+
+def migrate(dry_run=False):
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect not in ('mysql', 'sqlite'):
+            print(f"✗ Unsupported database: {dialect}")
+            sys.exit(1)
+
+        with db.engine.begin() as connection:
+            inspector = inspect(connection)
+            pending = []
+            for table, columns in key_columns(inspector):
+                if dialect == 'mysql':
+                    columns = mysql_pending(inspector, table, columns)
+                else:
+                    columns = sqlite_pending(connection, table, columns)
+                if columns:
+                    pending.append((table, columns))
+
+            if not pending:
+                print("✓ All key columns are already binary.")
+                return
+
+            invalid = False
+            for table, columns in pending:
+                for column in columns:
+                    bad = invalid_values(connection, dialect, table, column)
+                    if bad:
+                        invalid = True
+                        print(f"✗ {table.name}.{column.name}: {bad} value(s) are not UUIDs")
+                    else:
+                        print(f"- {table.name}.{column.name}")
+            if invalid:
+                print("\n✗ Nothing converted; fix the values above first.")
+                sys.exit(1)
+            if dry_run:
+                return
+
+            if dialect == 'mysql':
+                convert_mysql(connection, pending)
+            else:
+                convert_sqlite(connection, pending)
+
+        print("\n✓ Key columns converted. Start the app with ID_STORAGE=binary.")
+
+
+if __name__ == '__main__':
+    migrate(dry_run='--dry-run' in sys.argv)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Create the secondary indexes declared in the models on an existing database.
+
+db.create_all() only creates indexes together with new tables, so databases
+created before an index was added to a model's __table_args__ need this
+script. Works on SQLite and MySQL and is safe to run more than once.
+
+Usage: python migrate_indexes.py [--dry-run]
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect
+from src.models.ems_models import db
+from src.main import app
+
+
+def missing_indexes(inspector):
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing:
+                yield index
+
+
+def migrate(dry_run=False):
+    with app.app_context():
+        inspector = inspect(db.engine)
+        created = 0
+        for index in missing_indexes(inspector):
+            columns = ', '.join(column.name for column in index.columns)
+            if dry_run:
+                print(f"- Would create: {index.name} ON {index.table.name} ({columns})")
+                continue
+            index.create(bind=db.engine)
+            created += 1
+            print(f"✓ Created: {index.name} ON {index.table.name} ({columns})")
+
+        if not dry_run:
+            print(f"\n✓ Index migration complete ({created} created).")
+
+
+if __name__ == '__main__':
+    migrate(dry_run='--dry-run' in sys.argv)
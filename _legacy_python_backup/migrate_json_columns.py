@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Convert legacy TEXT columns holding JSON strings to native MySQL JSON columns.
+
+New databases get JSON columns from db.create_all(); this script upgrades
+databases created before the JSONText column type. SQLite keeps TEXT and
+needs no migration. Safe to run more than once.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect, text
+from src.models.ems_models import db, Patient, Ride, AuditLog, JSONText
+from src.main import app
+
+
+def json_columns():
+    for model in (Patient, Ride, AuditLog):
+        for column in model.__table__.columns:
+            if isinstance(column.type, JSONText):
+                yield model.__tablename__, column
+
+
+def migrate():
+    with app.app_context():
+        if db.engine.dialect.name != 'mysql':
+            print(f"- {db.engine.dialect.name}: JSON columns stay TEXT, nothing to do")
+            return
+
+        inspector = inspect(db.engine)
+        for table, column in json_columns():
+            current = {c['name']: c for c in inspector.get_columns(table)}.get(column.name)
+            if current is None:
+                print(f"- Missing: {table}.{column.name}")
+                continue
+            if current['type'].__class__.__name__.upper() == 'JSON':
+                print(f"- Already JSON: {table}.{column.name}")
+                continue
+
+            # Empty strings are not valid JSON documents
+            empty_value = 'NULL' if column.nullable else "'{}'"
+            db.session.execute(text(f"UPDATE {table} SET {column.name} = {empty_value} WHERE {column.name} = ''"))
+            null_clause = 'NULL' if column.nullable else 'NOT NULL'
+            db.session.execute(text(f"ALTER TABLE {table} MODIFY {column.name} JSON {null_clause}"))
+            db.session.commit()
+            print(f"✓ Converted: {table}.{column.name}")
+
+        print("\n✓ JSON column migration complete.")
+
+
+if __name__ == '__main__':
+    migrate()
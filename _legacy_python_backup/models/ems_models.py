@@ -1,15 +1,52 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
-import uuid
 import json
+from src.models.ids import UUIDKey, new_id
 
 db = SQLAlchemy()
 
+class JSONText(TypeDecorator):
+    """JSON value stored as text, or as a native JSON column on MySQL.
+
+    Values are decoded once when a row is loaded and the attribute holds the
+    Python object from then on, so getters and to_dict() never re-parse.
+    They are only encoded again when the attribute is assigned, because
+    unchanged attributes are not part of the UPDATE.
+    """
+    impl = db.Text
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(mysql.JSON())
+        return dialect.type_descriptor(db.Text())
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == 'mysql':
+            return value
+        return json.dumps(value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == 'mysql':
+            # MySQL's JSON type has already decoded the value
+            return value
+        return json.loads(value) if value else None
+
+def binary_string(length):
+    """VARCHAR compared byte by byte (utf8mb4_bin on MySQL; SQLite already does)"""
+    return db.String(length).with_variant(mysql.VARCHAR(length, collation='utf8mb4_bin'), 'mysql')
+
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role_status', 'role', 'status'),
+        db.Index('ix_users_role_created_at', 'role', 'created_at'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
     name = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -26,11 +63,14 @@ class User(db.Model):
     requested_rides = db.relationship('Ride', foreign_keys='Ride.requester_id', backref='requester', lazy='dynamic')
     assigned_rides = db.relationship('Ride', foreign_keys='Ride.driver_id', backref='driver', lazy='dynamic')
     
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+    def set_password(self, password, hasher=None):
+        """hasher (services/password_hashing.py) runs the hash on its pool instead of this thread"""
+        run = hasher.run if hasher is not None else lambda fn, *args: fn(*args)
+        self.password_hash = run(generate_password_hash, password)
     
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+    def check_password(self, password, hasher=None):
+        run = hasher.run if hasher is not None else lambda fn, *args: fn(*args)
+        return run(check_password_hash, self.password_hash, password)
     
     def to_dict(self):
         return {
@@ -48,12 +88,26 @@ class User(db.Model):
 class DriverProfile(db.Model):
     __tablename__ = 'driver_profiles'
     
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    user_id = db.Column(UUIDKey, db.ForeignKey('users.id'), primary_key=True)
     license_plate = db.Column(db.String(50), nullable=False)
     address = db.Column(db.Text, nullable=True)
-    vehicle_id = db.Column(db.String(36), db.ForeignKey('vehicles.id'), nullable=True)
+    vehicle_id = db.Column(UUIDKey, db.ForeignKey('vehicles.id'), nullable=True)
     avg_review_score = db.Column(db.Numeric(3, 2), nullable=False, default=5.00)
     date_created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Trip counters maintained by services/trip_stats.py; month_trips counts
+    # completions in month_trips_period ('YYYY-MM' in SCHEDULE_TIMEZONE)
+    completed_trips = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    month_trips = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    month_trips_period = db.Column(db.String(7), nullable=True)
+    last_completed_at = db.Column(db.DateTime, nullable=True)
+    # Rating aggregates maintained by services/driver_ratings.py;
+    # avg_review_score is rating_sum / rating_count (5.00 until rated)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    review_tag_counts = db.Column(JSONText, nullable=True)
+    
+    def get_review_tag_counts(self):
+        return self.review_tag_counts if self.review_tag_counts is not None else {}
     
     def to_dict(self):
         return {
@@ -62,13 +116,23 @@ class DriverProfile(db.Model):
             'address': self.address,
             'vehicle_id': self.vehicle_id,
             'avg_review_score': float(self.avg_review_score),
-            'date_created': self.date_created.isoformat() if self.date_created else None
+            'date_created': self.date_created.isoformat() if self.date_created else None,
+            'completed_trips': self.completed_trips,
+            'rating_count': self.rating_count,
+            'last_completed_at': self.last_completed_at.isoformat() if self.last_completed_at else None
         }
 
 class Patient(db.Model):
     __tablename__ = 'patients'
-    
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        db.Index('ix_patients_registered_by_date', 'registered_by_id', 'registered_date'),
+        db.Index('ix_patients_registered_date', 'registered_date'),
+        # Radius and nearest-pickup queries (services/geo_index.py); the
+        # coordinates are included so the distance check can read them from the index
+        db.Index('ix_patients_geohash', 'geohash', 'latitude', 'longitude'),
+    )
+    
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
     full_name = db.Column(db.String(255), nullable=False)
     profile_image_url = db.Column(db.String(255), nullable=True)
     title = db.Column(db.String(50), nullable=True)
@@ -78,56 +142,61 @@ class Patient(db.Model):
     national_id = db.Column(db.String(20), unique=True, nullable=True)
     dob = db.Column(db.Date, nullable=True)
     age = db.Column(db.String(20), nullable=True)
-    patient_types = db.Column(db.Text, nullable=True)  # JSON string
+    patient_types = db.Column(JSONText, nullable=True)
     blood_type = db.Column(db.String(10), nullable=True)
     rh_factor = db.Column(db.String(10), nullable=True)
     health_coverage = db.Column(db.String(100), nullable=True)
-    chronic_diseases = db.Column(db.Text, nullable=True)  # JSON string
-    allergies = db.Column(db.Text, nullable=True)  # JSON string
+    chronic_diseases = db.Column(JSONText, nullable=True)
+    allergies = db.Column(JSONText, nullable=True)
     contact_phone = db.Column(db.String(50), nullable=False)
-    id_card_address = db.Column(db.Text, nullable=True)  # JSON string
-    current_address = db.Column(db.Text, nullable=False)  # JSON string
+    id_card_address = db.Column(JSONText, nullable=True)
+    current_address = db.Column(JSONText, nullable=False)
     landmark = db.Column(db.Text, nullable=True)
     latitude = db.Column(db.Numeric(9, 6), nullable=True)
     longitude = db.Column(db.Numeric(9, 6), nullable=True)
+    # Geohash of latitude/longitude, kept in sync by services/geo_index.py.
+    # Binary collation so cell prefix ranges sort the same on every database
+    geohash = db.Column(binary_string(12), nullable=True)
     registered_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    registered_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    registered_by_id = db.Column(UUIDKey, db.ForeignKey('users.id'), nullable=False)
     key_info = db.Column(db.Text, nullable=True)
     caregiver_name = db.Column(db.String(255), nullable=True)
     caregiver_phone = db.Column(db.String(50), nullable=True)
+    # Normalized full_name for search, kept in sync by services/name_search.py
+    search_name = db.Column(db.String(255), nullable=True)
     
     # Relationships
     rides = db.relationship('Ride', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     
     def get_patient_types(self):
-        return json.loads(self.patient_types) if self.patient_types else []
+        return self.patient_types if self.patient_types is not None else []
     
     def set_patient_types(self, types_list):
-        self.patient_types = json.dumps(types_list)
+        self.patient_types = types_list
     
     def get_chronic_diseases(self):
-        return json.loads(self.chronic_diseases) if self.chronic_diseases else []
+        return self.chronic_diseases if self.chronic_diseases is not None else []
     
     def set_chronic_diseases(self, diseases_list):
-        self.chronic_diseases = json.dumps(diseases_list)
+        self.chronic_diseases = diseases_list
     
     def get_allergies(self):
-        return json.loads(self.allergies) if self.allergies else []
+        return self.allergies if self.allergies is not None else []
     
     def set_allergies(self, allergies_list):
-        self.allergies = json.dumps(allergies_list)
+        self.allergies = allergies_list
     
     def get_id_card_address(self):
-        return json.loads(self.id_card_address) if self.id_card_address else {}
+        return self.id_card_address if self.id_card_address is not None else {}
     
     def set_id_card_address(self, address_dict):
-        self.id_card_address = json.dumps(address_dict)
+        self.id_card_address = address_dict
     
     def get_current_address(self):
-        return json.loads(self.current_address) if self.current_address else {}
+        return self.current_address if self.current_address is not None else {}
     
     def set_current_address(self, address_dict):
-        self.current_address = json.dumps(address_dict)
+        self.current_address = address_dict
     
     def to_dict(self):
         return {
@@ -160,35 +229,52 @@ class Patient(db.Model):
 
 class Ride(db.Model):
     __tablename__ = 'rides'
-    
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'), nullable=False)
-    requester_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    __table_args__ = (
+        # Driver jobs, live status and assignment conflict checks
+        db.Index('ix_rides_driver_status_appointment', 'driver_id', 'status', 'appointment_time'),
+        db.Index('ix_rides_driver_appointment', 'driver_id', 'appointment_time'),
+        # Driver history and trip statistics
+        db.Index('ix_rides_driver_created', 'driver_id', 'created_at'),
+        # Community ride lists and stats
+        db.Index('ix_rides_requester_created', 'requester_id', 'created_at'),
+        # Office pending queue and today's schedule
+        db.Index('ix_rides_status_appointment', 'status', 'appointment_time'),
+        db.Index('ix_rides_appointment', 'appointment_time'),
+        # Office ride list (recent first)
+        db.Index('ix_rides_created', 'created_at'),
+        # Active-ride check before deleting a patient
+        db.Index('ix_rides_patient_status', 'patient_id', 'status'),
+    )
+    
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
+    patient_id = db.Column(UUIDKey, db.ForeignKey('patients.id'), nullable=False)
+    requester_id = db.Column(UUIDKey, db.ForeignKey('users.id'), nullable=False)
     pickup_location = db.Column(db.Text, nullable=False)
     destination = db.Column(db.String(255), nullable=False)
     appointment_time = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='PENDING')
-    driver_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=True)
-    vehicle_id = db.Column(db.String(36), db.ForeignKey('vehicles.id'), nullable=True)
-    special_needs = db.Column(db.Text, nullable=True)  # JSON string
+    driver_id = db.Column(UUIDKey, db.ForeignKey('users.id'), nullable=True)
+    vehicle_id = db.Column(UUIDKey, db.ForeignKey('vehicles.id'), nullable=True)
+    special_needs = db.Column(JSONText, nullable=True)
     caregiver_count = db.Column(db.Integer, nullable=False, default=0)
     rating = db.Column(db.Integer, nullable=True)
-    review_tags = db.Column(db.Text, nullable=True)  # JSON string
+    review_tags = db.Column(JSONText, nullable=True)
     review_comment = db.Column(db.Text, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def get_special_needs(self):
-        return json.loads(self.special_needs) if self.special_needs else []
+        return self.special_needs if self.special_needs is not None else []
     
     def set_special_needs(self, needs_list):
-        self.special_needs = json.dumps(needs_list)
+        self.special_needs = needs_list
     
     def get_review_tags(self):
-        return json.loads(self.review_tags) if self.review_tags else []
+        return self.review_tags if self.review_tags is not None else []
     
     def set_review_tags(self, tags_list):
-        self.review_tags = json.dumps(tags_list)
+        self.review_tags = tags_list
     
     def to_dict(self):
         driver_info = None
@@ -226,7 +312,7 @@ class Ride(db.Model):
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
     license_plate = db.Column(db.String(50), unique=True, nullable=False)
     model = db.Column(db.String(100), nullable=False)
     brand = db.Column(db.String(100), nullable=False)
@@ -253,8 +339,12 @@ class Vehicle(db.Model):
 
 class NewsArticle(db.Model):
     __tablename__ = 'news_articles'
+    __table_args__ = (
+        db.Index('ix_news_articles_status_published', 'status', 'published_date'),
+        db.Index('ix_news_articles_created', 'created_at'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
     title = db.Column(db.String(255), nullable=False)
     content = db.Column(db.Text, nullable=False)
     author = db.Column(db.String(255), nullable=False)
@@ -280,22 +370,28 @@ class NewsArticle(db.Model):
         }
 
 class AuditLog(db.Model):
+    """Audit event; stored in monthly partitions (see services/audit_storage.py)"""
     __tablename__ = 'audit_logs'
-    
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_audit_logs_timestamp', 'timestamp'),
+        db.Index('ix_audit_logs_user_email_timestamp', 'user_email', 'timestamp'),
+    )
+    
+    id = db.Column(UUIDKey, primary_key=True, default=new_id)
+    # Part of the key because MySQL partitions by it
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     user_email = db.Column(db.String(255), nullable=False)
     user_role = db.Column(db.String(50), nullable=False)
     action = db.Column(db.String(100), nullable=False)
     target_id = db.Column(db.String(36), nullable=True)
     ip_address = db.Column(db.String(45), nullable=False)
-    data_payload = db.Column(db.Text, nullable=True)  # JSON string
+    data_payload = db.Column(JSONText, nullable=True)
     
     def get_data_payload(self):
-        return json.loads(self.data_payload) if self.data_payload else {}
+        return self.data_payload if self.data_payload is not None else {}
     
     def set_data_payload(self, payload_dict):
-        self.data_payload = json.dumps(payload_dict)
+        self.data_payload = payload_dict
     
     def to_dict(self):
         return {
@@ -308,3 +404,45 @@ class AuditLog(db.Model):
             'ipAddress': self.ip_address,
             'dataPayload': self.get_data_payload()
         }
+
+class UserRevocation(db.Model):
+    __tablename__ = 'user_revocations'
+    
+    user_id = db.Column(UUIDKey, primary_key=True)
+    revoked = db.Column(db.Boolean, nullable=False, default=True)
+    not_before = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # tokens issued earlier are rejected
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'userId': self.user_id,
+            'revoked': self.revoked,
+            'notBefore': self.not_before.isoformat() if self.not_before else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class PatientNameGram(db.Model):
+    """Trigram index over Patient.search_name (see services/name_search.py)"""
+    __tablename__ = 'patient_name_grams'
+    
+    # Binary collation: grams differing only in marks must stay distinct keys
+    gram = db.Column(binary_string(3), primary_key=True)
+    patient_id = db.Column(UUIDKey, db.ForeignKey('patients.id'), primary_key=True, index=True)
+
+class DriverLocation(db.Model):
+    """GPS ping history, appended in batches (see services/driver_positions.py)"""
+    __tablename__ = 'driver_locations'
+    __table_args__ = (
+        db.Index('ix_driver_locations_driver_recorded', 'driver_id', 'recorded_at'),
+    )
+    
+    # Integer key: an append-only, high-volume table gains nothing from UUIDs
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    driver_id = db.Column(UUIDKey, db.ForeignKey('users.id'), nullable=False)
+    latitude = db.Column(db.Numeric(9, 6), nullable=False)
+    longitude = db.Column(db.Numeric(9, 6), nullable=False)
+    accuracy_m = db.Column(db.Float, nullable=True)
+    speed_kmh = db.Column(db.Float, nullable=True)
+    heading = db.Column(db.Float, nullable=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)  # device time of the fix
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,93 @@
+"""Primary key generation and storage.
+
+IDs are always exposed as 36-character UUID strings. Two opt-in switches
+change what happens underneath:
+
+- ID_SCHEME=uuid7 generates time-ordered UUIDv7 values, so new rows land at
+  the end of the primary key B-tree instead of at random pages.
+- ID_STORAGE=binary stores key columns as BINARY(16) instead of CHAR(36),
+  which shrinks every primary key, foreign key and index entry by more
+  than half. Existing databases must be converted with migrate_ids_to_binary.py.
+"""
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import types
+from sqlalchemy.types import TypeDecorator
+
+_settings = {
+    'scheme': os.getenv('ID_SCHEME', 'uuid4'),
+    'storage': os.getenv('ID_STORAGE', 'string'),
+}
+_uuid7_lock = threading.Lock()
+_uuid7_state = {'ms': 0, 'counter': 0}
+
+
+def configure_ids(scheme=None, storage=None):
+    """Select the ID scheme and storage; call before the first query"""
+    if scheme is not None:
+        if scheme not in ('uuid4', 'uuid7'):
+            raise ValueError(f'Unknown ID scheme: {scheme}')
+        _settings['scheme'] = scheme
+    if storage is not None:
+        if storage not in ('string', 'binary'):
+            raise ValueError(f'Unknown ID storage: {storage}')
+        _settings['storage'] = storage
+
+
+def binary_storage():
+    return _settings['storage'] == 'binary'
+
+
+def uuid7():
+    """Return a UUIDv7 string: 48-bit ms timestamp, then a per-ms counter, then random bits.
+
+    The counter keeps IDs generated by this process strictly increasing
+    even when several are created within the same millisecond.
+    """
+    ms = time.time_ns() // 1_000_000
+    with _uuid7_lock:
+        if ms <= _uuid7_state['ms']:
+            ms = _uuid7_state['ms']
+            counter = _uuid7_state['counter'] + 1
+            if counter > 0xFFF:
+                ms += 1
+                counter = 0
+        else:
+            counter = 0
+        _uuid7_state['ms'] = ms
+        _uuid7_state['counter'] = counter
+
+    random_bits = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | random_bits
+    return str(uuid.UUID(int=value))
+
+
+def new_id():
+    return uuid7() if _settings['scheme'] == 'uuid7' else str(uuid.uuid4())
+
+
+class UUIDKey(TypeDecorator):
+    """UUID string in Python; CHAR(36) or BINARY(16) in the database"""
+    impl = types.String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if binary_storage():
+            return dialect.type_descriptor(types.BINARY(16))
+        return dialect.type_descriptor(types.String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not binary_storage():
+            return value
+        try:
+            return uuid.UUID(str(value)).bytes
+        except ValueError:
+            # Not a UUID (e.g. a mistyped id in a URL): match nothing
+            return None
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Fill in Patient.geohash for patients saved before the geospatial index
+existed (or after changing its precision in services/geo_index.py).
+
+Run after migrate_columns.py and migrate_indexes.py have added the geohash
+column and its index. Patients are processed in batches, one transaction
+per batch.
+
+Usage: python rebuild_geo_index.py [--batch-size 1000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import bindparam, select
+from src.models.ems_models import db, Patient
+from src.services.geo_index import encode_geohash
+from src.main import app
+
+
+def rebuild(batch_size=1000):
+    patients = Patient.__table__
+    set_geohash = patients.update()\
+        .where(patients.c.id == bindparam('patient_id'))\
+        .values(geohash=bindparam('cell'))
+
+    indexed = 0
+    last_id = None
+    while True:
+        query = select(patients.c.id, patients.c.latitude, patients.c.longitude)\
+            .order_by(patients.c.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(patients.c.id > last_id)
+        with db.engine.begin() as connection:
+            rows = connection.execute(query).all()
+            if not rows:
+                break
+            connection.execute(set_geohash, [
+                {
+                    'patient_id': row.id,
+                    'cell': encode_geohash(float(row.latitude), float(row.longitude))
+                    if row.latitude is not None and row.longitude is not None else None,
+                }
+                for row in rows
+            ])
+        indexed += len(rows)
+        last_id = rows[-1].id
+    return indexed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill in patient geohashes')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        indexed = rebuild(batch_size=args.batch_size)
+    print(f"✓ Indexed coordinates of {indexed} patient(s).")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Rebuild the patient name search index (Patient.search_name and the
+patient_name_grams trigram table) from patients.full_name.
+
+Run once after migrate_columns.py adds the search_name column, and again
+after changing the normalization rules in services/name_search.py.
+Patients are processed in batches, one transaction per batch.
+
+Usage: python rebuild_name_index.py [--batch-size 1000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import bindparam, select
+from src.models.ems_models import db, Patient, PatientNameGram
+from src.services.name_search import normalize_name, gram_rows
+from src.main import app
+
+
+def rebuild(batch_size=1000):
+    patients = Patient.__table__
+    grams = PatientNameGram.__table__
+    set_search_name = patients.update()\
+        .where(patients.c.id == bindparam('patient_id'))\
+        .values(search_name=bindparam('normalized'))
+
+    indexed = 0
+    last_id = None
+    while True:
+        query = select(patients.c.id, patients.c.full_name).order_by(patients.c.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(patients.c.id > last_id)
+        with db.engine.begin() as connection:
+            rows = connection.execute(query).all()
+            if not rows:
+                break
+            names = [{'patient_id': row.id, 'normalized': normalize_name(row.full_name)} for row in rows]
+            connection.execute(set_search_name, names)
+            connection.execute(grams.delete().where(grams.c.patient_id.in_([row.id for row in rows])))
+            gram_batch = [gram for name in names for gram in gram_rows(name['patient_id'], name['normalized'])]
+            if gram_batch:
+                connection.execute(grams.insert(), gram_batch)
+        indexed += len(rows)
+        last_id = rows[-1].id
+    return indexed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the patient name search index')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        indexed = rebuild(batch_size=args.batch_size)
+    print(f"✓ Indexed {indexed} patient name(s).")
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the driver trip counters (completed trips, trips this month, last
+completion) from the rides table.
+
+Run after migrate_columns.py adds the counter columns, then periodically
+(e.g. nightly) to repair any drift. Profiles are processed in batches, one
+transaction per batch.
+
+Usage: python reconcile_trip_counters.py [--batch-size 500]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.main import app
+from src.services.trip_stats import reconcile_trip_counters
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild driver trip counters from rides')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        rebuilt = reconcile_trip_counters(batch_size=args.batch_size)
+    print(f"✓ Rebuilt trip counters for {rebuilt} driver(s).")
@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta, timezone
+from src.routes.auth import token_required, role_required
+from src.services.audit_storage import audit_storage
+from src.services.serializers import json_response
+
+audit_bp = Blueprint('audit', __name__)
+
+
+def _parse_time(value):
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Audit timestamps are naive UTC
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+@audit_bp.route('', methods=['GET'])
+@token_required
+@role_required(['admin', 'DEVELOPER'])
+def get_audit_logs(current_user):
+    """Audit events in [from, to), newest first; only the months in range are read"""
+    try:
+        try:
+            end = _parse_time(request.args['to']) if request.args.get('to') else datetime.utcnow()
+            start = _parse_time(request.args['from']) if request.args.get('from') else end - timedelta(days=30)
+        except ValueError:
+            return jsonify({'message': 'from and to must be ISO 8601 timestamps'}), 400
+        if start >= end:
+            return jsonify({'message': 'from must be earlier than to'}), 400
+
+        events = audit_storage.query(
+            start, end,
+            user_email=request.args.get('userEmail'),
+            action=request.args.get('action'),
+            limit=request.args.get('limit', 100, type=int),
+        )
+        return json_response({
+            'events': events,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+        }), 200
+
+    except Exception as e:
+        return jsonify({'message': 'Failed to get audit logs', 'error': str(e)}), 500
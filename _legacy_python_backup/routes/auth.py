@@ -1,5 +1,8 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from src.models.ems_models import db, User
+from src.services.user_cache import user_cache
+from src.services.stateless_auth import revocation_list, authenticate_token, AuthError
+from src.services.password_hashing import password_hasher, HashingPoolBusy
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
@@ -22,15 +25,12 @@ def token_required(f):
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(id=data['user_id']).first()
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid'}), 401
+            current_user = authenticate_token(token)
+        except AuthError as e:
+            return jsonify({'message': str(e)}), 401
         
+        # For request hooks such as the audit log
+        g.current_user = current_user
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -45,6 +45,21 @@ def role_required(allowed_roles):
         return decorated
     return decorator
 
+def _issue_token(user):
+    now = datetime.utcnow()
+    return jwt.encode({
+        'user_id': user.id,
+        'email': user.email,
+        'role': user.role,
+        'iat': now,
+        'exp': now + timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def _server_busy_response():
+    response = jsonify({'message': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
@@ -58,25 +73,22 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if not user or not user.check_password(password):
+        if not user or not user.check_password(password, hasher=password_hasher):
             return jsonify({'message': 'Invalid credentials'}), 401
         
         if user.status != 'Active':
             return jsonify({'message': 'Account is inactive'}), 401
         
         # Generate JWT token
-        token = jwt.encode({
-            'user_id': user.id,
-            'email': user.email,
-            'role': user.role,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm='HS256')
+        token = _issue_token(user)
         
         return jsonify({
             'token': token,
             'user': user.to_dict()
         }), 200
         
+    except HashingPoolBusy:
+        return _server_busy_response()
     except Exception as e:
         return jsonify({'message': 'Login failed', 'error': str(e)}), 500
 
@@ -102,13 +114,16 @@ def register():
             phone=data.get('phone'),
             profile_image_url=data.get('profile_image_url')
         )
-        user.set_password(data['password'])
+        user.set_password(data['password'], hasher=password_hasher)
         
         db.session.add(user)
         db.session.commit()
         
         return jsonify({'message': 'Registration successful'}), 201
         
+    except HashingPoolBusy:
+        db.session.rollback()
+        return _server_busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Registration failed', 'error': str(e)}), 500
@@ -123,14 +138,17 @@ def get_current_user(current_user):
 def refresh_token(current_user):
     try:
         # Generate new JWT token
-        token = jwt.encode({
-            'user_id': current_user.id,
-            'email': current_user.email,
-            'role': current_user.role,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm='HS256')
+        token = _issue_token(current_user)
         
         return jsonify({'token': token}), 200
         
     except Exception as e:
         return jsonify({'message': 'Token refresh failed', 'error': str(e)}), 500
+
+@auth_bp.route('/cache-stats', methods=['GET'])
+@token_required
+@role_required(['admin', 'DEVELOPER'])
+def get_user_cache_stats(current_user):
+    stats = user_cache.stats()
+    stats['revocations'] = revocation_list.stats()
+    return jsonify(stats), 200
@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from src.models.ems_models import db, Patient, Ride, User
 from src.routes.auth import token_required, role_required
+from src.services.loading_plans import with_loading_plan
+from src.services.name_search import patient_name_filter
+from src.services.serializers import serialize_many, json_response
+from src.services.driver_ratings import REVIEW_TAGS, record_rating
+from src.services.pagination import paginate, InvalidCursor
 from datetime import datetime, date
 from sqlalchemy import func, and_, extract
 import json
@@ -47,22 +52,12 @@ def get_community_stats(current_user):
 @role_required(['community'])
 def get_recent_rides(current_user):
     try:
-        rides = Ride.query.filter_by(requester_id=current_user.id)\
+        rides = with_loading_plan(Ride.query.filter_by(requester_id=current_user.id))\
                          .order_by(Ride.created_at.desc())\
                          .limit(10)\
                          .all()
         
-        rides_data = []
-        for ride in rides:
-            rides_data.append({
-                'id': ride.id,
-                'patientName': ride.patient.full_name if ride.patient else 'Unknown',
-                'destination': ride.destination,
-                'appointmentTime': ride.appointment_time.isoformat() if ride.appointment_time else None,
-                'status': ride.status
-            })
-        
-        return jsonify(rides_data), 200
+        return json_response(serialize_many(Ride, rides, 'summary')), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get recent rides', 'error': str(e)}), 500
@@ -72,35 +67,22 @@ def get_recent_rides(current_user):
 @role_required(['community'])
 def get_patients(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         search = request.args.get('search', '', type=str)
         
         query = Patient.query.filter_by(registered_by_id=current_user.id)
         
         if search:
-            query = query.filter(Patient.full_name.ilike(f'%{search}%'))
-        
-        total_patients = query.count()
-        total_pages = (total_patients + limit - 1) // limit
+            query = query.filter(patient_name_filter(search))
         
-        patients = query.offset((page - 1) * limit).limit(limit).all()
-        
-        patients_data = []
-        for patient in patients:
-            patients_data.append({
-                'id': patient.id,
-                'fullName': patient.full_name,
-                'age': patient.age,
-                'keyInfo': patient.key_info,
-                'registeredDate': patient.registered_date.isoformat() if patient.registered_date else None
-            })
+        patients, page_info = paginate(query, Patient.registered_date, Patient.id)
         
-        return jsonify({
-            'patients': patients_data,
-            'totalPages': total_pages
+        return json_response({
+            'patients': serialize_many(Patient, patients, 'community_list'),
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get patients', 'error': str(e)}), 500
 
@@ -386,43 +368,26 @@ def delete_patient(current_user, patient_id):
 @role_required(['community'])
 def get_rides(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         search = request.args.get('search', '', type=str)
         status = request.args.get('status', '', type=str)
         
         query = Ride.query.filter_by(requester_id=current_user.id)
         
         if search:
-            query = query.join(Patient).filter(Patient.full_name.ilike(f'%{search}%'))
+            query = query.join(Patient).filter(patient_name_filter(search))
         
         if status and status != 'All':
             query = query.filter(Ride.status == status)
         
-        total_rides = query.count()
-        total_pages = (total_rides + limit - 1) // limit
-        
-        rides = query.order_by(Ride.created_at.desc())\
-                    .offset((page - 1) * limit)\
-                    .limit(limit)\
-                    .all()
-        
-        rides_data = []
-        for ride in rides:
-            rides_data.append({
-                'id': ride.id,
-                'patientName': ride.patient.full_name if ride.patient else 'Unknown',
-                'destination': ride.destination,
-                'appointmentTime': ride.appointment_time.isoformat() if ride.appointment_time else None,
-                'status': ride.status,
-                'driverName': ride.driver.name if ride.driver else None
-            })
+        rides, page_info = paginate(query, Ride.created_at, Ride.id, loaded=with_loading_plan(query))
         
-        return jsonify({
-            'rides': rides_data,
-            'totalPages': total_pages
+        return json_response({
+            'rides': serialize_many(Ride, rides, 'community_list'),
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get rides', 'error': str(e)}), 500
 
@@ -526,10 +491,11 @@ def cancel_ride(current_user, ride_id):
 @role_required(['community'])
 def submit_rating(current_user, ride_id):
     try:
+        # Locked so two submissions cannot both count towards the driver's rating
         ride = Ride.query.filter_by(
             id=ride_id,
             requester_id=current_user.id
-        ).first()
+        ).with_for_update().first()
         
         if not ride:
             return jsonify({'message': 'Ride not found'}), 404
@@ -549,11 +515,17 @@ def submit_rating(current_user, ride_id):
         if not isinstance(rating, int) or rating < 1 or rating > 5:
             return jsonify({'message': 'Rating must be between 1 and 5'}), 400
         
+        tags = data.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) and tag in REVIEW_TAGS for tag in tags):
+            return jsonify({'message': f'Tags must be a list of: {", ".join(REVIEW_TAGS)}'}), 400
+        
         ride.rating = rating
-        if data.get('tags'):
-            ride.set_review_tags(data['tags'])
+        if tags:
+            ride.set_review_tags(list(dict.fromkeys(tags)))
         if data.get('comment'):
             ride.review_comment = data['comment']
+        if ride.driver_id:
+            record_rating(ride.driver_id, rating, ride.get_review_tags())
         
         db.session.commit()
         
@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from src.routes.auth import token_required, role_required
+from src.services.diagnostics import collect_stats
+
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+
+@diagnostics_bp.route('/stats', methods=['GET'])
+@token_required
+@role_required(['admin', 'DEVELOPER'])
+def get_service_stats(current_user):
+    """In-process stats of every service that registered with services/diagnostics.py"""
+    try:
+        return jsonify(collect_stats()), 200
+
+    except Exception as e:
+        return jsonify({'message': 'Failed to get service stats', 'error': str(e)}), 500
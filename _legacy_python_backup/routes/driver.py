@@ -1,6 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.models.ems_models import db, Ride, User, DriverProfile
 from src.routes.auth import token_required, role_required
+from src.services.user_cache import user_cache
+from src.services.loading_plans import with_loading_plan
+from src.services.serializers import serializer_for, json_response, stream_response
+from src.services.trip_stats import record_completion, trip_stats
+from src.services.geo_index import within_radius, nearest, search_error, MAX_RADIUS_KM
+from src.services.driver_ratings import rating_summary
+from src.services.pagination import paginate, InvalidCursor, MAX_LIMIT
+from src.services.count_cache import count_cache
+from src.services.audit_log import audit_exempt
+from src.services.driver_positions import record_pings, MAX_PINGS_PER_REQUEST
 from datetime import datetime, timedelta
 from sqlalchemy import and_, extract, func
 import json
@@ -13,32 +23,69 @@ driver_bp = Blueprint('driver', __name__)
 def get_driver_jobs(current_user):
     try:
         # Get all assigned rides for this driver
-        rides = Ride.query.filter_by(driver_id=current_user.id)\
-                         .order_by(Ride.appointment_time.asc())\
-                         .all()
+        query = with_loading_plan(Ride.query.filter_by(driver_id=current_user.id))\
+                         .order_by(Ride.appointment_time.asc())
         
+        serialize_ride = serializer_for(Ride)
+        
+        return stream_response(query, lambda ride: _job_dict(serialize_ride, ride)), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get driver jobs', 'error': str(e)}), 500
+
+@driver_bp.route('/jobs/nearby', methods=['GET'])
+@token_required
+@role_required(['driver'])
+def get_nearby_jobs(current_user):
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None:
+            return jsonify({'message': 'lat and lng are required'}), 400
+        radius_km = request.args.get('radius', type=float)
+        k = request.args.get('k', type=int)
+        error = search_error(radius_km, k, current_app.config.get('PAGE_LIMIT_MAX', MAX_LIMIT))
+        if error:
+            return jsonify({'message': error}), 400
+        
+        # This driver's open jobs, nearest pickup first
+        query = with_loading_plan(Ride.query.join(Ride.patient).filter(
+            Ride.driver_id == current_user.id,
+            Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP'])
+        ))
+        locate = lambda ride: ride.patient
+        if k is not None:
+            matches = nearest(query, lat, lng, k, max_radius_km=radius_km or MAX_RADIUS_KM)
+        else:
+            matches = within_radius(query, lat, lng, radius_km or MAX_RADIUS_KM, locate=locate)
+        
+        serialize_ride = serializer_for(Ride)
         rides_data = []
-        for ride in rides:
-            ride_dict = ride.to_dict()
-            # Add additional fields needed by the frontend
-            if ride.patient:
-                ride_dict['patientPhone'] = ride.patient.contact_phone
-                ride_dict['village'] = ride.patient.get_current_address().get('village', '')
-                ride_dict['landmark'] = ride.patient.landmark
-                
-                # Add pickup coordinates if available
-                if ride.patient.latitude and ride.patient.longitude:
-                    ride_dict['pickupCoordinates'] = {
-                        'lat': float(ride.patient.latitude),
-                        'lng': float(ride.patient.longitude)
-                    }
-            
+        for ride, distance in matches:
+            ride_dict = _job_dict(serialize_ride, ride)
+            ride_dict['distanceKm'] = round(distance, 2)
             rides_data.append(ride_dict)
         
-        return jsonify(rides_data), 200
+        return json_response(rides_data), 200
         
     except Exception as e:
-        return jsonify({'message': 'Failed to get driver jobs', 'error': str(e)}), 500
+        return jsonify({'message': 'Failed to get nearby jobs', 'error': str(e)}), 500
+
+def _job_dict(serialize_ride, ride):
+    ride_dict = serialize_ride(ride)
+    # Add additional fields needed by the frontend
+    if ride.patient:
+        ride_dict['patientPhone'] = ride.patient.contact_phone
+        ride_dict['village'] = ride.patient.get_current_address().get('village', '')
+        ride_dict['landmark'] = ride.patient.landmark
+        
+        # Add pickup coordinates if available
+        if ride.patient.latitude and ride.patient.longitude:
+            ride_dict['pickupCoordinates'] = {
+                'lat': float(ride.patient.latitude),
+                'lng': float(ride.patient.longitude)
+            }
+    return ride_dict
 
 @driver_bp.route('/rides/<ride_id>/status', methods=['PATCH'])
 @token_required
@@ -82,6 +129,9 @@ def update_ride_status(current_user, ride_id):
             return jsonify({'message': f'Cannot transition from {current_status} to {new_status}'}), 400
         
         ride.status = new_status
+        if new_status == 'COMPLETED':
+            ride.completed_at = datetime.utcnow()
+            record_completion(ride.driver_id, ride.completed_at)
         db.session.commit()
         
         return jsonify({'message': 'Status updated successfully'}), 200
@@ -90,6 +140,30 @@ def update_ride_status(current_user, ride_id):
         db.session.rollback()
         return jsonify({'message': 'Failed to update status', 'error': str(e)}), 500
 
+@driver_bp.route('/location', methods=['POST'])
+@audit_exempt
+@token_required
+@role_required(['driver'])
+def report_location(current_user):
+    """GPS ping(s): {lat, lng, timestamp?, accuracy?, speed?, heading?} or {pings: [...]}"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'message': 'A JSON object is required'}), 400
+        pings = data['pings'] if 'pings' in data else [data]
+        if not isinstance(pings, list) or not 0 < len(pings) <= MAX_PINGS_PER_REQUEST:
+            return jsonify({'message': f'pings must be a list of 1 to {MAX_PINGS_PER_REQUEST} pings'}), 400
+        
+        try:
+            accepted = record_pings(current_user.id, pings)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({'accepted': accepted}), 202
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to record location', 'error': str(e)}), 500
+
 @driver_bp.route('/optimize-route', methods=['POST'])
 @token_required
 @role_required(['driver'])
@@ -130,8 +204,6 @@ def optimize_route(current_user):
 @role_required(['driver'])
 def get_driver_history(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         period = request.args.get('period', 'all', type=str)
         
         query = Ride.query.filter_by(driver_id=current_user.id)
@@ -158,14 +230,9 @@ def get_driver_history(current_user):
                 )
             )
         
-        total_rides = query.count()
-        total_pages = (total_rides + limit - 1) // limit
-        
-        rides = query.order_by(Ride.created_at.desc())\
-                    .offset((page - 1) * limit)\
-                    .limit(limit)\
-                    .all()
+        rides, page_info = paginate(query, Ride.created_at, Ride.id, loaded=with_loading_plan(query))
         
+        serialize_ride = serializer_for(Ride, 'summary')
         rides_data = []
         total_earnings = 0
         for ride in rides:
@@ -173,18 +240,13 @@ def get_driver_history(current_user):
             earnings = 100 if ride.status == 'COMPLETED' else 0
             total_earnings += earnings
             
-            rides_data.append({
-                'id': ride.id,
-                'patientName': ride.patient.full_name if ride.patient else 'Unknown',
-                'destination': ride.destination,
-                'appointmentTime': ride.appointment_time.isoformat() if ride.appointment_time else None,
-                'status': ride.status,
-                'earnings': earnings
-            })
+            ride_dict = serialize_ride(ride)
+            ride_dict['earnings'] = earnings
+            rides_data.append(ride_dict)
         
         # Calculate stats
-        completed_rides = query.filter(Ride.status == 'COMPLETED').count()
-        total_assigned = query.filter(Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS', 'COMPLETED'])).count()
+        completed_rides = count_cache.count(query.filter(Ride.status == 'COMPLETED'))
+        total_assigned = count_cache.count(query.filter(Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS', 'COMPLETED'])))
         acceptance_rate = (completed_rides / total_assigned * 100) if total_assigned > 0 else 0
         
         stats = {
@@ -193,12 +255,14 @@ def get_driver_history(current_user):
             'acceptanceRate': round(acceptance_rate, 1)
         }
         
-        return jsonify({
+        return json_response({
             'rides': rides_data,
-            'totalPages': total_pages,
-            'stats': stats
+            'stats': stats,
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get driver history', 'error': str(e)}), 500
 
@@ -213,25 +277,12 @@ def get_driver_profile(current_user):
             profile_data.update({
                 'licensePlate': current_user.driver_profile.license_plate,
                 'address': current_user.driver_profile.address,
-                'avgReviewScore': float(current_user.driver_profile.avg_review_score),
                 'dateCreated': current_user.driver_profile.date_created.isoformat() if current_user.driver_profile.date_created else None
             })
+            profile_data.update(rating_summary(current_user.driver_profile))
         
         # Add trip statistics
-        total_trips = Ride.query.filter_by(driver_id=current_user.id, status='COMPLETED').count()
-        trips_this_month = Ride.query.filter(
-            and_(
-                Ride.driver_id == current_user.id,
-                Ride.status == 'COMPLETED',
-                extract('month', Ride.created_at) == datetime.now().month,
-                extract('year', Ride.created_at) == datetime.now().year
-            )
-        ).count()
-        
-        profile_data.update({
-            'totalTrips': total_trips,
-            'tripsThisMonth': trips_this_month
-        })
+        profile_data.update(trip_stats(current_user.driver_profile))
         
         return jsonify(profile_data), 200
         
@@ -263,6 +314,7 @@ def update_driver_profile(current_user):
             current_user.driver_profile.address = data['address']
         
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         
         return jsonify({'message': 'Profile updated successfully'}), 200
         
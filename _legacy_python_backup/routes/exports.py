@@ -0,0 +1,119 @@
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
+from datetime import date
+from src.routes.auth import token_required, role_required
+from src.services.day_schedule import day_schedule
+from src.services.exports import (
+    DATASETS, FORMATS, ExportError, export_jobs, open_export, export_chunks, export_filename,
+)
+
+exports_bp = Blueprint('exports', __name__)
+
+EXPORT_ROLES = ['office', 'OFFICER', 'admin', 'DEVELOPER']
+
+
+def _export_request(dataset):
+    """(dataset, format, first day, end day) from the URL and ?from=&to=&format=, or (None, error message).
+
+    Days are local calendar days; to is exclusive. The default range is
+    the current month.
+    """
+    if dataset not in DATASETS:
+        return None, f'Unknown dataset; use one of {", ".join(DATASETS)}'
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in FORMATS:
+        return None, f'Unknown format; use one of {", ".join(FORMATS)}'
+    today = day_schedule.today()
+    month_start = today.replace(day=1)
+    next_month = (month_start.replace(year=month_start.year + 1, month=1) if month_start.month == 12
+                  else month_start.replace(month=month_start.month + 1))
+    try:
+        first_day = date.fromisoformat(request.args['from']) if request.args.get('from') else month_start
+        end_day = date.fromisoformat(request.args['to']) if request.args.get('to') else next_month
+    except ValueError:
+        return None, 'from and to must be dates (YYYY-MM-DD)'
+    if first_day >= end_day:
+        return None, 'from must be earlier than to'
+    return (dataset, fmt, first_day, end_day), None
+
+
+def _job_response(job, status=200):
+    return jsonify({'job': job}), status
+
+
+@exports_bp.route('/<dataset>', methods=['GET'])
+@token_required
+@role_required(EXPORT_ROLES)
+def export_dataset(current_user, dataset):
+    """Stream a dataset as CSV or XLSX; ranges over EXPORT_SYNC_MAX_DAYS days start a background job (202)"""
+    try:
+        parsed, error = _export_request(dataset)
+        if error:
+            return jsonify({'message': error}), 400
+        dataset, fmt, first_day, end_day = parsed
+
+        if (end_day - first_day).days > export_jobs.sync_max_days:
+            job = export_jobs.submit(dataset, fmt, first_day, end_day, current_user.id)
+            return _job_response(job, 202)
+
+        header, rows = open_export(dataset, first_day, end_day)
+        filename = export_filename(dataset, fmt, first_day, end_day)
+        return Response(
+            stream_with_context(export_chunks(fmt, dataset, header, rows)),
+            mimetype=FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+        ), 200
+
+    except ExportError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to export', 'error': str(e)}), 500
+
+@exports_bp.route('/<dataset>/jobs', methods=['POST'])
+@token_required
+@role_required(EXPORT_ROLES)
+def create_export_job(current_user, dataset):
+    """Export any range in the background; poll /jobs/<id> and fetch /jobs/<id>/download when done"""
+    try:
+        parsed, error = _export_request(dataset)
+        if error:
+            return jsonify({'message': error}), 400
+        job = export_jobs.submit(*parsed, current_user.id)
+        return _job_response(job, 202)
+
+    except ExportError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to start export', 'error': str(e)}), 500
+
+def _own_job(current_user, job_id):
+    job = export_jobs.get(job_id)
+    if job is None or (job['createdBy'] != current_user.id and current_user.role not in ('admin', 'DEVELOPER')):
+        return None
+    return job
+
+@exports_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+@role_required(EXPORT_ROLES)
+def get_export_job(current_user, job_id):
+    job = _own_job(current_user, job_id)
+    if job is None:
+        return jsonify({'message': 'Export job not found'}), 404
+    return _job_response(job)
+
+@exports_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@token_required
+@role_required(EXPORT_ROLES)
+def download_export(current_user, job_id):
+    try:
+        job = _own_job(current_user, job_id)
+        if job is None:
+            return jsonify({'message': 'Export job not found'}), 404
+        if job['status'] != 'done':
+            return jsonify({'message': f"Export is {job['status']}", 'job': job}), 409
+        return send_file(export_jobs.path(job), mimetype=FORMATS[job['format']], as_attachment=True,
+                         download_name=job['filename'])
+
+    except FileNotFoundError:
+        return jsonify({'message': 'Export file has expired'}), 410
+    except Exception as e:
+        return jsonify({'message': 'Failed to download export', 'error': str(e)}), 500
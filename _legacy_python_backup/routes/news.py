@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models.ems_models import db, NewsArticle
 from src.routes.auth import token_required, role_required
+from src.services.serializers import serialize_many, json_response
+from src.services.pagination import paginate, InvalidCursor
 from datetime import datetime
 
 news_bp = Blueprint('news', __name__)
@@ -9,32 +11,18 @@ news_bp = Blueprint('news', __name__)
 def get_published_news():
     """Public endpoint to get published news articles"""
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
-        
         query = NewsArticle.query.filter_by(status='published')
         
-        total_articles = query.count()
-        total_pages = (total_articles + limit - 1) // limit
-        
-        articles = query.order_by(NewsArticle.published_date.desc())\
-                       .offset((page - 1) * limit)\
-                       .limit(limit)\
-                       .all()
-        
-        articles_data = []
-        for article in articles:
-            articles_data.append({
-                'id': article.id,
-                'title': article.title,
-                'summary': article.content[:200] + '...' if len(article.content) > 200 else article.content,
-                'coverImage': article.featured_image_url,
-                'publishedAt': article.published_date.isoformat() if article.published_date else None,
-                'author': {'name': article.author}
-            })
+        # The body is a bare list, so the next page's cursor travels in a header
+        articles, page_info = paginate(query, NewsArticle.published_date, NewsArticle.id, count=False)
         
-        return jsonify(articles_data), 200
+        response = json_response(serialize_many(NewsArticle, articles, 'public_list'))
+        if page_info['nextCursor']:
+            response.headers['X-Next-Cursor'] = page_info['nextCursor']
+        return response, 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get news articles', 'error': str(e)}), 500
 
@@ -68,8 +56,6 @@ def get_single_article(article_id):
 def get_all_news_for_management(current_user):
     """Admin endpoint to get all news articles for management"""
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         status = request.args.get('status', '', type=str)
         
         query = NewsArticle.query
@@ -77,23 +63,15 @@ def get_all_news_for_management(current_user):
         if status and status != 'all':
             query = query.filter(NewsArticle.status == status)
         
-        total_articles = query.count()
-        total_pages = (total_articles + limit - 1) // limit
+        articles, page_info = paginate(query, NewsArticle.created_at, NewsArticle.id)
         
-        articles = query.order_by(NewsArticle.created_at.desc())\
-                       .offset((page - 1) * limit)\
-                       .limit(limit)\
-                       .all()
-        
-        articles_data = []
-        for article in articles:
-            articles_data.append(article.to_dict())
-        
-        return jsonify({
-            'articles': articles_data,
-            'totalPages': total_pages
+        return json_response({
+            'articles': serialize_many(NewsArticle, articles),
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get news articles', 'error': str(e)}), 500
 
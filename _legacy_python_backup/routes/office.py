@@ -1,40 +1,51 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from src.models.ems_models import db, Ride, User, Patient, DriverProfile
 from src.routes.auth import token_required, role_required
-from datetime import datetime, date
-from sqlalchemy import and_, func, extract
+from src.services.loading_plans import with_loading_plan
+from src.services.geo_index import within_radius, nearest, search_error, MAX_RADIUS_KM
+from src.services.name_search import patient_name_filter
+from src.services.serializers import serializer_for, serialize_many, json_response, stream_response, encoded_response
+from src.services.trip_stats import trip_stats
+from src.services.driver_ratings import rating_summary
+from src.services.pagination import paginate, InvalidCursor, MAX_LIMIT
+from src.services.office_stats import office_stats
+from src.services.driver_positions import position_store
+from src.services.driver_schedule import driver_schedule, lock_driver
+from src.services.day_schedule import day_schedule, schedule_json
+from src.services import dispatch
+from datetime import datetime, date, timedelta
+from sqlalchemy import and_, func
 import json
 
 office_bp = Blueprint('office', __name__)
 
+MAX_SCHEDULE_DAYS = 31
+MAX_BULK_ASSIGNMENTS = 500
+
+
+def _assignment_pairs(data):
+    """(ride id, driver id) pairs from a request's assignments list, or (None, error message)"""
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+    assignments = data.get('assignments')
+    if not isinstance(assignments, list) or not assignments:
+        return None, 'assignments is required'
+    if len(assignments) > MAX_BULK_ASSIGNMENTS:
+        return None, f'At most {MAX_BULK_ASSIGNMENTS} assignments per request'
+    if not all(isinstance(item, dict) and isinstance(item.get('rideId'), str) and item['rideId']
+               and isinstance(item.get('driverId'), str) and item['driverId'] for item in assignments):
+        return None, 'Each assignment needs rideId and driverId strings'
+    return [(item['rideId'], item['driverId']) for item in assignments], None
+
 @office_bp.route('/stats', methods=['GET'])
 @token_required
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
 def get_office_stats(current_user):
     try:
-        # Count new ride requests (pending)
-        new_requests = Ride.query.filter_by(status='PENDING').count()
-        
-        # Count today's total rides
-        today = date.today()
-        today_total_rides = Ride.query.filter(
-            func.date(Ride.appointment_time) == today
-        ).count()
-        
-        # Count available drivers
-        available_drivers = User.query.filter_by(role='driver', status='Active').count()
-        total_drivers = User.query.filter_by(role='driver').count()
+        stats, age = office_stats.get()
+        stats['snapshotAgeSeconds'] = age
         
-        # Count total patients
-        total_patients = Patient.query.count()
-        
-        return jsonify({
-            'newRequests': new_requests,
-            'todayTotalRides': today_total_rides,
-            'availableDrivers': available_drivers,
-            'totalDrivers': total_drivers,
-            'totalPatients': total_patients
-        }), 200
+        return jsonify(stats), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get office stats', 'error': str(e)}), 500
@@ -45,13 +56,13 @@ def get_office_stats(current_user):
 def get_urgent_rides(current_user):
     try:
         # Get all pending rides that need assignment
-        rides = Ride.query.filter_by(status='PENDING')\
-                         .order_by(Ride.appointment_time.asc())\
-                         .all()
+        query = with_loading_plan(Ride.query.filter_by(status='PENDING'))\
+                         .order_by(Ride.appointment_time.asc())
         
-        rides_data = []
-        for ride in rides:
-            ride_dict = ride.to_dict()
+        serialize_ride = serializer_for(Ride)
+        
+        def ride_dict_for(ride):
+            ride_dict = serialize_ride(ride)
             
             # Add additional fields needed by the office view
             if ride.patient:
@@ -60,72 +71,113 @@ def get_urgent_rides(current_user):
                 
             # Mock trip type - in real app this would be stored
             ride_dict['tripType'] = 'นัดหมอตามปกติ'
-            
-            rides_data.append(ride_dict)
+            return ride_dict
         
-        return jsonify(rides_data), 200
+        return stream_response(query, ride_dict_for), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get urgent rides', 'error': str(e)}), 500
 
-@office_bp.route('/rides/today-schedule', methods=['GET'])
+@office_bp.route('/rides/nearby', methods=['GET'])
 @token_required
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
-def get_today_schedule(current_user):
+def get_nearby_rides(current_user):
     try:
-        today = date.today()
-        
-        # Get all rides scheduled for today (assigned, in-progress, etc.)
-        rides = Ride.query.filter(
-            and_(
-                func.date(Ride.appointment_time) == today,
-                Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS', 'COMPLETED'])
-            )
-        ).order_by(Ride.appointment_time.asc()).all()
-        
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None:
+            return jsonify({'message': 'lat and lng are required'}), 400
+        radius_km = request.args.get('radius', type=float)
+        k = request.args.get('k', type=int)
+        error = search_error(radius_km, k, current_app.config.get('PAGE_LIMIT_MAX', MAX_LIMIT))
+        if error:
+            return jsonify({'message': error}), 400
+        status = request.args.get('status', 'PENDING', type=str)
+        
+        # Pickups are at the patient's coordinates
+        query = with_loading_plan(Ride.query.join(Ride.patient).filter(Ride.status == status))
+        locate = lambda ride: ride.patient
+        if k is not None:
+            matches = nearest(query, lat, lng, k, max_radius_km=radius_km or MAX_RADIUS_KM)
+        else:
+            matches = within_radius(query, lat, lng, radius_km or 10.0, locate=locate)
+        
+        serialize_ride = serializer_for(Ride)
         rides_data = []
-        for ride in rides:
-            ride_dict = ride.to_dict()
+        for ride, distance in matches:
+            ride_dict = serialize_ride(ride)
+            ride_dict['distanceKm'] = round(distance, 2)
             rides_data.append(ride_dict)
         
-        return jsonify(rides_data), 200
+        return json_response(rides_data), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get nearby rides', 'error': str(e)}), 500
+
+@office_bp.route('/rides/today-schedule', methods=['GET'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def get_today_schedule(current_user):
+    try:
+        # Today's rides (assigned, in-progress, etc.) in the local timezone, from the day cache
+        today = day_schedule.today()
+        return encoded_response(day_schedule.rides(today)[today]), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get today schedule', 'error': str(e)}), 500
 
+@office_bp.route('/rides/schedule', methods=['GET'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def get_schedule(current_user):
+    """Scheduled rides per local day for ?days= days (default 7) starting at ?from=YYYY-MM-DD (default today)"""
+    try:
+        try:
+            first_day = date.fromisoformat(request.args['from']) if request.args.get('from') else day_schedule.today()
+        except ValueError:
+            return jsonify({'message': 'from must be a date (YYYY-MM-DD)'}), 400
+        days = request.args.get('days', 7, type=int)
+        if not 1 <= days <= MAX_SCHEDULE_DAYS:
+            return jsonify({'message': f'days must be between 1 and {MAX_SCHEDULE_DAYS}'}), 400
+        
+        meta = {
+            'timezone': str(day_schedule.tz),
+            'from': first_day.isoformat(),
+            'days': days,
+            'previousFrom': (first_day - timedelta(days=days)).isoformat(),
+            'nextFrom': (first_day + timedelta(days=days)).isoformat(),
+        }
+        body = schedule_json(meta, day_schedule.rides(first_day, days))
+        return Response(body, mimetype='application/json'), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get schedule', 'error': str(e)}), 500
+
 @office_bp.route('/drivers/live-status', methods=['GET'])
 @token_required
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
 def get_drivers_live_status(current_user):
     try:
-        # Get all drivers with their current status
-        drivers = User.query.filter_by(role='driver').all()
-        
+        # One grouped query for every driver's active ride; positions come from memory
+        active_rides = db.session.query(User.id, User.name, func.max(Ride.id).label('current_ride_id'))\
+            .outerjoin(Ride, and_(
+                Ride.driver_id == User.id,
+                Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS'])
+            ))\
+            .filter(User.role == 'driver')\
+            .group_by(User.id, User.name)\
+            .all()
+        
+        now = datetime.utcnow()
         drivers_data = []
-        for driver in drivers:
-            # Check if driver has any active ride
-            active_ride = Ride.query.filter(
-                and_(
-                    Ride.driver_id == driver.id,
-                    Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS'])
-                )
-            ).first()
-            
-            # Mock location data - in real app this would come from GPS tracking
-            mock_locations = {
-                'driver1@wecare.dev': {'lat': 13.7563, 'lng': 100.5018},
-                'driver2@wecare.dev': {'lat': 13.7367, 'lng': 100.5532},
-                'driver3@wecare.dev': {'lat': 13.7278, 'lng': 100.5241}
-            }
-            
+        for driver_id, name, current_ride_id in active_rides:
             driver_data = {
-                'id': driver.id,
-                'fullName': driver.name,
-                'status': 'ON_TRIP' if active_ride else 'AVAILABLE',
-                'currentLocation': mock_locations.get(driver.email, {'lat': 13.7563, 'lng': 100.5018}),
-                'currentRideId': active_ride.id if active_ride else None
+                'id': driver_id,
+                'fullName': name,
+                'status': 'ON_TRIP' if current_ride_id else 'AVAILABLE',
+                'currentRideId': current_ride_id
             }
-            
+            driver_data.update(position_store.live(driver_id, now))
             drivers_data.append(driver_data)
         
         return jsonify(drivers_data), 200
@@ -133,6 +185,40 @@ def get_drivers_live_status(current_user):
     except Exception as e:
         return jsonify({'message': 'Failed to get drivers live status', 'error': str(e)}), 500
 
+@office_bp.route('/drivers/available', methods=['GET'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def get_available_drivers(current_user):
+    """Active drivers with no ride near ?time= (ISO 8601) or the appointment of ?rideId="""
+    try:
+        ride_id = request.args.get('rideId')
+        if ride_id:
+            ride = Ride.query.filter_by(id=ride_id).first()
+            if not ride:
+                return jsonify({'message': 'Ride not found'}), 404
+            slot = ride.appointment_time
+        elif request.args.get('time'):
+            try:
+                slot = datetime.fromisoformat(request.args['time'].replace('Z', '+00:00')).replace(tzinfo=None)
+            except ValueError:
+                return jsonify({'message': 'time must be an ISO 8601 timestamp'}), 400
+        else:
+            return jsonify({'message': 'time or rideId is required'}), 400
+        
+        drivers = db.session.query(User.id, User.name)\
+            .filter(User.role == 'driver', User.status == 'Active')\
+            .order_by(User.name)\
+            .all()
+        free = set(driver_schedule.free_drivers([driver.id for driver in drivers], slot))
+        
+        return jsonify({
+            'slot': slot.isoformat(),
+            'drivers': [{'id': driver.id, 'fullName': driver.name} for driver in drivers if driver.id in free]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get available drivers', 'error': str(e)}), 500
+
 @office_bp.route('/rides/<ride_id>/assign', methods=['POST'])
 @token_required
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
@@ -146,25 +232,18 @@ def assign_driver_to_ride(current_user, ride_id):
         driver_id = data['driverId']
         
         # Verify ride exists and is pending
-        ride = Ride.query.filter_by(id=ride_id, status='PENDING').first()
+        ride = Ride.query.filter_by(id=ride_id, status='PENDING').with_for_update().first()
         if not ride:
             return jsonify({'message': 'Ride not found or not pending'}), 404
         
-        # Verify driver exists and is available
-        driver = User.query.filter_by(id=driver_id, role='driver', status='Active').first()
+        # Verify driver exists and is available; the lock holds off other
+        # assignments of this driver until this one commits
+        driver = lock_driver(driver_id)
         if not driver:
             return jsonify({'message': 'Driver not found or not available'}), 404
         
         # Check if driver already has an active ride at the same time
-        conflicting_ride = Ride.query.filter(
-            and_(
-                Ride.driver_id == driver_id,
-                Ride.status.in_(['ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS']),
-                func.abs(func.extract('epoch', Ride.appointment_time - ride.appointment_time)) < 3600  # Within 1 hour
-            )
-        ).first()
-        
-        if conflicting_ride:
+        if not driver_schedule.is_free(driver_id, ride.appointment_time, exclude_ride_id=ride.id, confirm=True):
             return jsonify({'message': 'Driver has conflicting ride at similar time'}), 400
         
         # Assign driver to ride
@@ -179,13 +258,92 @@ def assign_driver_to_ride(current_user, ride_id):
         db.session.rollback()
         return jsonify({'message': 'Failed to assign driver', 'error': str(e)}), 500
 
+@office_bp.route('/rides/assign-bulk', methods=['POST'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def assign_drivers_bulk(current_user):
+    """Assign many {rideId, driverId} pairs in one transaction; valid pairs are saved, the rest reported"""
+    try:
+        pairs, message = _assignment_pairs(request.get_json(silent=True) or {})
+        if message:
+            return jsonify({'message': message}), 400
+        
+        errors = dispatch.commit(pairs, all_or_nothing=False)
+        results = []
+        for (ride_id, driver_id), error in zip(pairs, errors):
+            result = {'rideId': ride_id, 'driverId': driver_id, 'assigned': error is None}
+            if error:
+                result['error'] = error
+            results.append(result)
+        assigned = sum(1 for error in errors if error is None)
+        
+        return jsonify({
+            'message': f'{assigned} of {len(pairs)} rides assigned',
+            'assigned': assigned,
+            'failed': len(pairs) - assigned,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to assign drivers', 'error': str(e)}), 500
+
+@office_bp.route('/dispatch/plan', methods=['POST'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def plan_dispatch(current_user):
+    """Proposed drivers for PENDING rides between from and to (default: the next 24 hours); nothing is saved"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'message': 'Request body must be a JSON object'}), 400
+        mode = data.get('mode', 'optimal')
+        if mode not in dispatch.MODES:
+            return jsonify({'message': f'mode must be one of {", ".join(dispatch.MODES)}'}), 400
+        try:
+            start = datetime.fromisoformat(data['from'].replace('Z', '+00:00')).replace(tzinfo=None) \
+                if data.get('from') else datetime.utcnow()
+            end = datetime.fromisoformat(data['to'].replace('Z', '+00:00')).replace(tzinfo=None) \
+                if data.get('to') else start + timedelta(days=1)
+        except (AttributeError, ValueError):
+            return jsonify({'message': 'from and to must be ISO 8601 timestamps'}), 400
+        if end <= start:
+            return jsonify({'message': 'to must be after from'}), 400
+        
+        return jsonify(dispatch.propose(start, end, mode)), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to plan dispatch', 'error': str(e)}), 500
+
+@office_bp.route('/dispatch/commit', methods=['POST'])
+@token_required
+@role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
+def commit_dispatch(current_user):
+    """Apply a dispatch plan's assignments in one transaction; nothing is saved if any of them fails"""
+    try:
+        pairs, message = _assignment_pairs(request.get_json(silent=True) or {})
+        if message:
+            return jsonify({'message': message}), 400
+        
+        errors = dispatch.commit(pairs)
+        if any(errors):
+            return jsonify({
+                'message': 'Dispatch plan is out of date; no rides were assigned',
+                'conflicts': [{'rideId': ride_id, 'driverId': driver_id, 'error': error}
+                              for (ride_id, driver_id), error in zip(pairs, errors) if error],
+            }), 409
+        
+        return jsonify({'message': f'{len(pairs)} rides assigned', 'assigned': len(pairs)}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to commit dispatch', 'error': str(e)}), 500
+
 @office_bp.route('/rides', methods=['GET'])
 @token_required
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
 def get_all_rides(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         status = request.args.get('status', '', type=str)
         search = request.args.get('search', '', type=str)
         
@@ -195,25 +353,17 @@ def get_all_rides(current_user):
             query = query.filter(Ride.status == status)
         
         if search:
-            query = query.join(Patient).filter(Patient.full_name.ilike(f'%{search}%'))
+            query = query.join(Patient).filter(patient_name_filter(search))
         
-        total_rides = query.count()
-        total_pages = (total_rides + limit - 1) // limit
+        rides, page_info = paginate(query, Ride.created_at, Ride.id, loaded=with_loading_plan(query))
         
-        rides = query.order_by(Ride.created_at.desc())\
-                    .offset((page - 1) * limit)\
-                    .limit(limit)\
-                    .all()
-        
-        rides_data = []
-        for ride in rides:
-            rides_data.append(ride.to_dict())
-        
-        return jsonify({
-            'rides': rides_data,
-            'totalPages': total_pages
+        return json_response({
+            'rides': serialize_many(Ride, rides),
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get rides', 'error': str(e)}), 500
 
@@ -222,32 +372,22 @@ def get_all_rides(current_user):
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
 def get_all_patients(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         search = request.args.get('search', '', type=str)
         
         query = Patient.query
         
         if search:
-            query = query.filter(Patient.full_name.ilike(f'%{search}%'))
-        
-        total_patients = query.count()
-        total_pages = (total_patients + limit - 1) // limit
+            query = query.filter(patient_name_filter(search))
         
-        patients = query.order_by(Patient.registered_date.desc())\
-                       .offset((page - 1) * limit)\
-                       .limit(limit)\
-                       .all()
+        patients, page_info = paginate(query, Patient.registered_date, Patient.id, loaded=with_loading_plan(query))
         
-        patients_data = []
-        for patient in patients:
-            patients_data.append(patient.to_dict())
-        
-        return jsonify({
-            'patients': patients_data,
-            'totalPages': total_pages
+        return json_response({
+            'patients': serialize_many(Patient, patients),
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get patients', 'error': str(e)}), 500
 
@@ -256,8 +396,6 @@ def get_all_patients(current_user):
 @role_required(['office', 'OFFICER', 'admin', 'DEVELOPER'])
 def get_all_drivers(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
         search = request.args.get('search', '', type=str)
         
         query = User.query.filter_by(role='driver')
@@ -265,47 +403,31 @@ def get_all_drivers(current_user):
         if search:
             query = query.filter(User.name.ilike(f'%{search}%'))
         
-        total_drivers = query.count()
-        total_pages = (total_drivers + limit - 1) // limit
-        
-        drivers = query.order_by(User.created_at.desc())\
-                      .offset((page - 1) * limit)\
-                      .limit(limit)\
-                      .all()
+        drivers, page_info = paginate(query, User.created_at, User.id, loaded=with_loading_plan(query))
         
+        serialize_user = serializer_for(User)
         drivers_data = []
         for driver in drivers:
-            driver_dict = driver.to_dict()
+            driver_dict = serialize_user(driver)
             
             if driver.driver_profile:
                 driver_dict.update({
                     'licensePlate': driver.driver_profile.license_plate,
-                    'address': driver.driver_profile.address,
-                    'avgReviewScore': float(driver.driver_profile.avg_review_score)
+                    'address': driver.driver_profile.address
                 })
+                driver_dict.update(rating_summary(driver.driver_profile))
             
             # Add trip statistics
-            total_trips = Ride.query.filter_by(driver_id=driver.id, status='COMPLETED').count()
-            trips_this_month = Ride.query.filter(
-                and_(
-                    Ride.driver_id == driver.id,
-                    Ride.status == 'COMPLETED',
-                    extract('month', Ride.created_at) == datetime.now().month,
-                    extract('year', Ride.created_at) == datetime.now().year
-                )
-            ).count()
-            
-            driver_dict.update({
-                'totalTrips': total_trips,
-                'tripsThisMonth': trips_this_month
-            })
+            driver_dict.update(trip_stats(driver.driver_profile))
             
             drivers_data.append(driver_dict)
         
-        return jsonify({
+        return json_response({
             'drivers': drivers_data,
-            'totalPages': total_pages
+            **page_info
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get drivers', 'error': str(e)}), 500
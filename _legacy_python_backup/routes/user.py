@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify, request
 from src.models.ems_models import User, db
+from src.services.user_cache import user_cache
+from src.services.stateless_auth import revocation_list, record_revocation
+from src.services.serializers import serialize_many, json_response
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return json_response(serialize_many(User, users))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -30,6 +33,7 @@ def get_user(user_id):
 def update_user(user_id):
     user = User.query.get_or_404(user_id)
     data = request.json
+    claims = (user.email, user.role, user.status)
     if 'username' in data or 'name' in data:
         user.name = data.get('username', data.get('name', user.name))
     if 'email' in data:
@@ -38,12 +42,23 @@ def update_user(user_id):
         user.role = data['role']
     if 'status' in data:
         user.status = data['status']
+    # Claims baked into existing tokens (email, role, status) have changed,
+    # so stateless-mode workers must stop trusting those tokens
+    revocation = None
+    if (user.email, user.role, user.status) != claims:
+        revocation = record_revocation(user_id, revoked=user.status != 'Active')
     db.session.commit()
+    user_cache.invalidate(user_id)
+    if revocation is not None:
+        revocation_list.apply(revocation)
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
+    revocation = record_revocation(user_id, revoked=True)
     db.session.commit()
+    user_cache.invalidate(user_id)
+    revocation_list.apply(revocation)
     return '', 204
@@ -25,11 +25,11 @@ def seed_sample_data():
         
         # Create sample patients
         patients_data = [
-            {'full_name': 'กานดา สุขใจ', 'contact_phone': '081-111-1111', 'current_address': '{"address": "123 ถนนสุขุมวิท"}'},
-            {'full_name': 'วิชัย มีนัย', 'contact_phone': '082-222-2222', 'current_address': '{"address": "456 ถนนพหลโยธิน"}'},
-            {'full_name': 'มานี ใจดี', 'contact_phone': '083-333-3333', 'current_address': '{"address": "789 ถนนรัชดา"}'},
-            {'full_name': 'สมศรี รักสงบ', 'contact_phone': '084-444-4444', 'current_address': '{"address": "321 ถนนเพชรบุรี"}'},
-            {'full_name': 'อรุณ รุ่งเรือง', 'contact_phone': '085-555-5555', 'current_address': '{"address": "654 ถนนสาทร"}'},
+            {'full_name': 'กานดา สุขใจ', 'contact_phone': '081-111-1111', 'current_address': {'address': '123 ถนนสุขุมวิท'}},
+            {'full_name': 'วิชัย มีนัย', 'contact_phone': '082-222-2222', 'current_address': {'address': '456 ถนนพหลโยธิน'}},
+            {'full_name': 'มานี ใจดี', 'contact_phone': '083-333-3333', 'current_address': {'address': '789 ถนนรัชดา'}},
+            {'full_name': 'สมศรี รักสงบ', 'contact_phone': '084-444-4444', 'current_address': {'address': '321 ถนนเพชรบุรี'}},
+            {'full_name': 'อรุณ รุ่งเรือง', 'contact_phone': '085-555-5555', 'current_address': {'address': '654 ถนนสาทร'}},
         ]
         
         patients = []
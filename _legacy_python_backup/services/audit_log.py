@@ -0,0 +1,83 @@
+"""Asynchronous, batched audit logging.
+
+Every successful mutating request (POST/PUT/PATCH/DELETE answered with a
+2xx) becomes an AuditLog event. The request only queues the event, and a
+BatchWriter thread (services/batch_writer.py) writes events with one
+multi-row INSERT per batch. It flushes when a batch is full or
+AUDIT_FLUSH_INTERVAL seconds after its first event, whichever comes first.
+Audit writes therefore never add a round trip or row locks to the
+request's own transaction. Batches go to the month partition of each
+event (services/audit_storage.py).
+
+When the queue is full the AUDIT_OVERFLOW policy applies ('drop' or
+'block' for up to AUDIT_BLOCK_TIMEOUT seconds). Dropped events are
+counted in stats().
+
+Events record who (email and role), what (the endpoint, e.g.
+'driver.update_ride_status') and which record (the first URL argument,
+e.g. the ride id). They also record the client IP and the method, path,
+status and the names of the fields sent. Field values are never
+recorded, so passwords and health data stay out of the log. High-volume
+endpoints marked @audit_exempt (e.g. GPS pings) are not audited.
+"""
+from datetime import datetime
+from flask import current_app, g, request
+from src.models.ids import new_id
+from src.services.audit_storage import audit_storage
+from src.services.batch_writer import BatchWriter
+from src.services.diagnostics import register_stats
+
+MUTATING_METHODS = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+
+def audit_exempt(view):
+    """Leave a view's requests out of the audit log"""
+    view.audit_exempt = True
+    return view
+
+
+class AuditWriter(BatchWriter):
+    def init_app(self, app):
+        if not app.config.get('AUDIT_LOG_ENABLED', True):
+            return
+        self.configure(
+            app,
+            queue_size=app.config.get('AUDIT_QUEUE_SIZE', self._queue.maxsize),
+            batch_size=app.config.get('AUDIT_BATCH_SIZE', self.batch_size),
+            flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', self.flush_interval),
+            overflow=app.config.get('AUDIT_OVERFLOW', self.overflow),
+            block_timeout=app.config.get('AUDIT_BLOCK_TIMEOUT', self.block_timeout),
+        )
+
+        @app.after_request
+        def audit_request(response):
+            if request.method in MUTATING_METHODS and request.endpoint and 200 <= response.status_code < 300:
+                view = current_app.view_functions.get(request.endpoint)
+                if not getattr(view, 'audit_exempt', False):
+                    self.enqueue(_event_from_request(response))
+            return response
+
+
+def _event_from_request(response):
+    user = g.get('current_user')
+    view_args = request.view_args or {}
+    body = request.get_json(silent=True) if request.is_json else request.form
+    return {
+        'id': new_id(),
+        'timestamp': datetime.utcnow(),
+        'user_email': getattr(user, 'email', None) or 'anonymous',
+        'user_role': getattr(user, 'role', None) or 'anonymous',
+        'action': request.endpoint[:100],
+        'target_id': str(next(iter(view_args.values())))[:36] if view_args else None,
+        'ip_address': (request.remote_addr or '')[:45],
+        'data_payload': {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'fields': sorted(body.keys()) if hasattr(body, 'keys') else [],
+        },
+    }
+
+
+audit_log = AuditWriter(audit_storage.insert, name='audit-writer')
+register_stats('audit', audit_log.stats)
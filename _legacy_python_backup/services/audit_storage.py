@@ -0,0 +1,260 @@
+"""Month-partitioned audit log storage with archival.
+
+Audit events are stored one calendar month (UTC) per partition:
+
+- MySQL: audit_logs is natively partitioned BY RANGE (TO_DAYS(timestamp)),
+  one partition pYYYYMM per month plus a catch-all pmax. A time-range
+  predicate on timestamp lets MySQL prune to the partitions it needs.
+- SQLite (no native partitioning): one table audit_logs_YYYYMM per month,
+  created on first write. Queries only open the tables whose months
+  overlap the requested range, newest first, and stop once they have
+  enough rows.
+
+Partitions whose whole month is older than AUDIT_RETENTION_MONTHS are
+archived by archive_expired(): the rows are written to
+AUDIT_ARCHIVE_DIR/audit_logs_YYYYMM.jsonl.gz, one JSON object per line,
+and the partition (or month table) is dropped only after the file is
+complete. manage_audit_partitions.py runs this and creates the coming
+months' MySQL partitions; schedule it monthly.
+"""
+import gzip
+import os
+import re
+import threading
+from datetime import datetime
+from sqlalchemy import MetaData, Table, func, inspect, select, text
+from src.models.ems_models import db, AuditLog
+from src.services.serializers import serializer_for, dumps
+
+TABLE_PREFIX = 'audit_logs_'
+MONTH_TABLE = re.compile(r'^audit_logs_(\d{6})$')
+MONTH_PARTITION = re.compile(r'^p(\d{6})$')
+MAX_QUERY_LIMIT = 1000
+
+
+def month_key(moment):
+    return f'{moment.year:04d}{moment.month:02d}'
+
+
+def month_start(key):
+    return datetime(int(key[:4]), int(key[4:]), 1)
+
+
+def add_months(key, months):
+    index = int(key[:4]) * 12 + int(key[4:]) - 1 + months
+    return f'{index // 12:04d}{index % 12 + 1:02d}'
+
+
+def month_keys(start, end):
+    """Keys of every month overlapping [start, end), oldest first"""
+    keys = []
+    key = month_key(start)
+    while month_start(key) < end:
+        keys.append(key)
+        key = add_months(key, 1)
+    return keys
+
+
+class AuditStorage:
+    def __init__(self, retention_months=12, archive_dir=None):
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self._metadata = MetaData()
+        self._tables = {}
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.retention_months = app.config.get('AUDIT_RETENTION_MONTHS', self.retention_months)
+        self.archive_dir = app.config.get('AUDIT_ARCHIVE_DIR') or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'database', 'audit_archive')
+
+    @staticmethod
+    def native(connection):
+        return connection.dialect.name == 'mysql'
+
+    def month_table(self, key):
+        """The SQLite table holding one month of events (not yet created)"""
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    name = TABLE_PREFIX + key
+                    base = AuditLog.__table__
+                    table = Table(
+                        name, self._metadata,
+                        *(column._copy() for column in base.columns),
+                        *(db.Index(index.name.replace('audit_logs', name, 1),
+                                   *(column.name for column in index.columns))
+                          for index in base.indexes),
+                    )
+                    self._tables[key] = table
+        return table
+
+    def insert(self, connection, events):
+        """Write a batch of events (dicts of AuditLog columns) in the caller's transaction"""
+        if self.native(connection):
+            connection.execute(AuditLog.__table__.insert(), events)
+            return
+        by_month = {}
+        for event in events:
+            by_month.setdefault(month_key(event['timestamp']), []).append(event)
+        for key, rows in by_month.items():
+            table = self.month_table(key)
+            if key not in self._created:
+                table.create(connection, checkfirst=True)
+                self._created.add(key)
+            connection.execute(table.insert(), rows)
+
+    def partitions(self, connection):
+        """Month keys that currently hold live (unarchived) events, oldest first"""
+        if self.native(connection):
+            names = connection.execute(text(
+                'SELECT partition_name FROM information_schema.partitions '
+                'WHERE table_schema = DATABASE() AND table_name = :table AND partition_name IS NOT NULL'
+            ), {'table': AuditLog.__tablename__}).scalars()
+            pattern = MONTH_PARTITION
+        else:
+            names = inspect(connection).get_table_names()
+            pattern = MONTH_TABLE
+        return sorted(match.group(1) for match in map(pattern.match, names) if match)
+
+    def query(self, start, end, user_email=None, action=None, limit=100):
+        """Events with start <= timestamp < end, newest first, as dicts"""
+        limit = max(1, min(limit, MAX_QUERY_LIMIT))
+        serialize = serializer_for(AuditLog)
+        with db.engine.connect() as connection:
+            if self.native(connection):
+                tables = [AuditLog.__table__]
+            else:
+                live = set(self.partitions(connection))
+                tables = [self.month_table(key) for key in reversed(month_keys(start, end)) if key in live]
+            results = []
+            for table in tables:
+                statement = select(table).where(table.c.timestamp >= start, table.c.timestamp < end)
+                if user_email:
+                    statement = statement.where(table.c.user_email == user_email)
+                if action:
+                    statement = statement.where(table.c.action == action)
+                statement = statement.order_by(table.c.timestamp.desc()).limit(limit - len(results))
+                results.extend(serialize(row) for row in connection.execute(statement))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def ensure_partitions(self, now=None, ahead=2):
+        """Create partitions for this month and the next `ahead` months.
+
+        On MySQL the first run converts audit_logs into a partitioned table
+        (rewriting it); later runs split new months off pmax, which is empty
+        as long as this runs before those months start. On SQLite month
+        tables are created on demand; this only moves rows written to the
+        unpartitioned audit_logs table by earlier versions into them.
+        Returns the month keys created.
+        """
+        now = now or datetime.utcnow()
+        wanted = [add_months(month_key(now), offset) for offset in range(ahead + 1)]
+        with db.engine.begin() as connection:
+            if self.native(connection):
+                return self._ensure_native(connection, wanted)
+            return self._move_legacy_rows(connection)
+
+    def _ensure_native(self, connection, wanted):
+        existing = self.partitions(connection)
+        if existing:
+            missing = [key for key in wanted if key > existing[-1]]
+            if missing:
+                connection.execute(text(
+                    f'ALTER TABLE audit_logs REORGANIZE PARTITION pmax INTO ({_partition_list(missing)})'
+                ))
+            return missing
+
+        # Every unique key of a partitioned table must contain the partitioning column
+        primary_key = inspect(connection).get_pk_constraint('audit_logs')['constrained_columns']
+        if 'timestamp' not in primary_key:
+            connection.execute(text('ALTER TABLE audit_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)'))
+        oldest = connection.execute(select(func.min(AuditLog.__table__.c.timestamp))).scalar()
+        first = min(month_key(oldest), wanted[0]) if oldest else wanted[0]
+        keys = []
+        key = first
+        while key <= wanted[-1]:
+            keys.append(key)
+            key = add_months(key, 1)
+        connection.execute(text(
+            f'ALTER TABLE audit_logs PARTITION BY RANGE (TO_DAYS(timestamp)) ({_partition_list(keys)})'
+        ))
+        return keys
+
+    def _move_legacy_rows(self, connection, batch_size=5000):
+        base = AuditLog.__table__
+        if not inspect(connection).has_table(base.name):
+            return []
+        months = connection.execute(select(func.distinct(func.strftime('%Y%m', base.c.timestamp)))).scalars().all()
+        for key in months:
+            start = month_start(key)
+            end = month_start(add_months(key, 1))
+            rows = connection.execute(
+                select(base).where(base.c.timestamp >= start, base.c.timestamp < end)
+            ).mappings().all()
+            for offset in range(0, len(rows), batch_size):
+                self.insert(connection, [dict(row) for row in rows[offset:offset + batch_size]])
+            connection.execute(base.delete().where(base.c.timestamp >= start, base.c.timestamp < end))
+        return sorted(months)
+
+    def expired(self, connection, now=None):
+        """Live month keys entirely older than the retention window"""
+        if not self.retention_months:
+            return []
+        cutoff = add_months(month_key(now or datetime.utcnow()), -self.retention_months)
+        return [key for key in self.partitions(connection) if key < cutoff]
+
+    def archive_expired(self, now=None, dry_run=False):
+        """Archive and drop expired partitions; returns [(month key, rows, path)]"""
+        with db.engine.connect() as connection:
+            expired = self.expired(connection, now)
+        archived = []
+        for key in expired:
+            path = os.path.join(self.archive_dir, f'{TABLE_PREFIX}{key}.jsonl.gz')
+            if dry_run:
+                archived.append((key, None, path))
+                continue
+            archived.append((key, self._archive_month(key, path), path))
+        return archived
+
+    def _archive_month(self, key, path):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        start = month_start(key)
+        end = month_start(add_months(key, 1))
+        serialize = serializer_for(AuditLog)
+        count = 0
+        with db.engine.begin() as connection:
+            native = self.native(connection)
+            table = AuditLog.__table__ if native else self.month_table(key)
+            statement = select(table).where(table.c.timestamp >= start, table.c.timestamp < end)\
+                .order_by(table.c.timestamp)
+            partial = path + '.partial'
+            with gzip.open(partial, 'wb') as archive:
+                for row in connection.execution_options(stream_results=True, yield_per=5000).execute(statement):
+                    archive.write(dumps(serialize(row)) + b'\n')
+                    count += 1
+            # Only a complete archive replaces the live partition
+            os.replace(partial, path)
+            if native:
+                connection.execute(text(f'ALTER TABLE audit_logs DROP PARTITION p{key}'))
+            else:
+                table.drop(connection)
+                self._created.discard(key)
+        return count
+
+
+def _partition_list(keys):
+    partitions = [
+        f"PARTITION p{key} VALUES LESS THAN (TO_DAYS('{month_start(add_months(key, 1)):%Y-%m-%d}'))"
+        for key in keys
+    ]
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+    return ', '.join(partitions)
+
+
+audit_storage = AuditStorage()
@@ -0,0 +1,164 @@
+"""Background writer that persists queued rows in batched INSERTs.
+
+Callers put rows (dicts) on a bounded in-process queue and return at once.
+A daemon thread drains the queue and hands each batch to the writer's
+insert(connection, rows) callable inside one transaction. A batch is written when it is full or flush_interval
+seconds after its first row, whichever comes first.
+
+When the queue is full the overflow policy applies:
+- 'drop' (default) discards the new row at once.
+- 'block' waits up to block_timeout seconds for room, then discards.
+Dropped rows are counted in stats(). Rows still queued at interpreter
+shutdown are flushed by an atexit hook.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from src.models.ems_models import db
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    def __init__(self, insert, name='batch-writer', queue_size=10000, batch_size=500, flush_interval=1.0,
+                 overflow='drop', block_timeout=0.05):
+        self.insert = insert
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._exit_hook = False
+        self._lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+    def configure(self, app, queue_size, batch_size, flush_interval, overflow, block_timeout):
+        """Apply settings and start accepting rows for app"""
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f'Unknown overflow policy for {self.name}: {overflow}')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._app = app
+        if not self._exit_hook:
+            atexit.register(self.shutdown)
+            self._exit_hook = True
+
+    def enqueue(self, row):
+        """Queue one row; never raises"""
+        if self._app is None:
+            return False
+        self._ensure_started()
+        try:
+            if self.overflow == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        if self._writer_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        # Whatever the writer did not get to (or everything, if it never ran)
+        if self._app is not None:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            'queued': self._queue.qsize(),
+            'queueSize': self._queue.maxsize,
+            'overflow': self.overflow,
+            'running': self._writer_alive(),
+        })
+        return stats
+
+    def _writer_alive(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self):
+        # Started lazily and per process, so forked server workers each get a writer
+        if self._writer_alive():
+            return
+        with self._lock:
+            if self._writer_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is _STOP:
+                return
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stop = True
+                    break
+                batch.append(row)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as connection:
+                    self.insert(connection, batch)
+        except Exception:
+            logger.exception('%s failed to write %d rows', self.name, len(batch))
+            self._count('failed', len(batch))
+            return
+        self._count('written', len(batch))
+        self._count('batches')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
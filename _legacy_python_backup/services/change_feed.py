@@ -0,0 +1,369 @@
+"""Server-sent events change feed for the office and driver dashboards.
+
+Ride mapper events turn every committed ride write into a feed event:
+ride.created, ride.assigned, ride.unassigned, ride.status, ride.cancelled,
+ride.updated (rescheduled) or ride.deleted. That covers the office, driver
+and community blueprints, dispatch and any script. As with the schedule index, events wait in
+session.info until the session commits and are dropped on rollback.
+Events carry ids and status only, never patient details; clients refetch
+what they show.
+
+Subscribers connect with GET /api/events on CHANGE_FEED_PORT. EventSource
+cannot set headers, so the token comes in an Authorization header or in
+?token=. Office roles receive every event. Drivers receive events for
+rides assigned to them, or just taken off them. Community users receive
+events for rides they requested.
+
+The feed is served by one asyncio event loop on one thread. Each
+connection is a coroutine, so a worker holds hundreds of subscribers
+without a thread per client. Each event is encoded once and written to
+every matching subscriber's socket buffer. A subscriber whose buffer grows
+past CHANGE_FEED_MAX_BUFFER bytes is disconnected. It reconnects with
+Last-Event-ID and the last CHANGE_FEED_BACKLOG events are replayed. If the
+id is older than that, or newer than any this process has issued (it
+restarted), a "reset" event tells the client to reload.
+
+The token is checked again at every heartbeat and the connection is closed
+at the token's expiry. Either way the client gets an "unauthorized" event
+first, and should reconnect with a fresh token.
+
+The feed, like the position store, is per process. It starts with the
+first request a process handles, so a reloader parent never binds the
+port. Run the API as a single process and route CHANGE_FEED_PORT (or
+/api/events through a proxy) to it.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from src.models.ems_models import Ride
+from src.services.stateless_auth import authenticate_token, AuthError
+from src.services.diagnostics import register_stats
+
+FEED_PATH = '/api/events'
+OFFICE_ROLES = ('office', 'OFFICER', 'admin', 'DEVELOPER')
+OFFICE_KEY = 'office'
+DEFAULT_BACKLOG = 1000
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_MAX_BUFFER = 256 * 1024
+MAX_REQUEST_HEAD = 16 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def subscriber_key(user):
+    return OFFICE_KEY if user.role in OFFICE_ROLES else f'user:{user.id}'
+
+
+def _encode(event_id, event_type, data):
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event_type}\ndata: {body}\n\n'.encode('utf-8')
+
+
+def _http_error(writer, status, message):
+    body = json.dumps({'message': message}).encode('utf-8')
+    writer.write(
+        f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+        f'Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n'.encode('ascii') + body
+    )
+
+
+class ChangeFeed:
+    def __init__(self, backlog=DEFAULT_BACKLOG, heartbeat=DEFAULT_HEARTBEAT_SECONDS, max_buffer=DEFAULT_MAX_BUFFER):
+        self.heartbeat = heartbeat
+        self.max_buffer = max_buffer
+        self.host = '0.0.0.0'
+        self.port = None
+        self._backlog = deque(maxlen=backlog)  # (event id, audience, payload)
+        self._subscribers = {}                 # key -> set of StreamWriters
+        self._subscriber_count = 0
+        self._connections = set()              # handler tasks, cancelled on stop()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._app = None
+        self._loop = None
+        self._server = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'published': 0, 'delivered': 0, 'disconnectedSlow': 0, 'connections': 0}
+
+    def init_app(self, app):
+        self.heartbeat = app.config.get('CHANGE_FEED_HEARTBEAT', self.heartbeat)
+        self.max_buffer = app.config.get('CHANGE_FEED_MAX_BUFFER', self.max_buffer)
+        self._backlog = deque(maxlen=app.config.get('CHANGE_FEED_BACKLOG', self._backlog.maxlen))
+        self.host = app.config.get('CHANGE_FEED_HOST', self.host)
+        port = app.config.get('CHANGE_FEED_PORT')
+        if port is None:
+            return
+        self._app = app
+
+        @app.before_request
+        def start_change_feed():
+            # Once per process; a failed bind is logged, not retried on every request
+            if self._pid != os.getpid():
+                self.start(port=port)
+
+    def start(self, port=0, app=None):
+        """Serve the feed from this process (port 0 picks a free one); returns the bound port"""
+        if self._running():
+            return self.port
+        with self._lock:
+            if self._running():
+                return self.port
+            self._app = app or self._app
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._serve, args=(port, ready), name='change-feed', daemon=True)
+            thread.start()
+            ready.wait()
+            return self.port
+
+    def stop(self):
+        loop = self._loop
+        if loop is not None and self._running():
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+        self._loop = None
+
+    def publish(self, event_type, data, audience):
+        """Send an event to the subscriber keys in audience; safe from any thread, a no-op if not running"""
+        if not self._running():
+            return
+        self._loop.call_soon_threadsafe(self._fanout, event_type, data, tuple(audience))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            'running': self._running(),
+            'port': self.port,
+            'subscribers': self._subscriber_count,
+            'backlog': len(self._backlog),
+        })
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _running(self):
+        return self._loop is not None and self._pid == os.getpid() and self._server is not None
+
+    def _serve(self, port, ready):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, port, limit=MAX_REQUEST_HEAD))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            logger.warning('Change feed could not listen on %s:%s: %s', self.host, port, e)
+            self._loop = None
+            return
+        finally:
+            ready.set()
+        self._loop.run_forever()
+
+    async def _close(self):
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._server = None
+
+    def _fanout(self, event_type, data, audience):
+        event_id = self._last_id = next(self._ids)
+        payload = _encode(event_id, event_type, data)
+        self._backlog.append((event_id, audience, payload))
+        delivered = 0
+        for key in audience:
+            for writer in list(self._subscribers.get(key, ())):
+                if writer.transport.get_write_buffer_size() > self.max_buffer:
+                    self._count('disconnectedSlow')
+                    self._drop(key, writer)
+                    writer.close()
+                    continue
+                writer.write(payload)
+                delivered += 1
+        self._count('published')
+        self._count('delivered', delivered)
+
+    def _add(self, key, writer):
+        self._subscribers.setdefault(key, set()).add(writer)
+        self._subscriber_count += 1
+
+    def _drop(self, key, writer):
+        writers = self._subscribers.get(key)
+        if writers is not None and writer in writers:
+            writers.discard(writer)
+            self._subscriber_count -= 1
+            if not writers:
+                del self._subscribers[key]
+
+    async def _authenticate(self, token):
+        """(subscriber key, token expiry as epoch seconds or None); raises AuthError"""
+        def check():
+            with self._app.app_context():
+                key = subscriber_key(authenticate_token(token))
+            # Already verified above; this only reads the expiry back out
+            return key, jwt.decode(token, options={'verify_signature': False}).get('exp')
+        # Token checks may touch the database, so keep them off the event loop
+        return await self._loop.run_in_executor(None, check)
+
+    async def _handle(self, reader, writer):
+        key = None
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.heartbeat)
+            lines = head.decode('latin-1').split('\r\n')
+            method, target = lines[0].split(' ')[:2]
+            headers = dict(
+                (name.strip().lower(), value.strip())
+                for name, _, value in (line.partition(':') for line in lines[1:] if line)
+            )
+            url = urlsplit(target)
+            if url.path != FEED_PATH:
+                return _http_error(writer, '404 Not Found', 'Not found')
+            if method != 'GET':
+                return _http_error(writer, '405 Method Not Allowed', 'Use GET')
+            query = parse_qs(url.query)
+            token = headers.get('authorization', '').partition(' ')[2] or (query.get('token') or [''])[0]
+            if not token:
+                return _http_error(writer, '401 Unauthorized', 'Token is missing')
+            try:
+                key, expires = await self._authenticate(token)
+            except AuthError as e:
+                return _http_error(writer, '401 Unauthorized', str(e))
+
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                b'Access-Control-Allow-Origin: *\r\nX-Accel-Buffering: no\r\nConnection: keep-alive\r\n\r\n'
+                b'retry: 3000\n\n'
+            )
+            self._replay(writer, key, headers.get('last-event-id') or (query.get('lastEventId') or [None])[0])
+            self._add(key, writer)
+            self._count('connections')
+            while True:
+                remaining = expires - time.time() if expires else self.heartbeat
+                if remaining <= 0:
+                    writer.write(_encode(self._last_id, 'unauthorized', {'reason': 'Token has expired'}))
+                    break
+                try:
+                    if not await asyncio.wait_for(reader.read(1024), min(self.heartbeat, remaining)):
+                        break
+                except asyncio.TimeoutError:
+                    if remaining <= self.heartbeat:
+                        continue
+                    # Deactivated users and role changes end the subscription at the next heartbeat
+                    try:
+                        if (await self._authenticate(token))[0] != key:
+                            raise AuthError('Token no longer matches this subscription')
+                    except AuthError as e:
+                        writer.write(_encode(self._last_id, 'unauthorized', {'reason': str(e)}))
+                        break
+                    writer.write(b': keepalive\n\n')
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                asyncio.CancelledError, ConnectionError, ValueError):
+            # Disconnects, bad requests and stop(); the connection just ends
+            pass
+        except Exception:
+            logger.exception('Change feed connection failed')
+        finally:
+            self._connections.discard(task)
+            if key is not None:
+                self._drop(key, writer)
+            writer.close()
+
+    def _replay(self, writer, key, last_event_id):
+        if not last_event_id:
+            return
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return
+        # Ids restart at 1 with the process, so an id from the future was
+        # issued before a restart and the events since then are gone
+        if last_event_id > self._last_id or (self._backlog and last_event_id < self._backlog[0][0] - 1):
+            writer.write(_encode(self._last_id, 'reset', {'reason': 'backlog'}))
+            return
+        for event_id, audience, payload in self._backlog:
+            if event_id > last_event_id and key in audience:
+                writer.write(payload)
+
+
+def _pending(target):
+    return object_session(target).info.setdefault('feed_events', [])
+
+
+def _ride_event(event_type, ride, previous_driver_id=None):
+    audience = [OFFICE_KEY]
+    for user_id in (ride.driver_id, previous_driver_id, ride.requester_id):
+        if user_id is not None and f'user:{user_id}' not in audience:
+            audience.append(f'user:{user_id}')
+    data = {
+        'rideId': ride.id,
+        'status': ride.status,
+        'driverId': ride.driver_id,
+        'appointmentTime': ride.appointment_time.isoformat() if ride.appointment_time else None,
+        'at': datetime.utcnow().isoformat(),
+    }
+    if previous_driver_id is not None:
+        data['previousDriverId'] = previous_driver_id
+    return event_type, data, audience
+
+
+def _record_insert(mapper, connection, target):
+    _pending(target).append(_ride_event('ride.created', target))
+
+
+def _record_update(mapper, connection, target):
+    driver = get_history(target, 'driver_id')
+    status = get_history(target, 'status')
+    previous = driver.deleted[0] if driver.has_changes() and driver.deleted else None
+    if status.has_changes() and target.status == 'CANCELLED':
+        event_type = 'ride.cancelled'
+    elif driver.has_changes():
+        event_type = 'ride.assigned' if target.driver_id is not None else 'ride.unassigned'
+    elif status.has_changes():
+        event_type = 'ride.status'
+    elif get_history(target, 'appointment_time').has_changes():
+        event_type = 'ride.updated'
+    else:
+        return
+    _pending(target).append(_ride_event(event_type, target, previous if previous != target.driver_id else None))
+
+
+def _record_delete(mapper, connection, target):
+    _pending(target).append(_ride_event('ride.deleted', target))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    for event_type, data, audience in session.info.pop('feed_events', None) or ():
+        change_feed.publish(event_type, data, audience)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_events(session):
+    session.info.pop('feed_events', None)
+
+
+event.listen(Ride, 'after_insert', _record_insert)
+event.listen(Ride, 'after_update', _record_update)
+event.listen(Ride, 'after_delete', _record_delete)
+
+
+change_feed = ChangeFeed()
+register_stats('changeFeed', change_feed.stats)
@@ -0,0 +1,176 @@
+"""Cached and estimated row counts for paginated listings.
+
+Exact counts are cached per process for COUNT_CACHE_TTL seconds. The key
+is the endpoint plus the count query's SQL and parameters, so two requests
+share an entry only if they filter (and scope) the same way. Every entry
+remembers the write generation of the tables it read. Committing an ORM
+write to any of those tables (session flushes and query.update/delete)
+bumps the table's generation, which invalidates the entry at once in this
+process. Other processes see the change when the TTL runs out.
+
+estimate() avoids a full COUNT. It counts at most COUNT_ESTIMATE_CAP + 1
+rows, which is exact for small results. Beyond the cap it uses the
+optimizer's row estimate on MySQL; on SQLite it reports the cap + 1 as a
+lower bound.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import has_request_context, request
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+from src.models.ems_models import db
+from src.services.diagnostics import register_stats
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL_SECONDS = 10
+DEFAULT_ESTIMATE_CAP = 1000
+
+
+class CountCache:
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL_SECONDS, estimate_cap=DEFAULT_ESTIMATE_CAP):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.estimate_cap = estimate_cap
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get('COUNT_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('COUNT_CACHE_TTL', self.ttl)
+        self.estimate_cap = app.config.get('COUNT_ESTIMATE_CAP', self.estimate_cap)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def count(self, query):
+        """query.count(), served from the cache while its tables are unchanged"""
+        if not self.enabled:
+            return query.count()
+        key, tables = _cache_key(query)
+        cached = self.cached(key, tables)
+        if cached is not None:
+            return cached
+        with self._lock:
+            generations = self._generations_of(tables)
+        total = query.count()
+        with self._lock:
+            # Stored with the generations seen before counting, so a write
+            # committed meanwhile makes this entry stale rather than wrong
+            self._entries[key] = (time.monotonic() + self.ttl, generations, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return total
+
+    def cached(self, key, tables):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, generations, total = entry
+                if expires_at > time.monotonic() and generations == self._generations_of(tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return total
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def estimate(self, query, id_column):
+        """An approximate count of query; exact up to estimate_cap rows"""
+        if self.enabled:
+            key, tables = _cache_key(query)
+            with self._lock:
+                entry = self._entries.get(key)
+                fresh = entry is not None and entry[0] > time.monotonic() \
+                    and entry[1] == self._generations_of(tables)
+            if fresh:
+                return entry[2]
+        capped = query.with_entities(id_column).order_by(None).limit(self.estimate_cap + 1).subquery()
+        total = db.session.query(func.count()).select_from(capped).scalar()
+        if total <= self.estimate_cap or db.engine.dialect.name != 'mysql':
+            return total
+        return max(total, _mysql_row_estimate(query))
+
+    def invalidate(self, tables):
+        """Mark every cached count over these tables as stale"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+    def _generations_of(self, tables):
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+
+def _cache_key(query):
+    statement = query.statement
+    compiled = statement.compile(db.engine)
+    tables = tuple(sorted({table.name for table in find_tables(statement, include_joins=True)
+                           if hasattr(table, 'name')}))
+    params = tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+    return (request.endpoint if has_request_context() else None, str(compiled), params), tables
+
+
+def _mysql_row_estimate(query):
+    compiled = query.statement.compile(db.engine, compile_kwargs={'render_postcompile': True})
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN {compiled}', compiled.params).mappings().all()
+    if not rows:
+        return 0
+    first = rows[0]
+    return int((first['rows'] or 0) * float(first.get('filtered') or 100) / 100)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    changed = session.info.setdefault('count_cache_tables', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        mapper = getattr(instance, '__mapper__', None)
+        if mapper is not None:
+            changed.update(table.name for table in mapper.tables)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _record_bulk_tables(context):
+    context.session.info.setdefault('count_cache_tables', set()).update(
+        table.name for table in context.mapper.tables)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    changed = session.info.pop('count_cache_tables', None)
+    if changed:
+        count_cache.invalidate(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('count_cache_tables', None)
+
+
+count_cache = CountCache()
+register_stats('counts', count_cache.stats)
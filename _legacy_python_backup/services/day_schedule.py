@@ -0,0 +1,213 @@
+"""Day schedules in the configured local timezone.
+
+Appointment times are stored as naive UTC. A local calendar day
+(SCHEDULE_TIMEZONE, default Asia/Bangkok) is therefore the half-open UTC
+range [local midnight, next local midnight). That range is queried with
+plain comparisons on appointment_time, so ix_rides_status_appointment and
+ix_rides_appointment can serve it. DATE(appointment_time) cannot use
+either, and it would also cut days at UTC midnight.
+
+DaySchedule keeps today's and tomorrow's schedules in memory. A schedule
+is every ride in SCHEDULE_STATUSES, in appointment order, already encoded
+as JSON. Ride mapper events record which rides a commit touched (the
+changes are dropped on rollback, like the schedule index). The next read
+reloads just those rides in one query and moves, replaces or removes
+them. The window is rebuilt at local midnight and every DAY_SCHEDULE_TTL
+seconds, which picks up other processes' writes and edits to joined rows
+(patient or driver names). Other days are read from the database with a
+single range query.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, time as day_time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from src.models.ems_models import Ride
+from src.services.loading_plans import RIDE_DETAIL_STREAMED
+from src.services.serializers import serializer_for, dumps
+from src.services.diagnostics import register_stats
+
+SCHEDULE_STATUSES = ('ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS', 'COMPLETED')
+DEFAULT_TIMEZONE = 'Asia/Bangkok'
+DEFAULT_TTL_SECONDS = 60
+CACHED_DAYS = 2  # today and tomorrow
+# Past this many changed rides, rebuilding the window beats a long IN list
+MAX_REFRESH_RIDES = 500
+
+
+def local_day_range(day, tz):
+    """[start, end) of a local calendar day as naive UTC datetimes"""
+    start = datetime.combine(day, day_time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), day_time.min, tzinfo=tz)
+    return (start.astimezone(timezone.utc).replace(tzinfo=None),
+            end.astimezone(timezone.utc).replace(tzinfo=None))
+
+
+def local_date(moment, tz):
+    """The local calendar day of a naive UTC datetime"""
+    return moment.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+
+def schedule_query(start, end):
+    """Schedule rides with start <= appointment_time < end, in appointment order"""
+    return Ride.query.options(*RIDE_DETAIL_STREAMED).filter(
+        Ride.appointment_time >= start,
+        Ride.appointment_time < end,
+        Ride.status.in_(SCHEDULE_STATUSES),
+    ).order_by(Ride.appointment_time.asc(), Ride.id.asc())
+
+
+def schedule_json(meta, schedule):
+    """meta plus a "schedule" list of {date, rides} built from encoded rides, as JSON bytes"""
+    days = b','.join(
+        b'{"date":' + dumps(day.isoformat()) + b',"rides":[' + b','.join(rides) + b']}'
+        for day, rides in schedule.items()
+    )
+    return dumps(meta)[:-1] + (b',' if meta else b'') + b'"schedule":[' + days + b']}'
+
+
+class DaySchedule:
+    def __init__(self, tz_name=DEFAULT_TIMEZONE, ttl=DEFAULT_TTL_SECONDS):
+        self.tz = ZoneInfo(tz_name)
+        self.ttl = ttl
+        self._days = {}      # local date -> sorted [(appointment_time, ride id, encoded ride)]
+        self._where = {}     # ride id -> (local date, appointment_time)
+        self._dirty = set()  # ride ids committed since the last read
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.refreshed_rides = 0
+
+    def init_app(self, app):
+        self.tz = ZoneInfo(app.config.get('SCHEDULE_TIMEZONE', DEFAULT_TIMEZONE))
+        self.ttl = app.config.get('DAY_SCHEDULE_TTL', self.ttl)
+        self.invalidate()
+
+    def today(self, now=None):
+        return local_date(now or datetime.utcnow(), self.tz)
+
+    def day_range(self, day):
+        return local_day_range(day, self.tz)
+
+    def rides(self, first_day, days=1):
+        """{local date: [encoded ride, ...]} for days consecutive days from first_day"""
+        wanted = [first_day + timedelta(days=offset) for offset in range(days)]
+        with self._lock:
+            self._ensure_current()
+            result = {day: [entry[2] for entry in self._days[day]] for day in wanted if day in self._days}
+        missing = [day for day in wanted if day not in result]
+        if missing:
+            uncached = set(missing)
+            # One range query for the days outside the window; rows on cached days are skipped
+            encode = self._encoder()
+            start, _ = self.day_range(missing[0])
+            _, end = self.day_range(missing[-1])
+            for day in missing:
+                result[day] = []
+            for ride in schedule_query(start, end).yield_per(500):
+                day = local_date(ride.appointment_time, self.tz)
+                if day in uncached:
+                    result[day].append(encode(ride))
+        return {day: result[day] for day in wanted}
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def mark_dirty(self, ride_ids):
+        with self._lock:
+            # Nothing cached yet means nothing to refresh; and past
+            # MAX_REFRESH_RIDES the next read rebuilds the window instead
+            if self._loaded_at is None:
+                return
+            self._dirty.update(ride_ids)
+            if len(self._dirty) > MAX_REFRESH_RIDES:
+                self._loaded_at = None
+                self._dirty = set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'timezone': str(self.tz),
+                'days': {day.isoformat(): len(entries) for day, entries in self._days.items()},
+                'pendingRefresh': len(self._dirty),
+                'loads': self.loads,
+                'refreshedRides': self.refreshed_rides,
+                'ageSeconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            }
+
+    def _encoder(self):
+        serialize_ride = serializer_for(Ride)
+        return lambda ride: dumps(serialize_ride(ride))
+
+    def _ensure_current(self):
+        today = self.today()
+        if (self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+                or min(self._days, default=None) != today):
+            self._load(today)
+        elif self._dirty:
+            self._refresh()
+
+    def _load(self, today):
+        encode = self._encoder()
+        days = {today + timedelta(days=offset): [] for offset in range(CACHED_DAYS)}
+        where = {}
+        start, _ = self.day_range(today)
+        _, end = self.day_range(today + timedelta(days=CACHED_DAYS - 1))
+        for ride in schedule_query(start, end):
+            day = local_date(ride.appointment_time, self.tz)
+            days[day].append((ride.appointment_time, ride.id, encode(ride)))
+            where[ride.id] = (day, ride.appointment_time)
+        self._days, self._where = days, where
+        self._dirty = set()
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+
+    def _refresh(self):
+        ride_ids, self._dirty = self._dirty, set()
+        for ride_id in ride_ids:
+            self._remove(ride_id)
+        start, _ = self.day_range(min(self._days))
+        _, end = self.day_range(max(self._days))
+        encode = self._encoder()
+        for ride in schedule_query(start, end).filter(Ride.id.in_(ride_ids)):
+            day = local_date(ride.appointment_time, self.tz)
+            insort(self._days[day], (ride.appointment_time, ride.id, encode(ride)))
+            self._where[ride.id] = (day, ride.appointment_time)
+        self.refreshed_rides += len(ride_ids)
+
+    def _remove(self, ride_id):
+        slot = self._where.pop(ride_id, None)
+        if slot is None:
+            return
+        entries = self._days.get(slot[0], [])
+        index = bisect_left(entries, (slot[1], ride_id))
+        if index < len(entries) and entries[index][1] == ride_id:
+            del entries[index]
+
+
+def _record_change(mapper, connection, target):
+    object_session(target).info.setdefault('day_schedule_changes', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('day_schedule_changes', None)
+    if changes:
+        day_schedule.mark_dirty(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('day_schedule_changes', None)
+
+
+event.listen(Ride, 'after_insert', _record_change)
+event.listen(Ride, 'after_update', _record_change)
+event.listen(Ride, 'after_delete', _record_change)
+
+
+day_schedule = DaySchedule()
+register_stats('daySchedule', day_schedule.stats)
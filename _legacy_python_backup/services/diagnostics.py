@@ -0,0 +1,34 @@
+"""Registry of in-process service statistics.
+
+Each service registers a callable returning its stats() dict under a
+name, next to where it creates its singleton. GET /api/diagnostics/stats
+collects them all, so the routes do not need to know which services
+exist.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_sources = {}
+_lock = threading.Lock()
+
+
+def register_stats(name, source):
+    """Report source() under name in the diagnostics stats; a later registration replaces it"""
+    with _lock:
+        _sources[name] = source
+
+
+def collect_stats():
+    """{name: stats} for every registered source; a failing source reports its error"""
+    with _lock:
+        sources = list(_sources.items())
+    stats = {}
+    for name, source in sources:
+        try:
+            stats[name] = source()
+        except Exception as e:
+            logger.exception('Stats source %s failed', name)
+            stats[name] = {'error': str(e)}
+    return stats
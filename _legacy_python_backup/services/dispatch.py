@@ -0,0 +1,288 @@
+"""Batch auto-dispatch of pending rides.
+
+plan() proposes drivers for a set of pending rides. The goal is to
+minimise total pickup distance: the haversine distance from the driver's
+current position to the patient's coordinates. Two constraints apply. A
+driver never gets two rides within the schedule buffer of each other (the
+1-hour conflict rule), including rides they already have. Only active
+drivers are used.
+
+Rides are taken in appointment order, in groups that start at a ride and
+span one buffer. Within a group every pair of rides conflicts, so each
+driver takes at most one ride from it. That makes each group a bipartite
+assignment problem:
+
+- greedy: repeatedly take the shortest remaining (ride, driver) pair.
+- optimal: exact minimum-cost matching (Hungarian algorithm). It first
+  assigns as many rides as possible, then minimises the distance.
+
+After a group, each assigned driver's position moves to that pickup.
+Later groups also respect rides handed out in earlier groups.
+
+A driver with no fresh GPS position, or a ride whose patient has no
+coordinates, costs UNLOCATED_COST_KM. Such pairs are still assignable,
+but any located alternative is preferred.
+
+check_assignments() validates a proposal, or any list of ride/driver pairs
+(the bulk assign endpoint), with a fixed number of queries. commit()
+applies it in one transaction.
+"""
+import time
+from bisect import bisect_right, insort
+from collections import namedtuple
+from src.models.ems_models import db, Ride, User, Patient
+from src.services.geo_index import haversine_km, MAX_RADIUS_KM
+from src.services.driver_positions import position_store
+from src.services.driver_schedule import driver_schedule, ACTIVE_STATUSES
+
+MODES = ('greedy', 'optimal')
+UNLOCATED_COST_KM = MAX_RADIUS_KM
+# Matrix costs: leaving a ride unassigned beats any real pair, an infeasible pair never wins
+UNASSIGNED_COST = 1e6
+INFEASIBLE_COST = 1e12
+
+DispatchRide = namedtuple('DispatchRide', 'id appointment_time lat lng')
+Assignment = namedtuple('Assignment', 'ride_id driver_id distance_km')
+
+
+def conflict_groups(rides, buffer):
+    """Rides (sorted by time) split into runs that each span less than one buffer"""
+    groups = []
+    for ride in rides:
+        if groups and ride.appointment_time - groups[-1][0].appointment_time < buffer:
+            groups[-1].append(ride)
+        else:
+            groups.append([ride])
+    return groups
+
+
+def pickup_cost(origin, ride):
+    if origin is None or ride.lat is None or ride.lng is None:
+        return UNLOCATED_COST_KM
+    return haversine_km(origin[0], origin[1], ride.lat, ride.lng)
+
+
+def hungarian(costs):
+    """Column index for each row of a rectangular cost matrix (rows <= columns), minimising the total"""
+    n = len(costs)
+    m = len(costs[0]) if n else 0
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [float('inf')] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = costs[i0 - 1]
+            ui0 = u[i0]
+            delta = float('inf')
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def _match_greedy(costs):
+    pairs = sorted(
+        (cost, r, d) for r, row in enumerate(costs) for d, cost in enumerate(row) if cost < INFEASIBLE_COST
+    )
+    taken_rides, taken_drivers, matched = set(), set(), {}
+    for cost, r, d in pairs:
+        if r not in taken_rides and d not in taken_drivers:
+            taken_rides.add(r)
+            taken_drivers.add(d)
+            matched[r] = d
+    return matched
+
+
+def _match_optimal(costs, driver_count):
+    # One dummy column per ride lets rides stay unassigned when drivers run out
+    padded = [
+        row + [UNASSIGNED_COST if k == r else INFEASIBLE_COST for k in range(len(costs))]
+        for r, row in enumerate(costs)
+    ]
+    return {r: d for r, d in enumerate(hungarian(padded)) if d is not None and d < driver_count
+            and costs[r][d] < INFEASIBLE_COST}
+
+
+def plan(rides, driver_ids, origins, buffer, mode='optimal', busy=None):
+    """Propose drivers for rides; returns (assignments, unassigned ride ids).
+
+    rides are DispatchRides, origins maps driver id -> (lat, lng) and
+    busy(driver_id, at) reports existing commitments.
+    """
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {", ".join(MODES)}')
+    busy = busy or (lambda driver_id, at: False)
+    origins = dict(origins)
+    proposed = {driver_id: [] for driver_id in driver_ids}  # sorted appointment times
+    assignments, unassigned = [], []
+
+    def feasible(driver_id, at):
+        times = proposed[driver_id]
+        index = bisect_right(times, at - buffer)
+        if index < len(times) and times[index] < at + buffer:
+            return False
+        return not busy(driver_id, at)
+
+    for group in conflict_groups(sorted(rides, key=lambda ride: ride.appointment_time), buffer):
+        costs = [
+            [pickup_cost(origins.get(driver_id), ride) if feasible(driver_id, ride.appointment_time)
+             else INFEASIBLE_COST for driver_id in driver_ids]
+            for ride in group
+        ]
+        matched = _match_greedy(costs) if mode == 'greedy' else _match_optimal(costs, len(driver_ids))
+        for r, ride in enumerate(group):
+            if r not in matched:
+                unassigned.append(ride.id)
+                continue
+            driver_id = driver_ids[matched[r]]
+            assignments.append(Assignment(ride.id, driver_id, round(costs[r][matched[r]], 3)))
+            insort(proposed[driver_id], ride.appointment_time)
+            if ride.lat is not None and ride.lng is not None:
+                origins[driver_id] = (ride.lat, ride.lng)
+    return assignments, unassigned
+
+
+def propose(start, end, mode='optimal'):
+    """Plan every PENDING ride with start <= appointment_time < end against all active drivers"""
+    began = time.perf_counter()
+    rows = db.session.query(Ride.id, Ride.appointment_time, Patient.latitude, Patient.longitude)\
+        .join(Patient, Ride.patient_id == Patient.id)\
+        .filter(Ride.status == 'PENDING', Ride.appointment_time >= start, Ride.appointment_time < end)\
+        .order_by(Ride.appointment_time)\
+        .all()
+    rides = [
+        DispatchRide(ride_id, at, float(lat) if lat is not None else None, float(lng) if lng is not None else None)
+        for ride_id, at, lat, lng in rows
+    ]
+    driver_ids = [driver_id for (driver_id,) in db.session.query(User.id)
+                  .filter(User.role == 'driver', User.status == 'Active').order_by(User.id)]
+
+    origins = {}
+    for driver_id in driver_ids:
+        live = position_store.live(driver_id)
+        if live['currentLocation'] and not live['locationStale']:
+            origins[driver_id] = (live['currentLocation']['lat'], live['currentLocation']['lng'])
+
+    assignments, unassigned = plan(
+        rides, driver_ids, origins, driver_schedule.buffer, mode,
+        busy=lambda driver_id, at: bool(driver_schedule.conflicts(driver_id, at)),
+    )
+    times = {ride.id: ride.appointment_time for ride in rides}
+    return {
+        'mode': mode,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'assignments': [
+            {'rideId': a.ride_id, 'driverId': a.driver_id, 'appointmentTime': times[a.ride_id].isoformat(),
+             'pickupDistanceKm': a.distance_km if a.distance_km < UNLOCATED_COST_KM else None}
+            for a in assignments
+        ],
+        'unassigned': unassigned,
+        'totalPickupDistanceKm': round(sum(a.distance_km for a in assignments if a.distance_km < UNLOCATED_COST_KM), 3),
+        'driversConsidered': len(driver_ids),
+        'driversLocated': len(origins),
+        'elapsedMs': round((time.perf_counter() - began) * 1000, 1),
+    }
+
+
+def check_assignments(pairs):
+    """Validate (ride_id, driver_id) pairs together; returns (rides by id, error per pair or None).
+
+    Runs three queries whatever the number of pairs: the rides and the
+    drivers (both locked FOR UPDATE until the caller commits or rolls back,
+    drivers in id order), and one range query for those drivers' active
+    rides around the requested times.
+    The conflict checks then run in memory. Pairs are checked in order,
+    each against the existing rides and the pairs accepted before it.
+    """
+    ride_ids = {ride_id for ride_id, _ in pairs}
+    driver_ids = {driver_id for _, driver_id in pairs}
+    rides = {ride.id: ride for ride in Ride.query.filter(Ride.id.in_(ride_ids)).with_for_update()} if ride_ids else {}
+    drivers = {driver_id for (driver_id,) in db.session.query(User.id).filter(
+        User.id.in_(driver_ids), User.role == 'driver', User.status == 'Active'
+    ).order_by(User.id).with_for_update()} if driver_ids else set()
+
+    buffer = driver_schedule.buffer
+    times = [ride.appointment_time for ride in rides.values()]
+    booked = {}
+    if times and drivers:
+        for ride_id, driver_id, at in db.session.query(Ride.id, Ride.driver_id, Ride.appointment_time).filter(
+                Ride.driver_id.in_(drivers), Ride.status.in_(ACTIVE_STATUSES),
+                Ride.appointment_time > min(times) - buffer, Ride.appointment_time < max(times) + buffer):
+            insort(booked.setdefault(driver_id, []), (at, ride_id))
+
+    errors = []
+    seen = set()
+    for ride_id, driver_id in pairs:
+        ride = rides.get(ride_id)
+        error = None
+        if ride_id in seen:
+            error = 'Ride appears more than once'
+        elif ride is None:
+            error = 'Ride not found'
+        elif ride.status != 'PENDING':
+            error = 'Ride not pending'
+        elif driver_id not in drivers:
+            error = 'Driver not found or not available'
+        else:
+            timeline = booked.setdefault(driver_id, [])
+            index = bisect_right(timeline, (ride.appointment_time - buffer, '\uffff'))
+            if index < len(timeline) and timeline[index][0] < ride.appointment_time + buffer:
+                error = 'Driver has conflicting ride at similar time'
+            else:
+                insort(timeline, (ride.appointment_time, ride_id))
+        seen.add(ride_id)
+        errors.append(error)
+    return rides, errors
+
+
+def commit(pairs, all_or_nothing=True):
+    """Assign the pairs in one transaction; returns the error for each pair (None where it was assigned).
+
+    With all_or_nothing, any error rolls everything back; otherwise the
+    valid pairs are still assigned.
+    """
+    rides, errors = check_assignments(pairs)
+    if all_or_nothing and any(errors):
+        db.session.rollback()
+        return errors
+    for (ride_id, driver_id), error in zip(pairs, errors):
+        if error is None:
+            ride = rides[ride_id]
+            ride.driver_id = driver_id
+            ride.status = 'ASSIGNED'
+    db.session.commit()
+    return errors
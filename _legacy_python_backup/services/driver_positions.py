@@ -0,0 +1,155 @@
+"""Live driver positions from GPS pings.
+
+Drivers POST pings to /api/driver/location. Each ping updates an
+in-memory latest-position store (one entry per driver, guarded against
+out-of-order pings) and is queued for the driver_locations history table.
+A LocationHistoryWriter thread writes the queue in batched INSERTs, so
+ingesting a ping costs no database round trip. The office live-status
+endpoint reads positions from memory and marks a position stale once it is
+older than LOCATION_STALE_SECONDS.
+
+The store is per process. Run the API as a single process (threads), or
+route each driver to the same worker, so every poll sees every driver.
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from src.models.ems_models import DriverLocation
+from src.services.batch_writer import BatchWriter
+from src.services.diagnostics import register_stats
+
+DEFAULT_STALE_SECONDS = 120
+# Device clocks ahead of ours by more than this are ignored in favour of receive time
+MAX_CLOCK_SKEW = timedelta(seconds=60)
+MAX_PINGS_PER_REQUEST = 100
+
+Position = namedtuple('Position', 'lat lng recorded_at received_at accuracy speed heading')
+
+
+class PositionStore:
+    def __init__(self, stale_seconds=DEFAULT_STALE_SECONDS):
+        self.stale_seconds = stale_seconds
+        self._positions = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.out_of_order = 0
+
+    def init_app(self, app):
+        self.stale_seconds = app.config.get('LOCATION_STALE_SECONDS', self.stale_seconds)
+
+    def update(self, driver_id, position):
+        """Keep position if it is the driver's newest fix; returns whether it was kept"""
+        with self._lock:
+            current = self._positions.get(driver_id)
+            if current is not None and current.recorded_at > position.recorded_at:
+                self.out_of_order += 1
+                return False
+            self._positions[driver_id] = position
+            self.updates += 1
+            return True
+
+    def get(self, driver_id):
+        return self._positions.get(driver_id)
+
+    def live(self, driver_id, now=None):
+        """API fields for a driver's last known position (currentLocation is None if unknown)"""
+        position = self._positions.get(driver_id)
+        if position is None:
+            return {'currentLocation': None, 'locationUpdatedAt': None, 'locationAgeSeconds': None,
+                    'locationStale': True}
+        age = ((now or datetime.utcnow()) - position.recorded_at).total_seconds()
+        return {
+            'currentLocation': {'lat': position.lat, 'lng': position.lng},
+            'locationUpdatedAt': position.recorded_at.isoformat(),
+            'locationAgeSeconds': round(max(age, 0.0), 1),
+            'locationStale': age > self.stale_seconds,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'drivers': len(self._positions),
+                'updates': self.updates,
+                'outOfOrder': self.out_of_order,
+                'staleSeconds': self.stale_seconds,
+            }
+
+
+def insert_locations(connection, batch):
+    connection.execute(DriverLocation.__table__.insert(), batch)
+
+
+class LocationHistoryWriter(BatchWriter):
+    def init_app(self, app):
+        if not app.config.get('LOCATION_HISTORY_ENABLED', True):
+            return
+        self.configure(
+            app,
+            queue_size=app.config.get('LOCATION_QUEUE_SIZE', self._queue.maxsize),
+            batch_size=app.config.get('LOCATION_BATCH_SIZE', self.batch_size),
+            flush_interval=app.config.get('LOCATION_FLUSH_INTERVAL', self.flush_interval),
+            overflow='drop',
+            block_timeout=0,
+        )
+
+
+def _optional_float(data, key):
+    value = data.get(key)
+    return float(value) if value is not None else None
+
+
+def parse_ping(data, received_at):
+    """A Position from one ping's JSON; raises ValueError if it is malformed"""
+    if not isinstance(data, dict):
+        raise ValueError('Each ping must be an object')
+    try:
+        lat = float(data['lat'])
+        lng = float(data['lng'])
+        accuracy = _optional_float(data, 'accuracy')
+        speed = _optional_float(data, 'speed')
+        heading = _optional_float(data, 'heading')
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('lat and lng are required and readings must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('lat/lng out of range')
+
+    recorded_at = received_at
+    if data.get('timestamp'):
+        try:
+            moment = datetime.fromisoformat(str(data['timestamp']).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('timestamp must be ISO 8601')
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        if moment <= received_at + MAX_CLOCK_SKEW:
+            recorded_at = moment
+    return Position(round(lat, 6), round(lng, 6), recorded_at, received_at, accuracy, speed, heading)
+
+
+def record_pings(driver_id, pings):
+    """Validate, store and queue a driver's pings; returns how many were accepted"""
+    received_at = datetime.utcnow()
+    positions = [parse_ping(ping, received_at) for ping in pings]
+    for position in sorted(positions, key=lambda p: p.recorded_at):
+        position_store.update(driver_id, position)
+        location_history.enqueue({
+            'driver_id': driver_id,
+            'latitude': position.lat,
+            'longitude': position.lng,
+            'accuracy_m': position.accuracy,
+            'speed_kmh': position.speed,
+            'heading': position.heading,
+            'recorded_at': position.recorded_at,
+            'received_at': position.received_at,
+        })
+    return len(positions)
+
+
+position_store = PositionStore()
+location_history = LocationHistoryWriter(insert_locations, name='location-writer', queue_size=50000,
+                                         batch_size=1000)
+register_stats('locations', lambda: dict(position_store.stats(), history=location_history.stats()))
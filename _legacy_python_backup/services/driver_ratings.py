@@ -0,0 +1,88 @@
+"""Maintained per-driver rating aggregates.
+
+DriverProfile keeps the number and sum of ratings received, the average
+derived from them and a count per review tag. submit_rating updates them
+in its own transaction, touching only the driver's profile row, so nothing
+ever averages over a driver's rides on read. backfill_driver_ratings()
+rebuilds them from the rides table (backfill_driver_ratings.py).
+"""
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import func
+from src.models.ems_models import db, DriverProfile, Ride
+
+DEFAULT_SCORE = Decimal('5.00')
+# The tags offered by the rating form (RideRatingModal)
+REVIEW_TAGS = ('สุภาพ', 'ตรงต่อเวลา', 'ขับรถดี', 'ช่วยเหลือดี', 'รถสะอาด')
+
+
+def average_score(rating_sum, rating_count):
+    if not rating_count:
+        return DEFAULT_SCORE
+    return (Decimal(rating_sum) / rating_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def record_rating(driver_id, rating, tags=None):
+    """Add one rating to the driver's aggregates; runs in the caller's transaction"""
+    # Row lock: concurrent ratings for the same driver apply one after another
+    profile = DriverProfile.query.filter_by(user_id=driver_id).with_for_update().first()
+    if profile is None:
+        return
+    profile.rating_count = (profile.rating_count or 0) + 1
+    profile.rating_sum = (profile.rating_sum or 0) + rating
+    profile.avg_review_score = average_score(profile.rating_sum, profile.rating_count)
+    if tags:
+        tag_counts = dict(profile.get_review_tag_counts())
+        for tag in tags:
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        profile.review_tag_counts = tag_counts
+
+
+def rating_summary(profile):
+    """API fields for a driver's rating aggregates"""
+    return {
+        'avgReviewScore': float(profile.avg_review_score),
+        'ratingCount': profile.rating_count or 0,
+        'reviewTagCounts': profile.get_review_tag_counts(),
+    }
+
+
+def backfill_driver_ratings(batch_size=500):
+    """Rebuild every driver's rating aggregates from rated rides, one batch of profiles per transaction.
+
+    Returns the number of profiles rebuilt.
+    """
+    rebuilt = 0
+    last_user_id = None
+    while True:
+        query = DriverProfile.query.order_by(DriverProfile.user_id)
+        if last_user_id is not None:
+            query = query.filter(DriverProfile.user_id > last_user_id)
+        profiles = query.limit(batch_size).with_for_update().all()
+        if not profiles:
+            break
+
+        user_ids = [profile.user_id for profile in profiles]
+        rated = (Ride.driver_id.in_(user_ids), Ride.rating.isnot(None))
+        totals = {
+            driver_id: (count, total)
+            for driver_id, count, total in db.session.query(
+                Ride.driver_id, func.count(Ride.id), func.sum(Ride.rating)
+            ).filter(*rated).group_by(Ride.driver_id)
+        }
+        tag_counts = {user_id: Counter() for user_id in user_ids}
+        for driver_id, tags in db.session.query(Ride.driver_id, Ride.review_tags)\
+                .filter(*rated, Ride.review_tags.isnot(None)):
+            tag_counts[driver_id].update(tags or [])
+
+        for profile in profiles:
+            count, total = totals.get(profile.user_id, (0, 0))
+            profile.rating_count = count
+            profile.rating_sum = int(total or 0)
+            profile.avg_review_score = average_score(profile.rating_sum, count)
+            profile.review_tag_counts = dict(tag_counts[profile.user_id]) or None
+        db.session.commit()
+
+        rebuilt += len(profiles)
+        last_user_id = user_ids[-1]
+    return rebuilt
@@ -0,0 +1,197 @@
+"""Per-driver schedule timelines for assignment conflict checks.
+
+A driver is busy within SCHEDULE_BUFFER_MINUTES of the appointment time of
+each of their active rides (ASSIGNED up to IN_PROGRESS). The index keeps,
+per driver, the sorted appointment times of those rides. "Is driver X
+free at t?" is then one bisect for the first appointment after
+t - buffer, checking that it is not before t + buffer. That is O(log n),
+and "which of these drivers are free at t?" is one bisect per driver.
+
+The index is built lazily from one query on the first lookup. It is
+rebuilt every SCHEDULE_INDEX_TTL seconds to pick up other processes'
+changes. Between rebuilds, Ride mapper events record assignments,
+completions, cancellations, reschedules and deletes. Those changes are
+applied when the session commits, so rolled-back changes never reach the
+index. The assignment paths lock the driver's user row FOR UPDATE and
+then confirm "free" with an indexed range query on
+ix_rides_driver_status_appointment, so two processes assigning the same
+driver take turns and the second sees the first's committed ride.
+"""
+import threading
+import time
+from bisect import bisect_right, insort
+from datetime import timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from src.models.ems_models import db, Ride, User
+from src.services.diagnostics import register_stats
+
+ACTIVE_STATUSES = ('ASSIGNED', 'EN_ROUTE_TO_PICKUP', 'ARRIVED_AT_PICKUP', 'IN_PROGRESS')
+DEFAULT_BUFFER_MINUTES = 60
+DEFAULT_TTL_SECONDS = 60
+
+
+def find_conflict(driver_id, at, buffer, exclude_ride_id=None):
+    """Id of a driver's active ride within buffer of at, from the database (indexed range)"""
+    query = db.session.query(Ride.id).filter(
+        Ride.driver_id == driver_id,
+        Ride.status.in_(ACTIVE_STATUSES),
+        Ride.appointment_time > at - buffer,
+        Ride.appointment_time < at + buffer,
+    )
+    if exclude_ride_id is not None:
+        query = query.filter(Ride.id != exclude_ride_id)
+    return query.limit(1).scalar()
+
+
+def lock_driver(driver_id):
+    """The active driver's User row, locked FOR UPDATE until commit or rollback; None if not found"""
+    return User.query.filter_by(id=driver_id, role='driver', status='Active').with_for_update().first()
+
+
+class DriverSchedule:
+    def __init__(self, buffer_minutes=DEFAULT_BUFFER_MINUTES, ttl=DEFAULT_TTL_SECONDS):
+        self.buffer = timedelta(minutes=buffer_minutes)
+        self.ttl = ttl
+        self._timelines = {}  # driver id -> sorted [(appointment_time, ride id)]
+        self._slots = {}      # ride id -> (driver id, appointment_time)
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self.loads = 0
+
+    def init_app(self, app):
+        self.buffer = timedelta(minutes=app.config.get('SCHEDULE_BUFFER_MINUTES', DEFAULT_BUFFER_MINUTES))
+        self.ttl = app.config.get('SCHEDULE_INDEX_TTL', self.ttl)
+
+    def conflicts(self, driver_id, at, exclude_ride_id=None):
+        """Ride ids of the driver's active rides within the buffer of at"""
+        self._ensure_loaded()
+        with self._lock:
+            timeline = self._timelines.get(driver_id, ())
+            # First appointment strictly after at - buffer ('\uffff' sorts after any ride id)
+            index = bisect_right(timeline, (at - self.buffer, '\uffff'))
+            found = []
+            while index < len(timeline) and timeline[index][0] < at + self.buffer:
+                if timeline[index][1] != exclude_ride_id:
+                    found.append(timeline[index][1])
+                index += 1
+            return found
+
+    def is_free(self, driver_id, at, exclude_ride_id=None, confirm=False):
+        """Whether the driver has no active ride within the buffer of at.
+
+        confirm=True double-checks a "free" answer against the database;
+        use it before writing an assignment, after locking the driver's
+        user row (lock_driver) so a concurrent assignment cannot slip in
+        between the check and the commit.
+        """
+        if self.conflicts(driver_id, at, exclude_ride_id):
+            return False
+        if confirm:
+            return find_conflict(driver_id, at, self.buffer, exclude_ride_id) is None
+        return True
+
+    def free_drivers(self, driver_ids, at):
+        """The subset of driver_ids free at at, in the given order"""
+        return [driver_id for driver_id in driver_ids if not self.conflicts(driver_id, at)]
+
+    def reserve(self, driver_id, at, ride_id):
+        with self._lock:
+            self._release(ride_id)
+            insort(self._timelines.setdefault(driver_id, []), (at, ride_id))
+            self._slots[ride_id] = (driver_id, at)
+
+    def release(self, ride_id):
+        with self._lock:
+            self._release(ride_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'drivers': len(self._timelines),
+                'activeRides': len(self._slots),
+                'loads': self.loads,
+                'ageSeconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            }
+
+    def _release(self, ride_id):
+        slot = self._slots.pop(ride_id, None)
+        if slot is None:
+            return
+        driver_id, at = slot
+        timeline = self._timelines.get(driver_id)
+        if timeline:
+            try:
+                timeline.remove((at, ride_id))
+            except ValueError:
+                pass
+            if not timeline:
+                del self._timelines[driver_id]
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            rows = db.session.query(Ride.id, Ride.driver_id, Ride.appointment_time).filter(
+                Ride.status.in_(ACTIVE_STATUSES), Ride.driver_id.isnot(None)
+            ).all()
+            timelines = {}
+            slots = {}
+            for ride_id, driver_id, at in rows:
+                timelines.setdefault(driver_id, []).append((at, ride_id))
+                slots[ride_id] = (driver_id, at)
+            for timeline in timelines.values():
+                timeline.sort()
+            self._timelines, self._slots = timelines, slots
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+
+def _pending(target):
+    return object_session(target).info.setdefault('schedule_changes', {})
+
+
+def _record_insert(mapper, connection, target):
+    active = target.driver_id is not None and target.status in ACTIVE_STATUSES
+    _pending(target)[target.id] = (target.driver_id, target.appointment_time) if active else None
+
+
+def _record_update(mapper, connection, target):
+    if any(get_history(target, name).has_changes() for name in ('driver_id', 'status', 'appointment_time')):
+        _record_insert(mapper, connection, target)
+
+
+def _record_delete(mapper, connection, target):
+    _pending(target)[target.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('schedule_changes', None)
+    for ride_id, slot in (changes or {}).items():
+        if slot is None:
+            driver_schedule.release(ride_id)
+        else:
+            driver_schedule.reserve(slot[0], slot[1], ride_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('schedule_changes', None)
+
+
+event.listen(Ride, 'after_insert', _record_insert)
+event.listen(Ride, 'after_update', _record_update)
+event.listen(Ride, 'after_delete', _record_delete)
+
+
+driver_schedule = DriverSchedule()
+register_stats('schedule', driver_schedule.stats)
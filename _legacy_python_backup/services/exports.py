@@ -0,0 +1,437 @@
+"""Streaming CSV/XLSX exports of rides, patients and driver statistics.
+
+Each dataset is a plain column query over a half-open local-day range.
+- rides: by appointment time.
+- patients: by registration date.
+- driver-stats: one row per driver, counting rides by appointment time.
+
+Rows are read with yield_per from a server-side cursor, where the driver
+has one. They are written CHUNK_ROWS at a time, so memory stays bounded
+by one chunk whatever the range. CSV starts with a UTF-8 BOM so Excel
+reads Thai text correctly. XLSX is written with the stdlib: a zip stream
+of minimal SpreadsheetML parts with inline strings, so no spreadsheet
+library is needed and the sheet is never held in memory. In both
+formats, text a spreadsheet would take for a formula gets a leading
+apostrophe.
+
+Ranges longer than EXPORT_SYNC_MAX_DAYS run as background jobs on a
+small thread pool (EXPORT_WORKERS). A job writes its file to EXPORT_DIR
+under a .partial name, renames it when complete, and keeps it for
+EXPORT_RETENTION_HOURS. Each job's state is also written to a JSON
+manifest next to its file (<id>.json), so other processes, or this one
+after a restart, can still report and serve it; the retention sweep
+removes both.
+"""
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain, islice
+from xml.sax.saxutils import escape
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import aliased
+from src.models.ems_models import db, Ride, Patient, User, DriverProfile
+from src.models.ids import new_id
+from src.services.day_schedule import day_schedule
+from src.services.diagnostics import register_stats
+
+CHUNK_ROWS = 1000
+DEFAULT_SYNC_MAX_DAYS = 62
+DEFAULT_WORKERS = 1
+DEFAULT_RETENTION_HOURS = 24
+# Cell text starting with these is a formula to Excel and LibreOffice
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f-]{36}$')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class ExportError(ValueError):
+    """An export request names an unknown dataset or format"""
+
+
+def _local(moment):
+    if moment is None:
+        return None
+    return moment.replace(tzinfo=timezone.utc).astimezone(day_schedule.tz).strftime('%Y-%m-%d %H:%M')
+
+
+def _village(address):
+    return (address or {}).get('village', '') if isinstance(address, dict) else ''
+
+
+def _ride_rows(start, end):
+    driver = aliased(User)
+    requester = aliased(User)
+    query = db.session.query(
+        Ride.id, Ride.appointment_time, Ride.status, Patient.full_name, Patient.current_address,
+        Ride.pickup_location, Ride.destination, driver.name, requester.name, Ride.caregiver_count,
+        Ride.rating, Ride.created_at, Ride.completed_at,
+    ).join(Patient, Ride.patient_id == Patient.id)\
+        .join(requester, Ride.requester_id == requester.id)\
+        .outerjoin(driver, Ride.driver_id == driver.id)\
+        .filter(Ride.appointment_time >= start, Ride.appointment_time < end)\
+        .order_by(Ride.appointment_time, Ride.id)
+    for row in query.yield_per(CHUNK_ROWS):
+        yield (row[0], _local(row[1]), row[2], row[3], _village(row[4]), row[5], row[6], row[7], row[8],
+               row[9], row[10], _local(row[11]), _local(row[12]))
+
+
+def _patient_rows(start, end):
+    registered_by = aliased(User)
+    query = db.session.query(
+        Patient.id, Patient.full_name, Patient.gender, Patient.age, Patient.patient_types, Patient.contact_phone,
+        Patient.current_address, Patient.landmark, Patient.latitude, Patient.longitude, Patient.registered_date,
+        registered_by.name,
+    ).join(registered_by, Patient.registered_by_id == registered_by.id)\
+        .filter(Patient.registered_date >= start, Patient.registered_date < end)\
+        .order_by(Patient.registered_date, Patient.id)
+    for row in query.yield_per(CHUNK_ROWS):
+        yield (row[0], row[1], row[2], row[3], '; '.join(row[4] or []), row[5], _village(row[6]), row[7],
+               float(row[8]) if row[8] is not None else None, float(row[9]) if row[9] is not None else None,
+               _local(row[10]), row[11])
+
+
+def _driver_stat_rows(start, end):
+    query = db.session.query(
+        User.id, User.name, DriverProfile.license_plate, User.status,
+        func.count(Ride.id),
+        func.sum(case((Ride.status == 'COMPLETED', 1), else_=0)),
+        func.sum(case((Ride.status == 'CANCELLED', 1), else_=0)),
+        func.avg(Ride.rating),
+        func.count(Ride.rating),
+    ).outerjoin(DriverProfile, DriverProfile.user_id == User.id)\
+        .outerjoin(Ride, and_(Ride.driver_id == User.id, Ride.appointment_time >= start, Ride.appointment_time < end))\
+        .filter(User.role == 'driver')\
+        .group_by(User.id, User.name, DriverProfile.license_plate, User.status)\
+        .order_by(User.name, User.id)
+    for row in query.yield_per(CHUNK_ROWS):
+        yield (row[0], row[1], row[2], row[3], row[4], row[5] or 0, row[6] or 0,
+               round(float(row[7]), 2) if row[7] is not None else None, row[8])
+
+
+DATASETS = {
+    'rides': (
+        ('Ride ID', 'Appointment', 'Status', 'Patient', 'Village', 'Pickup', 'Destination', 'Driver',
+         'Requested by', 'Caregivers', 'Rating', 'Created', 'Completed'),
+        _ride_rows,
+    ),
+    'patients': (
+        ('Patient ID', 'Full name', 'Gender', 'Age', 'Patient types', 'Phone', 'Village', 'Landmark',
+         'Latitude', 'Longitude', 'Registered', 'Registered by'),
+        _patient_rows,
+    ),
+    'driver-stats': (
+        ('Driver ID', 'Name', 'License plate', 'Status', 'Rides', 'Completed', 'Cancelled', 'Average rating',
+         'Ratings'),
+        _driver_stat_rows,
+    ),
+}
+
+
+def open_export(dataset, first_day, end_day):
+    """(header, rows) for a dataset over local days [first_day, end_day).
+
+    The query has already run when this returns, so database errors
+    surface to the caller rather than halfway through a response.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f'Unknown dataset; use one of {", ".join(DATASETS)}')
+    header, source = DATASETS[dataset]
+    start, _ = day_schedule.day_range(first_day)
+    end, _ = day_schedule.day_range(end_day)
+    rows = source(start, end)
+    first = next(rows, None)
+    return header, rows if first is None else chain([first], rows)
+
+
+def _chunks(rows):
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _inert(value):
+    """value, with a leading ' if a spreadsheet would read it as a formula.
+
+    Names, addresses and landmarks are typed in by community users, and
+    office staff open these files in Excel, so a cell such as
+    =HYPERLINK(...) must stay text.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield b'\xef\xbb\xbf' + buffer.getvalue().encode('utf-8')
+    for chunk in _chunks(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_inert(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode('utf-8')
+
+
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_DOCUMENT_RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'<Relationships xmlns="{_RELATIONSHIPS_NS}"><Relationship Id="rId1" '
+        f'Type="{_DOCUMENT_RELATIONSHIPS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'<Relationships xmlns="{_RELATIONSHIPS_NS}"><Relationship Id="rId1" '
+        f'Type="{_DOCUMENT_RELATIONSHIPS}/worksheet" Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable stream whose bytes are taken out as they arrive"""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_inert(_XML_INVALID.sub('', str(value))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def xlsx_chunks(header, rows, sheet_name='Sheet1'):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS.items():
+            archive.writestr(name, _XML_HEAD + xml)
+        archive.writestr('xl/workbook.xml', (
+            f'{_XML_HEAD}<workbook xmlns="{_SPREADSHEET_NS}" xmlns:r="{_DOCUMENT_RELATIONSHIPS}">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield sink.take()
+        # zip64 because the sheet's final size is unknown while it is being written
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(f'{_XML_HEAD}<worksheet xmlns="{_SPREADSHEET_NS}"><sheetData>{_row(header)}'.encode('utf-8'))
+            for chunk in _chunks(rows):
+                sheet.write(''.join(_row(values) for values in chunk).encode('utf-8'))
+                yield sink.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.take()
+
+
+def export_chunks(fmt, dataset, header, rows):
+    """Encoded chunks of a dataset in fmt ('csv' or 'xlsx')"""
+    if fmt == 'csv':
+        return csv_chunks(header, rows)
+    if fmt == 'xlsx':
+        return xlsx_chunks(header, rows, sheet_name=dataset)
+    raise ExportError(f'Unknown format; use one of {", ".join(FORMATS)}')
+
+
+def export_filename(dataset, fmt, first_day, end_day):
+    return f'{dataset}_{first_day.isoformat()}_{end_day.isoformat()}.{fmt}'
+
+
+class ExportJobs:
+    def __init__(self, workers=DEFAULT_WORKERS, directory=None, retention_hours=DEFAULT_RETENTION_HOURS,
+                 sync_max_days=DEFAULT_SYNC_MAX_DAYS):
+        self.workers = workers
+        self.sync_max_days = sync_max_days
+        self.directory = directory
+        self.retention_hours = retention_hours
+        self._app = None
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('EXPORT_WORKERS', self.workers)
+        self.directory = app.config.get('EXPORT_DIR', self.directory)
+        self.retention_hours = app.config.get('EXPORT_RETENTION_HOURS', self.retention_hours)
+        self.sync_max_days = app.config.get('EXPORT_SYNC_MAX_DAYS', self.sync_max_days)
+        self._app = app
+
+    def submit(self, dataset, fmt, first_day, end_day, user_id, app=None):
+        """Queue an export; returns the job as a dict"""
+        if dataset not in DATASETS:
+            raise ExportError(f'Unknown dataset; use one of {", ".join(DATASETS)}')
+        if fmt not in FORMATS:
+            raise ExportError(f'Unknown format; use one of {", ".join(FORMATS)}')
+        self._app = app or self._app
+        self._purge()
+        job = {
+            'id': new_id(),
+            'dataset': dataset,
+            'format': fmt,
+            'from': first_day.isoformat(),
+            'to': end_day.isoformat(),
+            'status': 'queued',
+            'rows': 0,
+            'createdBy': user_id,
+            'createdAt': datetime.utcnow().isoformat(),
+            'finishedAt': None,
+            'error': None,
+            'filename': export_filename(dataset, fmt, first_day, end_day),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        self._save(job)
+        with self._lock:
+            self._jobs[job['id']] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+        self._executor.submit(self._run, job['id'], first_day, end_day)
+        return dict(job)
+
+    def get(self, job_id):
+        """The job as a dict, from memory or else from its manifest; None if unknown or purged"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        if not self.directory or not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._manifest_path(job_id), encoding='utf-8') as manifest:
+                return json.load(manifest)
+        except (OSError, ValueError):
+            return None
+
+    def path(self, job):
+        return os.path.join(self.directory, f"{job['id']}.{job['format']}")
+
+    def stats(self):
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running', 'done', 'failed')}
+
+    def _manifest_path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def _save(self, job):
+        # Written under a temporary name and renamed, so readers never see half a manifest
+        path = self._manifest_path(job['id'])
+        with open(path + '.partial', 'w', encoding='utf-8') as manifest:
+            json.dump(job, manifest)
+        os.replace(path + '.partial', path)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            job = dict(self._jobs[job_id])
+        try:
+            self._save(job)
+        except OSError:
+            pass
+
+    def _run(self, job_id, first_day, end_day):
+        job = self.get(job_id)
+        self._update(job_id, status='running')
+        partial = None
+        try:
+            # Everything that can fail is in here, so a job always ends done or failed
+            path = self.path(job)
+            partial = path + '.partial'
+            with self._app.app_context():
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    header, rows = open_export(job['dataset'], first_day, end_day)
+                    counter = _Counter(rows)
+                    with open(partial, 'wb') as output:
+                        for chunk in export_chunks(job['format'], job['dataset'], header, counter):
+                            output.write(chunk)
+                finally:
+                    db.session.remove()
+            os.replace(partial, path)
+            self._update(job_id, status='done', rows=counter.count, finishedAt=datetime.utcnow().isoformat())
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), finishedAt=datetime.utcnow().isoformat())
+            if partial is not None:
+                try:
+                    os.remove(partial)
+                except OSError:
+                    pass
+
+    def _purge(self):
+        """Forget jobs finished before the retention window and delete older files in EXPORT_DIR.
+
+        The directory sweep goes by mtime, so it also removes files and
+        manifests left by earlier processes, whose jobs this one never knew
+        about.
+        """
+        cutoff = time.time() - self.retention_hours * 3600
+        with self._lock:
+            expired = [job['id'] for job in self._jobs.values() if job['status'] in ('done', 'failed')
+                       and datetime.fromisoformat(job['finishedAt']).replace(tzinfo=timezone.utc).timestamp() < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class _Counter:
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.count += 1
+        return row
+
+
+export_jobs = ExportJobs()
+register_stats('exports', export_jobs.stats)
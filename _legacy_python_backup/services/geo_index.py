@@ -0,0 +1,175 @@
+"""Geospatial index on patient pickup coordinates.
+
+Every patient with coordinates carries a 12-character geohash in
+Patient.geohash (indexed). Points in the same geohash cell share its
+prefix, so "near this point" becomes a handful of indexed prefix-range
+scans over the cells covering the search circle's bounding box. An exact
+haversine distance check on those candidates gives the final result. This
+only needs an ordinary B-tree index, so it behaves the same on SQLite
+and MySQL.
+
+Mapper events keep the geohash in sync whenever a patient's coordinates
+are saved; rebuild_geo_index.py fills it in for existing rows.
+"""
+import math
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm.attributes import get_history
+from src.models.ems_models import Patient
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+# Upper bound on prefix ranges per query; more, smaller cells fit the circle
+# better, fewer, larger cells mean fewer index probes
+MAX_CELLS = 16
+# k-nearest searches start at this radius and double up to max_radius_km
+INITIAL_RADIUS_KM = 1.0
+MAX_RADIUS_KM = 100.0
+
+
+def encode_geohash(lat, lng, precision=PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def covering_cells(lat, lng, radius_km):
+    """Geohash prefixes whose cells together cover the circle's bounding box"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lng_delta = lat_delta / max(math.cos(math.radians(lat)), 1e-6)
+    south, north = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    west, east = max(lng - lng_delta, -180.0), min(lng + lng_delta, 180.0)
+
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        columns = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * columns <= MAX_CELLS or precision == 1:
+            break
+
+    cells = set()
+    for row in range(rows):
+        cell_lat = min((math.floor(south / height) + row + 0.5) * height, 90.0)
+        for column in range(columns):
+            cell_lng = min((math.floor(west / width) + column + 0.5) * width, 180.0)
+            cells.add(encode_geohash(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def cell_filter(cells):
+    # '~' sorts after every geohash character, so [cell, cell + '~') is the prefix range
+    return or_(*(and_(Patient.geohash >= cell, Patient.geohash < cell + '~') for cell in cells))
+
+
+def within_radius(query, lat, lng, radius_km, locate=None):
+    """Rows of query within radius_km of (lat, lng) as [(row, distance_km)], nearest first.
+
+    query must select Patient rows or be joined to Patient; locate maps a
+    row to its Patient (e.g. lambda ride: ride.patient) when it is not one.
+    """
+    locate = locate or (lambda row: row)
+    results = []
+    for row in query.filter(cell_filter(covering_cells(lat, lng, radius_km))):
+        patient = locate(row)
+        if patient is None or patient.latitude is None or patient.longitude is None:
+            continue
+        distance = haversine_km(lat, lng, float(patient.latitude), float(patient.longitude))
+        if distance <= radius_km:
+            results.append((row, distance))
+    results.sort(key=lambda result: result[1])
+    return results
+
+
+def search_error(radius_km, k, max_k):
+    """Why ?radius= or ?k= is out of range for a nearby search, or None"""
+    if radius_km is not None and not 0 < radius_km <= MAX_RADIUS_KM:
+        return f'radius must be greater than 0 and at most {MAX_RADIUS_KM:g} km'
+    if k is not None and not 1 <= k <= max_k:
+        return f'k must be between 1 and {max_k}'
+    return None
+
+
+def nearest(query, lat, lng, k, max_radius_km=MAX_RADIUS_KM):
+    """The k rows of query nearest to (lat, lng), within max_radius_km, as [(row, distance_km)]
+
+    query must select Patient rows or be joined to Patient. While the
+    radius widens only ids and coordinates are read; the k nearest rows
+    are then loaded once, with the query's loading plan.
+    """
+    id_column = inspect(query.column_descriptions[0]['entity']).primary_key[0]
+    coordinates = query.with_entities(id_column, Patient.latitude, Patient.longitude)
+    radius_km = min(INITIAL_RADIUS_KM, max_radius_km)
+    while True:
+        candidates = {}
+        for row_id, row_lat, row_lng in coordinates.filter(cell_filter(covering_cells(lat, lng, radius_km))):
+            if row_lat is None or row_lng is None:
+                continue
+            distance = haversine_km(lat, lng, float(row_lat), float(row_lng))
+            if distance <= radius_km:
+                candidates[row_id] = distance
+        if len(candidates) >= k or radius_km >= max_radius_km:
+            break
+        radius_km = min(radius_km * 2, max_radius_km)
+
+    winners = sorted(candidates, key=candidates.get)[:k]
+    if not winners:
+        return []
+    rows = {getattr(row, id_column.key): row for row in query.filter(id_column.in_(winners))}
+    return [(rows[row_id], candidates[row_id]) for row_id in winners if row_id in rows]
+
+
+def _set_geohash(mapper, connection, target):
+    changed = get_history(target, 'latitude').has_changes() or get_history(target, 'longitude').has_changes()
+    if not changed and (target.geohash is not None or target.latitude is None):
+        return
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+        return
+    try:
+        target.geohash = encode_geohash(float(target.latitude), float(target.longitude))
+    except (TypeError, ValueError):
+        # Coordinates that are not numbers are not indexed
+        target.geohash = None
+
+
+event.listen(Patient, 'before_insert', _set_geohash)
+event.listen(Patient, 'before_update', _set_geohash)
@@ -0,0 +1,67 @@
+"""Per-endpoint relationship loading plans.
+
+Each list endpoint declares which relationships its serializer walks, so
+they are fetched with a constant number of queries instead of one lazy
+load per row. Many-to-one rows that are distinct per ride (the patient)
+are joined; users shared by many rides (driver, requester) are loaded
+with a single SELECT ... IN per relationship.
+
+Streamed endpoints (serializers.stream_response) read rows in batches
+from a server-side cursor. They join every to-one relationship instead,
+so no second statement runs on the connection while the cursor is open.
+"""
+from flask import request
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload, selectinload
+from src.models.ems_models import Ride, Patient, User
+
+# The relationships below are backrefs, which only exist once mappers are configured
+configure_mappers()
+
+RIDE_DETAIL = (
+    joinedload(Ride.patient),
+    selectinload(Ride.requester),
+    selectinload(Ride.driver).selectinload(User.driver_profile),
+)
+# For queries that already join Patient themselves (e.g. to filter on it)
+RIDE_DETAIL_JOINED_PATIENT = (
+    contains_eager(Ride.patient),
+    selectinload(Ride.requester),
+    selectinload(Ride.driver).selectinload(User.driver_profile),
+)
+RIDE_DETAIL_STREAMED = (
+    joinedload(Ride.patient),
+    joinedload(Ride.requester),
+    joinedload(Ride.driver).joinedload(User.driver_profile),
+)
+RIDE_WITH_PATIENT = (
+    joinedload(Ride.patient),
+)
+RIDE_WITH_PATIENT_AND_DRIVER = (
+    joinedload(Ride.patient),
+    selectinload(Ride.driver),
+)
+PATIENT_DETAIL = (
+    selectinload(Patient.registered_by_user),
+)
+DRIVER_WITH_PROFILE = (
+    selectinload(User.driver_profile),
+)
+
+ENDPOINT_PLANS = {
+    'office.get_urgent_rides': RIDE_DETAIL_STREAMED,
+    'office.get_all_rides': RIDE_DETAIL,
+    'office.get_nearby_rides': RIDE_DETAIL_JOINED_PATIENT,
+    'office.get_all_patients': PATIENT_DETAIL,
+    'office.get_all_drivers': DRIVER_WITH_PROFILE,
+    'driver.get_driver_jobs': RIDE_DETAIL_STREAMED,
+    'driver.get_nearby_jobs': RIDE_DETAIL_JOINED_PATIENT,
+    'driver.get_driver_history': RIDE_WITH_PATIENT,
+    'community.get_recent_rides': RIDE_WITH_PATIENT,
+    'community.get_rides': RIDE_WITH_PATIENT_AND_DRIVER,
+}
+
+
+def with_loading_plan(query, endpoint=None):
+    """Apply the loading plan declared for the current (or given) endpoint"""
+    plan = ENDPOINT_PLANS.get(endpoint or request.endpoint, ())
+    return query.options(*plan) if plan else query
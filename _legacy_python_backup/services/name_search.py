@@ -0,0 +1,98 @@
+"""Indexed, Thai-aware patient name search.
+
+Names are normalized before they are indexed or searched:
+
+- Unicode NFC, lower case, all whitespace (including zero-width spaces) removed
+- a leading title such as นาย, นาง, นางสาว, ด.ช. or Mr. is dropped
+- Thai tone marks (plus mai taikhu and thanthakhat) are dropped and the two
+  ways of typing sara am are unified, so names typed with a different or
+  missing mark still match
+
+The normalized form is stored in Patient.search_name and split into
+trigrams in patient_name_grams. A search looks up the trigrams of the query
+through that index and only checks the substring on the matching patients,
+instead of running LIKE '%...%' over the whole table. Queries shorter than
+one trigram fall back to the substring check alone.
+
+Mapper events keep both in sync whenever a Patient is inserted, renamed or
+deleted through the ORM; rebuild_name_index.py indexes existing rows.
+"""
+import re
+import unicodedata
+from sqlalchemy import and_, event, func, select, true
+from sqlalchemy.orm.attributes import get_history
+from src.models.ems_models import Patient, PatientNameGram
+
+GRAM_SIZE = 3
+
+# Thai titles are often typed joined to the name; Latin ones need a dot or space.
+# นางสาว must come before นาง so it is not stripped as นาง + สาว.
+TITLE = re.compile(r'^(?:นางสาว|นาง|นาย|น\.ส\.|เด็กชาย|เด็กหญิง|ด\.ช\.|ด\.ญ\.|(?:mrs|mr|ms|miss)[.\s])')
+# Mai taikhu, the four tone marks and thanthakhat
+IGNORED_MARKS = re.compile('[\u0e47-\u0e4c]')
+WHITESPACE = re.compile(r'[\s\u200b]+')
+
+
+def normalize_name(name):
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFC', name).lower().strip()
+    name = TITLE.sub('', name)
+    name = IGNORED_MARKS.sub('', name)
+    # Nikhahit + sara aa, typed as two characters, is the same as sara am
+    name = name.replace('\u0e4d\u0e32', '\u0e33')
+    return WHITESPACE.sub('', name)
+
+
+def name_grams(normalized):
+    return {normalized[i:i + GRAM_SIZE] for i in range(len(normalized) - GRAM_SIZE + 1)}
+
+
+def patient_name_filter(search):
+    """Filter criterion on Patient matching a user-typed name fragment"""
+    key = normalize_name(search)
+    if not key:
+        # The search was only a title, which every name may carry
+        return true()
+    contains = Patient.search_name.contains(key, autoescape=True)
+    grams = name_grams(key)
+    if not grams:
+        return contains
+    candidates = select(PatientNameGram.patient_id)\
+        .where(PatientNameGram.gram.in_(grams))\
+        .group_by(PatientNameGram.patient_id)\
+        .having(func.count() == len(grams))
+    return and_(Patient.id.in_(candidates), contains)
+
+
+def gram_rows(patient_id, normalized):
+    return [{'gram': gram, 'patient_id': patient_id} for gram in name_grams(normalized)]
+
+
+def _set_search_name(mapper, connection, target):
+    if target.search_name is None or get_history(target, 'full_name').has_changes():
+        target.search_name = normalize_name(target.full_name)
+
+
+def _index_inserted(mapper, connection, target):
+    rows = gram_rows(target.id, target.search_name)
+    if rows:
+        connection.execute(PatientNameGram.__table__.insert(), rows)
+
+
+def _reindex_updated(mapper, connection, target):
+    if not get_history(target, 'search_name').has_changes():
+        return
+    connection.execute(PatientNameGram.__table__.delete().where(PatientNameGram.patient_id == target.id))
+    _index_inserted(mapper, connection, target)
+
+
+def _unindex_deleted(mapper, connection, target):
+    connection.execute(PatientNameGram.__table__.delete().where(PatientNameGram.patient_id == target.id))
+
+
+event.listen(Patient, 'before_insert', _set_search_name)
+event.listen(Patient, 'before_update', _set_search_name)
+event.listen(Patient, 'after_insert', _index_inserted)
+event.listen(Patient, 'after_update', _reindex_updated)
+event.listen(Patient, 'before_delete', _unindex_deleted)
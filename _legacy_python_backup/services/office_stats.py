@@ -0,0 +1,79 @@
+"""Office dashboard counters, shared as a short-lived snapshot.
+
+All five counters come from one SELECT of scalar subqueries, each served
+by an index. Today's rides are counted over the local day's half-open
+appointment_time range (services/day_schedule.py) rather than with
+DATE(appointment_time). The result is kept for OFFICE_STATS_TTL seconds
+and shared by every request in the process. When it expires, one request recomputes it while concurrent
+pollers wait for that result, so N open office screens cost one query per
+TTL instead of N.
+"""
+import threading
+import time
+from sqlalchemy import func, select
+from src.models.ems_models import db, Ride, User, Patient
+from src.services.day_schedule import day_schedule
+
+DEFAULT_TTL_SECONDS = 5
+
+
+def _count(model, *criteria):
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def compute_office_stats(today=None):
+    day_start, day_end = day_schedule.day_range(today or day_schedule.today())
+    row = db.session.execute(select(
+        _count(Ride, Ride.status == 'PENDING').label('new_requests'),
+        _count(Ride, Ride.appointment_time >= day_start,
+               Ride.appointment_time < day_end).label('today_total_rides'),
+        _count(User, User.role == 'driver', User.status == 'Active').label('available_drivers'),
+        _count(User, User.role == 'driver').label('total_drivers'),
+        select(func.count()).select_from(Patient).scalar_subquery().label('total_patients'),
+    )).one()
+    return {
+        'newRequests': row.new_requests,
+        'todayTotalRides': row.today_total_rides,
+        'availableDrivers': row.available_drivers,
+        'totalDrivers': row.total_drivers,
+        'totalPatients': row.total_patients
+    }
+
+
+class StatsSnapshot:
+    def __init__(self, compute, ttl=DEFAULT_TTL_SECONDS):
+        self.compute = compute
+        self.ttl = ttl
+        self._snapshot = None  # (stats, monotonic time taken), replaced as a whole
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('OFFICE_STATS_TTL', self.ttl)
+
+    def get(self):
+        """(stats, age in seconds); recomputed at most once per TTL"""
+        snapshot = self._fresh()
+        if snapshot is None:
+            with self._lock:
+                # Whoever waited on the lock finds the value just computed
+                snapshot = self._fresh()
+                if snapshot is None:
+                    snapshot = (self.compute(), time.monotonic())
+                    self._snapshot = snapshot
+                    self.refreshes += 1
+        value, taken_at = snapshot
+        return dict(value), round(time.monotonic() - taken_at, 3)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _fresh(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot[1] < self.ttl:
+            return snapshot
+        return None
+
+
+office_stats = StatsSnapshot(compute_office_stats)
@@ -0,0 +1,106 @@
+"""Keyset (cursor) pagination for the list endpoints.
+
+Lists are ordered by (sort column DESC, id DESC). Each page carries a
+nextCursor, an opaque token that holds the last row's sort value and id.
+Passing it back as ?cursor= continues with
+WHERE (sort, id) < (last sort, last id). The sort column's index serves
+that range directly, so page 1000 costs the same as page 1. On InnoDB every
+secondary index already ends with the primary key.
+
+?page= still works as the compatibility path. It uses OFFSET and reports
+totalPages, and now uses the same stable order. Cursor pages skip the
+COUNT. limit is clamped to 1..PAGE_LIMIT_MAX on both paths.
+
+Exact totals come from the count cache (services/count_cache.py). With
+?count=estimated, either path returns estimatedTotal instead, and no
+totalPages. Every page reports hasMore.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import and_, or_, tuple_, literal
+from sqlalchemy.types import DateTime
+from src.services.count_cache import count_cache
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_limit(default=DEFAULT_LIMIT):
+    """?limit= clamped to 1..PAGE_LIMIT_MAX"""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config.get('PAGE_LIMIT_MAX', MAX_LIMIT)))
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, str(row_id)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token, sort_column):
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, row_id = json.loads(payload)
+        if sort_value is not None and isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+    return sort_value, row_id
+
+
+def after_cursor(sort_column, id_column, sort_value, row_id):
+    """Rows that come after (sort_value, row_id) in DESC order; NULLs sort last"""
+    # Bind with the columns' own types: inside tuple_() the id would otherwise
+    # go out as plain text and never compare equal to BINARY(16) keys
+    row_id = literal(row_id, id_column.type)
+    if sort_value is None:
+        return and_(sort_column.is_(None), id_column < row_id)
+    condition = tuple_(sort_column, id_column) < tuple_(literal(sort_value, sort_column.type), row_id)
+    if sort_column.expression.nullable:
+        condition = or_(condition, sort_column.is_(None))
+    return condition
+
+
+def paginate(query, sort_column, id_column, loaded=None, count=True):
+    """Fetch one page of query as (rows, page_info) from ?cursor= or ?page= and ?limit=.
+
+    loaded is query with its loading plan applied, if it has one; the
+    COUNT runs on the plain query. page_info holds nextCursor (None on
+    the last page) and hasMore. On the page path with count=True it also
+    holds totalPages. With ?count=estimated it holds estimatedTotal
+    instead. Raises InvalidCursor for a malformed token.
+    """
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    page_info = {}
+    if count and request.args.get('count') == 'estimated':
+        page_info['estimatedTotal'] = count_cache.estimate(query, id_column)
+        count = False
+
+    rows_query = (loaded if loaded is not None else query).order_by(sort_column.desc(), id_column.desc())
+    if cursor:
+        rows_query = rows_query.filter(after_cursor(sort_column, id_column, *decode_cursor(cursor, sort_column)))
+    else:
+        page = max(1, request.args.get('page', 1, type=int))
+        if count:
+            total = count_cache.count(query)
+            page_info['totalPages'] = (total + limit - 1) // limit
+        rows_query = rows_query.offset((page - 1) * limit)
+
+    # One extra row tells whether there is a next page without counting
+    rows = rows_query.limit(limit + 1).all()
+    last = rows[limit - 1] if len(rows) > limit else None
+    rows = rows[:limit]
+    page_info['hasMore'] = last is not None
+    page_info['nextCursor'] = encode_cursor(
+        getattr(last, sort_column.key), getattr(last, id_column.key)
+    ) if last is not None else None
+    return rows, page_info
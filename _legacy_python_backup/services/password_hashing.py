@@ -0,0 +1,81 @@
+"""Bounded worker pool for password hashing off the request threads"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time"""
+
+
+class PasswordHasher:
+    """Runs password hash/verify calls on a small dedicated thread pool.
+
+    The hashing itself stays in User.set_password and User.check_password;
+    pass hasher=password_hasher to either to run it here.
+
+    At most ``workers + queue_size`` jobs are accepted at once; anything beyond
+    that fails immediately with HashingPoolBusy so a login storm cannot tie up
+    every WSGI worker. werkzeug's pbkdf2/scrypt hashing runs in hashlib, which
+    releases the GIL, so the pool also keeps request threads responsive.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, timeout=DEFAULT_TIMEOUT_SECONDS):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.rejected = 0
+        self.configure(workers, queue_size, timeout)
+
+    def init_app(self, app):
+        self.configure(
+            app.config.get('PASSWORD_HASH_WORKERS', self.workers),
+            app.config.get('PASSWORD_HASH_QUEUE_SIZE', self.queue_size),
+            app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        )
+
+    def configure(self, workers, queue_size, timeout):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.workers = max(1, workers)
+            self.queue_size = max(0, queue_size)
+            self.timeout = timeout
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def run(self, fn, *args):
+        """fn(*args) on the pool; raises HashingPoolBusy if it is full or the call times out"""
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolBusy('Password hashing queue is full')
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The job keeps its slot until it actually finishes
+            self.rejected += 1
+            raise HashingPoolBusy('Password hashing timed out')
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='password-hash'
+                    )
+        return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,46 @@
+"""Per-request SQL statement counter.
+
+Counts every statement sent to the database while a request is handled and,
+when SQL_STATEMENT_COUNT is enabled, reports it in an X-SQL-Statements
+response header. Requests above SQL_STATEMENT_BUDGET are logged as
+warnings so N+1 regressions show up in the server log.
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+HEADER_NAME = 'X-SQL-Statements'
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_statement_count = g.get('sql_statement_count', 0) + 1
+
+
+class QueryCounter:
+    def __init__(self):
+        self._listening = False
+
+    def init_app(self, app):
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', _count_statement)
+            self._listening = True
+
+        @app.before_request
+        def reset_statement_count():
+            g.sql_statement_count = 0
+
+        @app.after_request
+        def report_statement_count(response):
+            if not app.config.get('SQL_STATEMENT_COUNT'):
+                return response
+            count = g.get('sql_statement_count', 0)
+            response.headers[HEADER_NAME] = str(count)
+            budget = app.config.get('SQL_STATEMENT_BUDGET')
+            if budget and count > budget:
+                app.logger.warning('%s %s issued %d SQL statements (budget %d)',
+                                   request.method, request.path, count, budget)
+            return response
+
+
+query_counter = QueryCounter()
@@ -0,0 +1,332 @@
+"""Compiled model serializers and a fast JSON response helper.
+
+Each (model, field set) pair is turned into one generated Python function
+that reads the attributes it needs exactly once and builds the output dict
+with a single literal. Datetimes are left as-is and encoded by orjson in C
+when it is installed; otherwise the stdlib encoder formats them.
+
+stream_response() encodes unbounded lists a batch at a time, as a
+chunked JSON array or, on request, as NDJSON (one object per line).
+"""
+import json
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from flask import Response, request, stream_with_context
+from src.models.ems_models import User, Patient, Ride, NewsArticle, AuditLog, DriverProfile
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _ride_driver_info(ride):
+    driver = ride.driver
+    if driver is None:
+        return None
+    driver_profile = driver.driver_profile
+    if driver_profile is None:
+        return None
+    return {
+        'id': driver.id,
+        'fullName': driver.name,
+        'phone': driver.phone,
+        'licensePlate': driver_profile.license_plate,
+        'vehicleModel': 'Unknown'  # Would need vehicle table for this
+    }
+
+
+def _news_summary(article):
+    content = article.content
+    return content[:200] + '...' if len(content) > 200 else content
+
+
+def _news_author(article):
+    return {'name': article.author}
+
+
+# A field is (output key, dotted attribute path or callable, conversion).
+# Dotted paths are None-safe like the "x.y if x else None" in to_dict().
+# Conversions: None (as-is), 'list'/'dict' (empty default for JSON columns),
+# 'str_or_none' (truthy Decimal -> str), 'float', 'float_or_none'.
+FIELD_SETS = {
+    User: {
+        'default': (
+            ('id', 'id', None),
+            ('name', 'name', None),
+            ('email', 'email', None),
+            ('role', 'role', None),
+            ('phone', 'phone', None),
+            ('profile_image_url', 'profile_image_url', None),
+            ('status', 'status', None),
+            ('created_at', 'created_at', None),
+            ('updated_at', 'updated_at', None),
+        ),
+    },
+    DriverProfile: {
+        'default': (
+            ('user_id', 'user_id', None),
+            ('license_plate', 'license_plate', None),
+            ('address', 'address', None),
+            ('vehicle_id', 'vehicle_id', None),
+            ('avg_review_score', 'avg_review_score', 'float'),
+            ('date_created', 'date_created', None),
+            ('completed_trips', 'completed_trips', None),
+            ('rating_count', 'rating_count', None),
+            ('last_completed_at', 'last_completed_at', None),
+        ),
+    },
+    Patient: {
+        'default': (
+            ('id', 'id', None),
+            ('fullName', 'full_name', None),
+            ('profileImageUrl', 'profile_image_url', None),
+            ('title', 'title', None),
+            ('gender', 'gender', None),
+            ('nationalId', 'national_id', None),
+            ('dob', 'dob', None),
+            ('age', 'age', None),
+            ('patientTypes', 'patient_types', 'list'),
+            ('bloodType', 'blood_type', None),
+            ('rhFactor', 'rh_factor', None),
+            ('healthCoverage', 'health_coverage', None),
+            ('chronicDiseases', 'chronic_diseases', 'list'),
+            ('allergies', 'allergies', 'list'),
+            ('contactPhone', 'contact_phone', None),
+            ('idCardAddress', 'id_card_address', 'dict'),
+            ('currentAddress', 'current_address', 'dict'),
+            ('landmark', 'landmark', None),
+            ('latitude', 'latitude', 'str_or_none'),
+            ('longitude', 'longitude', 'str_or_none'),
+            ('registeredDate', 'registered_date', None),
+            ('registeredBy', 'registered_by_user.name', None),
+            ('keyInfo', 'key_info', None),
+            ('caregiverName', 'caregiver_name', None),
+            ('caregiverPhone', 'caregiver_phone', None),
+        ),
+        'community_list': (
+            ('id', 'id', None),
+            ('fullName', 'full_name', None),
+            ('age', 'age', None),
+            ('keyInfo', 'key_info', None),
+            ('registeredDate', 'registered_date', None),
+        ),
+    },
+    Ride: {
+        'default': (
+            ('id', 'id', None),
+            ('patientName', 'patient.full_name', None),
+            ('patientPhone', 'patient.contact_phone', None),
+            ('pickupLocation', 'pickup_location', None),
+            ('destination', 'destination', None),
+            ('appointmentTime', 'appointment_time', None),
+            ('status', 'status', None),
+            ('driverName', 'driver.name', None),
+            ('requestedBy', 'requester.name', None),
+            ('specialNeeds', 'special_needs', 'list'),
+            ('caregiverCount', 'caregiver_count', None),
+            ('rating', 'rating', None),
+            ('reviewTags', 'review_tags', 'list'),
+            ('reviewComment', 'review_comment', None),
+            ('driverInfo', _ride_driver_info, None),
+            ('createdAt', 'created_at', None),
+            ('updatedAt', 'updated_at', None),
+        ),
+        'summary': (
+            ('id', 'id', None),
+            ('patientName', 'patient.full_name', 'unknown'),
+            ('destination', 'destination', None),
+            ('appointmentTime', 'appointment_time', None),
+            ('status', 'status', None),
+        ),
+        'community_list': (
+            ('id', 'id', None),
+            ('patientName', 'patient.full_name', 'unknown'),
+            ('destination', 'destination', None),
+            ('appointmentTime', 'appointment_time', None),
+            ('status', 'status', None),
+            ('driverName', 'driver.name', None),
+        ),
+    },
+    NewsArticle: {
+        'default': (
+            ('id', 'id', None),
+            ('title', 'title', None),
+            ('content', 'content', None),
+            ('author', 'author', None),
+            ('status', 'status', None),
+            ('publishedDate', 'published_date', None),
+            ('scheduledDate', 'scheduled_date', None),
+            ('featuredImageUrl', 'featured_image_url', None),
+            ('createdAt', 'created_at', None),
+            ('updatedAt', 'updated_at', None),
+        ),
+        'public_list': (
+            ('id', 'id', None),
+            ('title', 'title', None),
+            ('summary', _news_summary, None),
+            ('coverImage', 'featured_image_url', None),
+            ('publishedAt', 'published_date', None),
+            ('author', _news_author, None),
+        ),
+    },
+    AuditLog: {
+        'default': (
+            ('id', 'id', None),
+            ('timestamp', 'timestamp', None),
+            ('userEmail', 'user_email', None),
+            ('userRole', 'user_role', None),
+            ('action', 'action', None),
+            ('targetId', 'target_id', None),
+            ('ipAddress', 'ip_address', None),
+            ('dataPayload', 'data_payload', 'dict'),
+        ),
+    },
+}
+
+_CONVERSIONS = {
+    None: '{v}',
+    'list': '{v} if {v} is not None else []',
+    'dict': '{v} if {v} is not None else {{}}',
+    'str_or_none': 'str({v}) if {v} else None',
+    'float': 'float({v})',
+    'float_or_none': 'float({v}) if {v} is not None else None',
+    'unknown': "{v} if {v} is not None else 'Unknown'",
+}
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+
+def _compile(model, fields):
+    lines = ['def serialize(obj):']
+    namespace = {}
+    path_vars = {(): 'obj'}
+    items = []
+
+    def resolve(parts):
+        # Emit one None-safe attribute read per distinct path prefix
+        parts = tuple(parts)
+        if parts in path_vars:
+            return path_vars[parts]
+        parent = resolve(parts[:-1])
+        var = f'p{len(path_vars)}'
+        path_vars[parts] = var
+        if parent == 'obj':
+            lines.append(f'    {var} = obj.{parts[-1]}')
+        else:
+            lines.append(f'    {var} = {parent}.{parts[-1]} if {parent} is not None else None')
+        return var
+
+    for index, (key, source, conversion) in enumerate(fields):
+        if callable(source):
+            name = f'fn{index}'
+            namespace[name] = source
+            var = f'c{index}'
+            lines.append(f'    {var} = {name}(obj)')
+        else:
+            var = resolve(source.split('.'))
+        items.append(f'        {key!r}: {_CONVERSIONS[conversion].format(v=var)},')
+
+    lines.append('    return {')
+    lines.extend(items)
+    lines.append('    }')
+    exec(compile('\n'.join(lines), f'<serializer {model.__name__}>', 'exec'), namespace)
+    return namespace['serialize']
+
+
+def serializer_for(model, field_set='default'):
+    """Return the compiled row -> dict function for a model and field set"""
+    key = (model, field_set)
+    fn = _compiled.get(key)
+    if fn is None:
+        with _compile_lock:
+            fn = _compiled.get(key)
+            if fn is None:
+                fn = _compile(model, FIELD_SETS[model][field_set])
+                _compiled[key] = fn
+    return fn
+
+
+def serialize(obj, field_set='default'):
+    return serializer_for(type(obj), field_set)(obj)
+
+
+def serialize_many(model, rows, field_set='default'):
+    fn = serializer_for(model, field_set)
+    return [fn(row) for row in rows]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(payload):
+        return orjson.dumps(payload, default=_default)
+else:
+    def dumps(payload):
+        return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Encode payload straight to bytes and wrap it like jsonify() would"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """Whether the client asked for NDJSON (?format=ndjson or an Accept header preferring it)"""
+    requested = request.args.get('format', '').lower()
+    if requested:
+        return requested in ('ndjson', 'jsonl')
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def encoded_response(items, status=200):
+    """A list of already-encoded JSON objects as a JSON array, or as NDJSON if the client asked for it"""
+    if wants_ndjson():
+        return Response(b''.join(item + b'\n' for item in items), status=status, mimetype=NDJSON_MIMETYPE)
+    return Response(b'[' + b','.join(items) + b']', status=status, mimetype='application/json')
+
+
+def stream_response(query, to_dict, batch_size=STREAM_BATCH_SIZE):
+    """Stream a query's rows through to_dict as a JSON array, or as NDJSON if the client asked for it.
+
+    Rows come from a server-side cursor (yield_per) and are encoded one
+    batch at a time, so peak memory is one batch however many rows match.
+    The first batch is read before returning, so query errors still reach
+    the view's own error handling. The query must not need a second
+    statement per batch (see loading_plans.RIDE_DETAIL_STREAMED).
+    """
+    ndjson = wants_ndjson()
+    rows = iter(query.yield_per(batch_size))
+
+    def encode_batch():
+        batch = [dumps(to_dict(row)) for row in islice(rows, batch_size)]
+        if ndjson:
+            return b''.join(item + b'\n' for item in batch)
+        return b','.join(batch)
+
+    first = encode_batch()
+
+    def generate():
+        chunk = first
+        yield chunk if ndjson else b'[' + chunk
+        while chunk:
+            chunk = encode_batch()
+            if chunk:
+                yield chunk if ndjson else b',' + chunk
+        if not ndjson:
+            yield b']'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE if ndjson else 'application/json')
@@ -0,0 +1,226 @@
+"""Opt-in stateless authentication: trusted JWT claims plus a revocation filter"""
+import calendar
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+import jwt
+from flask import current_app
+from src.models.ems_models import db, UserRevocation
+from src.services.user_cache import load_user
+from src.services.diagnostics import register_stats
+
+DEFAULT_CAPACITY = 10000
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+DEFAULT_REFRESH_SECONDS = 5
+TOKEN_LIFETIME = timedelta(hours=24)
+# Revocations written by another worker in the same second as our last
+# refresh could be missed by a strict '>' watermark, so re-read a little
+REFRESH_OVERLAP = timedelta(seconds=2)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys (a few KB per 10k entries)"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """In-memory view of user_revocations, refreshed incrementally per worker.
+
+    The Bloom filter answers "definitely not revoked" for almost every request
+    without touching the exact map. The exact map only holds entries that can
+    still affect a live token: users whose not_before lies within the token
+    lifetime (after a deactivation, deletion or role change).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.capacity = capacity
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app):
+        self.capacity = app.config.get('AUTH_REVOCATION_CAPACITY', self.capacity)
+        self.refresh_seconds = app.config.get('AUTH_REVOCATION_REFRESH', self.refresh_seconds)
+        self._reset()
+
+    def _reset(self):
+        self._bloom = BloomFilter(self.capacity)
+        self._entries = {}
+        self._watermark = None
+        self._next_refresh = 0.0
+
+    def is_revoked(self, user_id, issued_at):
+        """Return True if a token for user_id issued at epoch issued_at is no longer valid"""
+        self.refresh()
+
+        if user_id not in self._bloom:
+            return False
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+
+        revoked, not_before = entry
+        return revoked or (issued_at or 0) < not_before
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        # Until the first load completes every caller waits for it; afterwards
+        # a thread that finds a refresh in progress serves the current snapshot
+        if not self._lock.acquire(blocking=force or self._watermark is None):
+            return
+        try:
+            if not force and now < self._next_refresh:
+                return
+            query = UserRevocation.query
+            if self._watermark is not None:
+                query = query.filter(UserRevocation.updated_at > self._watermark - REFRESH_OVERLAP)
+            rows = query.order_by(UserRevocation.updated_at.asc()).all()
+            for row in rows:
+                self._apply(row.user_id, row.revoked, row.not_before)
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+            if self._watermark is None:
+                self._watermark = datetime.utcnow()
+            self._prune()
+            self._next_refresh = now + self.refresh_seconds
+        finally:
+            self._lock.release()
+
+    def apply(self, revocation):
+        """Apply a row written by this worker without waiting for the next refresh"""
+        with self._lock:
+            self._apply(revocation.user_id, revocation.revoked, revocation.not_before)
+
+    def _apply(self, user_id, revoked, not_before):
+        self._entries[user_id] = (bool(revoked), calendar.timegm(not_before.utctimetuple()))
+        self._bloom.add(user_id)
+
+    def _prune(self):
+        # Entries that can no longer reject any unexpired token are dropped,
+        # and the Bloom filter is rebuilt once it has grown past capacity.
+        # That includes revoked users: every token issued before not_before
+        # has expired by the horizon, and login refuses inactive users, so
+        # none can have been issued since
+        horizon = time.time() - TOKEN_LIFETIME.total_seconds()
+        stale = [user_id for user_id, (revoked, not_before) in self._entries.items() if not_before < horizon]
+        for user_id in stale:
+            del self._entries[user_id]
+        if stale or len(self._entries) > self.capacity:
+            self.capacity = max(self.capacity, len(self._entries) * 2)
+            self._bloom = BloomFilter(self.capacity)
+            for user_id in self._entries:
+                self._bloom.add(user_id)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bloomBytes': len(self._bloom.bits),
+            'bloomHashes': self._bloom.hash_count,
+            'watermark': self._watermark.isoformat() if self._watermark else None
+        }
+
+
+def record_revocation(user_id, revoked=True):
+    """Stage a user_revocations upsert in the current session.
+
+    revoked=True rejects every token for the user (deactivated or deleted).
+    revoked=False only rejects tokens issued before now, which is what a role
+    change or reactivation needs. Token iat has whole-second resolution, so
+    not_before is rounded up to the next second: a token from earlier in
+    the same second is rejected, at the cost of also rejecting one issued
+    later in that second. The caller commits.
+    """
+    now = datetime.utcnow()
+    revocation = db.session.get(UserRevocation, user_id)
+    if revocation is None:
+        revocation = UserRevocation(user_id=user_id)
+        db.session.add(revocation)
+    revocation.revoked = revoked
+    revocation.not_before = now.replace(microsecond=0) + timedelta(seconds=1)
+    revocation.updated_at = now
+    return revocation
+
+
+class TokenPrincipal:
+    """Stand-in for User built from signed token claims.
+
+    id, email and role come straight from the JWT, which is all role_required
+    and most handlers need. Any other attribute (name, driver_profile,
+    to_dict, ...) loads the real User once and delegates to it.
+    """
+
+    _claim_attributes = ('id', 'email', 'role')
+
+    def __init__(self, claims, token):
+        object.__setattr__(self, 'id', claims['user_id'])
+        object.__setattr__(self, 'email', claims.get('email'))
+        object.__setattr__(self, 'role', claims.get('role'))
+        object.__setattr__(self, '_token', token)
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        user = object.__getattribute__(self, '_user')
+        if user is None:
+            user = load_user(self.id, self._token)
+            if user is None:
+                raise LookupError(f'User {self.id} no longer exists')
+            object.__setattr__(self, '_user', user)
+        return user
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        # Writes always go to the real row so handlers can update the user
+        setattr(self._load(), name, value)
+        if name in self._claim_attributes:
+            object.__setattr__(self, name, value)
+
+
+class AuthError(Exception):
+    """A bearer token was rejected; the message is safe to show the client"""
+
+
+def authenticate_token(token):
+    """The principal a bearer token belongs to, in either auth mode; raises AuthError"""
+    try:
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise AuthError('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthError('Token is invalid')
+    if current_app.config.get('AUTH_STATELESS'):
+        # Trust the signed claims; only revoked users need rejecting
+        if revocation_list.is_revoked(data['user_id'], data.get('iat')):
+            raise AuthError('Token has been revoked')
+        return TokenPrincipal(data, token)
+    user = load_user(data['user_id'], token)
+    if not user:
+        raise AuthError('User not found')
+    return user
+
+
+revocation_list = RevocationList()
+register_stats('revocations', revocation_list.stats)
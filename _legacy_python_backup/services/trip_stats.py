@@ -0,0 +1,98 @@
+"""Maintained per-driver trip counters.
+
+DriverProfile carries the number of completed trips, the number completed
+in the current month and the last completion time. They are updated in the
+same transaction as the ride status change, so profile and driver list
+pages read them instead of counting rides. reconcile_trip_counters()
+rebuilds them from the rides table (reconcile_trip_counters.py).
+
+Months are calendar months in SCHEDULE_TIMEZONE, like the day schedules
+and exports, so a trip completed at 00:30 local on the 1st counts toward
+the new month.
+"""
+from datetime import datetime
+from sqlalchemy import case, func, update
+from src.models.ems_models import db, DriverProfile, Ride
+from src.services.day_schedule import day_schedule, local_date
+
+
+def month_key(moment):
+    """The local calendar month of a naive UTC datetime, as YYYY-MM"""
+    return local_date(moment, day_schedule.tz).strftime('%Y-%m')
+
+
+def record_completion(driver_id, completed_at):
+    """Count a completed ride; runs in the caller's transaction"""
+    period = month_key(completed_at)
+    # MySQL applies SET assignments left to right, so month_trips must be
+    # set while month_trips_period still holds the previous month
+    db.session.execute(update(DriverProfile).where(DriverProfile.user_id == driver_id).ordered_values(
+        (DriverProfile.completed_trips, DriverProfile.completed_trips + 1),
+        (DriverProfile.month_trips, case(
+            (DriverProfile.month_trips_period == period, DriverProfile.month_trips + 1),
+            else_=1,
+        )),
+        (DriverProfile.month_trips_period, period),
+        (DriverProfile.last_completed_at, completed_at),
+    ), execution_options={'synchronize_session': False})
+
+
+def trip_stats(profile, now=None):
+    """API fields for a driver's counters (profile may be None)"""
+    if profile is None:
+        return {'totalTrips': 0, 'tripsThisMonth': 0, 'lastCompletedAt': None}
+    now = now or datetime.utcnow()
+    # The month counter is reset lazily by the first completion of a new month
+    this_month = profile.month_trips if profile.month_trips_period == month_key(now) else 0
+    return {
+        'totalTrips': profile.completed_trips or 0,
+        'tripsThisMonth': this_month or 0,
+        'lastCompletedAt': profile.last_completed_at.isoformat() if profile.last_completed_at else None,
+    }
+
+
+def reconcile_trip_counters(batch_size=500, now=None):
+    """Rebuild every driver's counters from rides, one batch of profiles per transaction.
+
+    Rides completed before completed_at was recorded fall back to updated_at.
+    Returns the number of profiles rebuilt.
+    """
+    now = now or datetime.utcnow()
+    period = month_key(now)
+    month_start, _ = day_schedule.day_range(local_date(now, day_schedule.tz).replace(day=1))
+    completed_at = func.coalesce(Ride.completed_at, Ride.updated_at)
+
+    rebuilt = 0
+    last_user_id = None
+    while True:
+        query = DriverProfile.query.order_by(DriverProfile.user_id)
+        if last_user_id is not None:
+            query = query.filter(DriverProfile.user_id > last_user_id)
+        # Lock the batch so completions recorded meanwhile wait for the rebuild
+        profiles = query.limit(batch_size).with_for_update().all()
+        if not profiles:
+            break
+
+        user_ids = [profile.user_id for profile in profiles]
+        rows = db.session.query(
+            Ride.driver_id,
+            func.count(Ride.id),
+            func.sum(case((completed_at >= month_start, 1), else_=0)),
+            func.max(completed_at),
+        ).filter(
+            Ride.driver_id.in_(user_ids),
+            Ride.status == 'COMPLETED',
+        ).group_by(Ride.driver_id).all()
+        counts = {driver_id: (total, this_month, last) for driver_id, total, this_month, last in rows}
+
+        for profile in profiles:
+            total, this_month, last = counts.get(profile.user_id, (0, 0, None))
+            profile.completed_trips = total
+            profile.month_trips = int(this_month or 0)
+            profile.month_trips_period = period
+            profile.last_completed_at = last
+        db.session.commit()
+
+        rebuilt += len(profiles)
+        last_user_id = user_ids[-1]
+    return rebuilt
@@ -0,0 +1,137 @@
+"""Per-process cache of authenticated user snapshots used by token_required"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy.orm import make_transient_to_detached
+from src.models.ems_models import db, User
+from src.services.diagnostics import register_stats
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL_SECONDS = 30
+
+
+class UserSnapshotCache:
+    """Bounded LRU cache of User column values keyed by (user_id, token).
+
+    Only plain column values are stored, never ORM instances, so an entry can
+    be turned back into a session-bound User for every request without a
+    SELECT and without leaking objects between sessions or threads.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get('AUTH_USER_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('AUTH_USER_CACHE_TTL', self.ttl)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id, token):
+        """Return a session-bound User for a cached snapshot, or None on miss"""
+        if not self.enabled:
+            return None
+
+        key = (user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, snapshot = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return _attach(snapshot)
+
+    def put(self, token, user):
+        if not self.enabled:
+            return
+
+        snapshot = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        key = (user.id, token)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self._keys_by_user.setdefault(user.id, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop every cached token for a user after its row has changed"""
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, ())
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+def load_user(user_id, token):
+    """Return the User for an authenticated token, from the cache when possible"""
+    user = user_cache.get(user_id, token)
+    if user is None:
+        user = User.query.filter_by(id=user_id).first()
+        if user is not None:
+            user_cache.put(token, user)
+    return user
+
+
+def _attach(snapshot):
+    # Rebuild the instance as if it had just been loaded, then merge it into
+    # the current session without emitting a SELECT. If the session already
+    # holds this identity, merge returns that instance instead.
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+user_cache = UserSnapshotCache()
+register_stats('userCache', user_cache.stats)